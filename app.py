@@ -1,12 +1,17 @@
-import os
-import tempfile
+import json
+import time
 from pathlib import Path
 
 import streamlit as st
 
 # Importar la clase del asistente
-from asistente import AsistenteAcademico
+from asistente import AsistenteAcademico, precalentar_modelos
+from compresion import resumen_compresion
+from top_k_adaptativo import SelectorTopK
+from conversacion import Conversacion
+from documentos_pdf import DocumentoPDF
 from evaluador import EvaluadorRAG
+from ingesta import ColaIngesta
 
 # Configuración de la página
 st.set_page_config(
@@ -229,13 +234,88 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Historial de chat acotado: se guardan como máximo MAX_MENSAJES_HISTORIAL
+# mensajes compactos y solo se dibujan los últimos VENTANA_HISTORIAL
+MAX_MENSAJES_HISTORIAL = 100
+VENTANA_HISTORIAL = 20
+
+ETIQUETAS_ETAPAS = {
+    "archivos": "Archivos procesados",
+    "embeddings": "Fragmentos con embeddings",
+    "vectores": "Vectores escritos",
+}
+
+
+@st.cache_resource
+def obtener_cola_ingesta():
+    """
+    Cola de ingesta compartida por todas las sesiones del servidor
+    """
+    return ColaIngesta(num_trabajadores=1)
+
+
+def agregar_al_historial(rol, contenido, resultado=None):
+    """
+    Agrega un mensaje compacto al historial (sin los Documents recuperados)
+
+    De cada fuente solo se guardan id, colección, puntaje y ubicación; el
+    texto se vuelve a pedir al almacén cuando el usuario lo quiere ver.
+    """
+    mensaje = {"n": st.session_state.contador_mensajes, "rol": rol, "contenido": contenido}
+    st.session_state.contador_mensajes += 1
+    if resultado:
+        mensaje["citas"] = [
+            {
+                "coleccion": coleccion,
+                "id": id_,
+                "puntaje": round(puntaje, 4),
+                "fuente": Path(doc.metadata.get("source", "Desconocido")).name,
+                "pagina": doc.metadata.get("page", "?"),
+            }
+            for doc, id_, coleccion, puntaje in zip(
+                resultado["fuentes"], resultado["ids"], resultado["colecciones"], resultado["puntajes"]
+            )
+        ]
+    historial = st.session_state.historial
+    historial.append(mensaje)
+    del historial[:max(0, len(historial) - MAX_MENSAJES_HISTORIAL)]
+
+
+def mostrar_citas(mensaje):
+    """
+    Lista las fuentes de una respuesta; los fragmentos se cargan solo si se piden
+    """
+    citas = mensaje.get("citas")
+    if not citas:
+        return
+    if not st.toggle(f"Ver fuentes ({len(citas)})", key=f"fuentes_{mensaje['n']}"):
+        return
+
+    fragmentos = st.session_state.asistente.obtener_fragmentos(
+        [(cita["coleccion"], cita["id"]) for cita in citas]
+    )
+    for i, (cita, fragmento) in enumerate(zip(citas, fragmentos), 1):
+        st.markdown(f"**[{i}]** {cita['fuente']} - Página {cita['pagina']} (similitud {cita['puntaje']:.2f})")
+        if fragmento is None:
+            st.caption("Fragmento ya no disponible (los documentos se volvieron a cargar)")
+        else:
+            st.text(fragmento.page_content[:300] + "...")
+        st.divider()
+
+
 # Inicializar estado de sesión
 if "asistente" not in st.session_state:
     st.session_state.asistente = None
 if "historial" not in st.session_state:
     st.session_state.historial = []
+if "contador_mensajes" not in st.session_state:
+    st.session_state.contador_mensajes = 0
+if "conversacion" not in st.session_state:
+    st.session_state.conversacion = Conversacion()
 if "documentos_cargados" not in st.session_state:
     st.session_state.documentos_cargados = False
+if "trabajo_ingesta" not in st.session_state:
+    st.session_state.trabajo_ingesta = None
 
 # Header
 st.markdown('<p class="main-header">Asistente Académico con RAG</p>', unsafe_allow_html=True)
@@ -255,6 +335,11 @@ with st.sidebar:
         help="Selecciona el modelo de Ollama a utilizar",
     )
 
+    # Precargar embeddings y LLM en segundo plano mientras se dibuja la interfaz
+    if st.session_state.get("modelo_precalentado") != modelo:
+        precalentar_modelos(modelo)
+        st.session_state.modelo_precalentado = modelo
+
     temperatura = st.slider(
         "Temperatura", 
         0.0, 
@@ -271,6 +356,24 @@ with st.sidebar:
         help="Número de fragmentos relevantes a usar",
     )
 
+    top_k_adaptativo = st.toggle(
+        "Fragmentos adaptativos",
+        value=False,
+        help="Usar solo los fragmentos que destacan por su similitud (como máximo el valor anterior)",
+    )
+
+    comprimir_contexto = st.toggle(
+        "Comprimir contexto",
+        value=False,
+        help="Enviar al modelo solo las oraciones relevantes de cada fragmento (respuestas más rápidas)",
+    )
+
+    modo_conversacion = st.toggle(
+        "Modo conversación",
+        value=True,
+        help="Las preguntas de seguimiento reutilizan el contexto de la respuesta anterior",
+    )
+
     st.divider()
 
     # Sección de carga de documentos
@@ -283,46 +386,123 @@ with st.sidebar:
         help="Sube los apuntes, libros o documentos del curso",
     )
 
+    curso = st.text_input(
+        "Curso",
+        value="",
+        help="Colección donde se guardan los PDFs (vacío = colección general)",
+    )
+
+    etiquetas_carga = st.text_input(
+        "Etiquetas",
+        value="",
+        help="Separadas por comas (p. ej. 'parcial, laboratorio'); permiten filtrar las consultas",
+    )
+
     if st.button("Inicializar Asistente", type="primary", use_container_width=True):
         if uploaded_files:
-            with st.spinner("Inicializando asistente y procesando documentos..."):
-                try:
-                    # Guardar archivos temporalmente
-                    temp_paths = []
-                    for uploaded_file in uploaded_files:
-                        with tempfile.NamedTemporaryFile(
-                            delete=False, suffix=".pdf"
-                        ) as tmp_file:
-                            tmp_file.write(uploaded_file.getvalue())
-                            temp_paths.append(tmp_file.name)
-
-                    # Inicializar asistente
+            try:
+                # Los PDFs se procesan desde memoria; el hash de cada subida se
+                # calcula una vez y sirve para la caché de páginas y para
+                # descartar archivos repetidos
+                documentos = {}
+                for uploaded_file in uploaded_files:
+                    pdf = DocumentoPDF(uploaded_file, nombre=uploaded_file.name)
+                    documentos.setdefault(pdf.hash, pdf)
+
+                # Reutilizar el asistente de la sesión: sigue respondiendo con la
+                # versión anterior de la colección mientras se procesa la nueva
+                if st.session_state.asistente is None:
                     st.session_state.asistente = AsistenteAcademico(
                         modelo_llama=modelo,
                         temperatura=temperatura,
                         top_k=top_k
                     )
-                    st.session_state.asistente.cargar_documentos(temp_paths)
+                trabajo = obtener_cola_ingesta().encolar(
+                    st.session_state.asistente, list(documentos.values()),
+                    coleccion=curso.strip() or None,
+                    etiquetas=etiquetas_carga,
+                )
+                st.session_state.trabajo_ingesta = trabajo.id
 
-                    # Limpiar archivos temporales
-                    for path in temp_paths:
-                        try:
-                            os.unlink(path)
-                        except Exception:
-                            pass
-
-                    st.session_state.documentos_cargados = True
-                    st.success(f"{len(uploaded_files)} documentos cargados correctamente")
-
-                except Exception as e:
-                    st.error(f"Error al cargar documentos: {str(e)}")
+            except Exception as e:
+                st.error(f"Error al cargar documentos: {str(e)}")
         else:
             st.warning("Por favor, sube al menos un documento PDF")
 
+    # Progreso del trabajo de ingesta en segundo plano
+    if st.session_state.trabajo_ingesta:
+        estado_trabajo = obtener_cola_ingesta().estado(st.session_state.trabajo_ingesta)
+        if estado_trabajo is None:
+            st.session_state.trabajo_ingesta = None
+        elif estado_trabajo["estado"] == "en_cola":
+            st.info("Documentos en cola de procesamiento...")
+        elif estado_trabajo["estado"] == "en_proceso":
+            for etapa, etiqueta in ETIQUETAS_ETAPAS.items():
+                actual, total = estado_trabajo["progreso"][etapa]
+                # Con la ingesta en flujo el total de fragmentos no se conoce de antemano (total 0)
+                st.progress(actual / total if total else 0.0, text=f"{etiqueta}: {actual}/{total}" if total else f"{etiqueta}: {actual}")
+        elif estado_trabajo["estado"] == "completado":
+            st.session_state.documentos_cargados = True
+            st.session_state.trabajo_ingesta = None
+            st.success(
+                f"{estado_trabajo['archivos']} documentos cargados correctamente "
+                f"({estado_trabajo['segundos']} s)"
+            )
+        else:
+            st.session_state.trabajo_ingesta = None
+            st.error(f"Error al cargar documentos: {estado_trabajo['error']}")
+
     # Mostrar estado
+    colecciones_consulta = None
+    filtros_consulta = None
     if st.session_state.documentos_cargados:
         st.success("Sistema listo")
-        
+
+        # Cursos en los que se busca (vacío = colección general)
+        cursos_disponibles = st.session_state.asistente.colecciones.nombres()
+        if len(cursos_disponibles) > 1:
+            colecciones_consulta = st.multiselect(
+                "Buscar en cursos",
+                cursos_disponibles,
+                help="Vacío busca solo en la colección general",
+            ) or None
+
+        # Filtros por documento, páginas y etiquetas (se aplican antes de buscar)
+        with st.expander("Filtrar fuentes"):
+            disponibles = st.session_state.asistente.fuentes_disponibles(colecciones_consulta)
+            fuentes_filtro = st.multiselect(
+                "Documentos",
+                disponibles["fuentes"],
+                format_func=lambda s: Path(s).name,
+            )
+            paginas_filtro = st.text_input("Páginas", value="", help="Rango como '10-25' (vacío = todas)")
+            etiquetas_filtro = st.multiselect("Etiquetas", disponibles["etiquetas"])
+
+            paginas = None
+            if paginas_filtro.strip():
+                try:
+                    # Misma numeración que se muestra en "Ver fuentes"
+                    desde, _, hasta = paginas_filtro.partition("-")
+                    paginas = (int(desde), int(hasta or desde))
+                except ValueError:
+                    st.warning("Rango de páginas no válido")
+            filtros_consulta = {
+                "fuentes": fuentes_filtro, "paginas": paginas, "etiquetas": etiquetas_filtro,
+            }
+
+        # Quitar documentos sin reconstruir la base (volver a subirlos los reemplaza)
+        with st.expander("Quitar documentos"):
+            fuentes_eliminar = st.multiselect(
+                "Documentos a quitar",
+                disponibles["fuentes"],
+                format_func=lambda s: Path(s).name,
+                key="fuentes_eliminar",
+            )
+            if st.button("Quitar", use_container_width=True, disabled=not fuentes_eliminar):
+                eliminados = st.session_state.asistente.eliminar_documentos(fuentes_eliminar, colecciones_consulta)
+                st.success(f"{eliminados} fragmentos quitados")
+                st.rerun()
+
         # Opción para cargar base de datos existente
         if st.button("Cargar Base de Datos Existente", use_container_width=True):
             try:
@@ -342,7 +522,9 @@ with st.sidebar:
         if st.button("Reiniciar", use_container_width=True):
             st.session_state.asistente = None
             st.session_state.historial = []
+            st.session_state.conversacion = Conversacion()
             st.session_state.documentos_cargados = False
+            st.session_state.trabajo_ingesta = None
             st.rerun()
 
     st.divider()
@@ -357,7 +539,8 @@ with st.sidebar:
                 if dataset and st.session_state.asistente:
                     with st.spinner("Evaluando sistema..."):
                         for item in dataset:
-                            resultado = st.session_state.asistente.consultar(item["pregunta"])
+                            # Prioridad de lote: no retrasa a quienes están chateando
+                            resultado = st.session_state.asistente.consultar(item["pregunta"], prioridad="lote")
                             evaluador.evaluar_pregunta(
                                 item["pregunta"],
                                 resultado["respuesta"],
@@ -382,6 +565,21 @@ with st.sidebar:
             except Exception as e:
                 st.error(f"Error en evaluación: {str(e)}")
 
+    # Memoria del proceso por componente (modelo, vectores, cachés, esta sesión)
+    if st.session_state.asistente:
+        with st.expander("Memoria"):
+            if st.button("Medir memoria"):
+                reporte = st.session_state.asistente.reporte_memoria(sesion=st.session_state)
+                st.metric("RSS del proceso", f"{reporte['proceso']['rss_mb']} MB")
+                st.caption(f"Componente dominante: {reporte['dominante']}")
+                st.json(reporte["componentes"])
+                st.download_button(
+                    "Descargar reporte JSON",
+                    json.dumps(reporte, ensure_ascii=False, indent=2),
+                    file_name="reporte_memoria.json",
+                    mime="application/json",
+                )
+
     st.divider()
 
     # Información del proyecto
@@ -437,25 +635,22 @@ if not st.session_state.documentos_cargados:
 else:
     # Interfaz de chat
 
-    # Mostrar historial
-    for mensaje in st.session_state.historial:
+    # Mostrar historial (solo la ventana más reciente)
+    ocultos = len(st.session_state.historial) - VENTANA_HISTORIAL
+    if ocultos > 0:
+        st.caption(f"{ocultos} mensajes anteriores ocultos")
+    for mensaje in st.session_state.historial[-VENTANA_HISTORIAL:]:
         with st.chat_message(mensaje["rol"]):
             st.markdown(mensaje["contenido"])
 
             # Mostrar fuentes si es una respuesta del asistente
-            if mensaje["rol"] == "assistant" and "fuentes" in mensaje:
-                with st.expander("Ver fuentes"):
-                    for i, fuente in enumerate(mensaje["fuentes"], 1):
-                        source = fuente.metadata.get("source", "Desconocido")
-                        page = fuente.metadata.get("page", "?")
-                        st.markdown(f"**[{i}]** {Path(source).name} - Página {page}")
-                        st.text(fuente.page_content[:300] + "...")
-                        st.divider()
+            if mensaje["rol"] == "assistant":
+                mostrar_citas(mensaje)
 
     # Input del usuario
     if pregunta := st.chat_input("Escribe tu pregunta aquí..."):
         # Agregar pregunta al historial
-        st.session_state.historial.append({"rol": "user", "contenido": pregunta})
+        agregar_al_historial("user", pregunta)
 
         # Mostrar pregunta
         with st.chat_message("user"):
@@ -469,45 +664,47 @@ else:
                     if st.session_state.asistente:
                         st.session_state.asistente.actualizar_parametros(
                             temperatura=temperatura,
-                            top_k=top_k
+                            top_k=top_k,
+                            top_k_adaptativo=SelectorTopK(max_k=top_k) if top_k_adaptativo else False,
+                            comprimir_contexto=comprimir_contexto,
                         )
                     
                     # Consultar al asistente
-                    resultado = st.session_state.asistente.consultar(pregunta)
+                    if modo_conversacion:
+                        resultado = st.session_state.asistente.conversar(
+                            pregunta, st.session_state.conversacion,
+                            colecciones=colecciones_consulta, filtros=filtros_consulta,
+                        )
+                    else:
+                        resultado = st.session_state.asistente.consultar(
+                            pregunta, colecciones=colecciones_consulta, filtros=filtros_consulta
+                        )
 
                     st.markdown(resultado["respuesta"])
+                    seleccion = resultado.get("seleccion_k")
+                    if seleccion and seleccion["motivo"] != "fijo":
+                        st.caption(f"{seleccion['k']} de {seleccion['candidatos']} fragmentos "
+                                   f"(corte: {seleccion['motivo']}, ~{seleccion['tokens']} tokens)")
+                    if resultado.get("compresion"):
+                        st.caption(f"Contexto comprimido: {resumen_compresion(resultado['compresion'])}")
 
                     # Agregar respuesta al historial
-                    st.session_state.historial.append(
-                        {
-                            "rol": "assistant",
-                            "contenido": resultado["respuesta"],
-                            "fuentes": resultado["fuentes"],
-                        }
-                    )
+                    agregar_al_historial("assistant", resultado["respuesta"], resultado)
 
                     # Mostrar fuentes
-                    if resultado["fuentes"]:
-                        with st.expander("Ver fuentes"):
-                            for i, fuente in enumerate(resultado["fuentes"], 1):
-                                source = fuente.metadata.get("source", "Desconocido")
-                                page = fuente.metadata.get("page", "?")
-                                st.markdown(f"**[{i}]** {Path(source).name} - Página {page}")
-                                st.text(fuente.page_content[:300] + "...")
-                                st.divider()
+                    mostrar_citas(st.session_state.historial[-1])
 
                 except Exception as e:
                     error_msg = str(e)
                     st.error(f"Error: {error_msg}")
                     # Agregar mensaje de error al historial
-                    st.session_state.historial.append(
-                        {
-                            "rol": "assistant",
-                            "contenido": f"Lo siento, ocurrió un error: {error_msg}",
-                            "fuentes": [],
-                        }
-                    )
+                    agregar_al_historial("assistant", f"Lo siento, ocurrió un error: {error_msg}")
 
 # Footer
 st.divider()
-st.caption("Desarrollado por el equipo de IA - UNI FC 2025-2")
\ No newline at end of file
+st.caption("Desarrollado por el equipo de IA - UNI FC 2025-2")
+
+# Consultar de nuevo el progreso mientras haya una ingesta en curso
+if st.session_state.trabajo_ingesta:
+    time.sleep(1.0)
+    st.rerun()
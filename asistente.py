@@ -1,13 +1,201 @@
 import os
-from typing import List
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Las dependencias pesadas (langchain, chromadb, torch, transformers) se importan
+# de forma diferida dentro de los métodos: importar este módulo es casi instantáneo.
+from backends_llm import BackendLLM, BackendOllama, BackendPoolOllama, Generacion
+from cache_paginas import CachePaginas
+from cliente_ollama import OLLAMA_BASE_URL
+from coalescencia import CoalescedorConsultas, clave_consulta
+from colecciones import GestorColecciones, Recuperado
+from compresion import CompresorContexto, resumen_compresion
+from conversacion import Conversacion
+from deduplicacion import DeduplicadorMinHash, referencias_de
+from documentos_pdf import DocumentoPDF
+from embeddings_cpu import MODOS as MODOS_EMBEDDINGS, crear_embeddings, parsear_cpus
+from indice_fuentes import separar_etiquetas
+from indice_hnsw import ConfigIndice
+from ingesta import FlujoFragmentos, en_segundo_plano
+from instantanea import ColeccionInstantanea, exportar as escribir_instantanea
+from memoria import PERFILADOR, reporte_memoria
+from perfil_hardware import RUTA_PERFIL as RUTA_PERFIL_HARDWARE, PerfilHardware
+from planificador import INTERACTIVA, PlanificadorGeneraciones, RechazoGeneracion
+from relevancia import NOMBRE_ARCHIVO as ARCHIVO_RELEVANCIA, CompuertaRelevancia
+from top_k_adaptativo import SelectorTopK, tokens_estimados
+
+MODELO_EMBEDDINGS = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Modo de inferencia de los embeddings en CPU: fp32, int8 u onnx (ver embeddings_cpu.py)
+MODO_EMBEDDINGS = os.environ.get("ASISTENTE_MODO_EMBEDDINGS", "fp32")
+
+# Ajustes medidos con `python verificar_setup.py --benchmark` (None si no hay perfil; ver perfil_hardware.py)
+PERFIL_HARDWARE = PerfilHardware.cargar(RUTA_PERFIL_HARDWARE)
+
+HILOS_EMBEDDINGS = (
+    int(os.environ["ASISTENTE_HILOS_EMBEDDINGS"]) if os.environ.get("ASISTENTE_HILOS_EMBEDDINGS")
+    else PERFIL_HARDWARE.hilos_embeddings if PERFIL_HARDWARE else None
+)
+
+# Núcleos a los que se fija el proceso al cargar los embeddings, p. ej. "0-3" (solo Linux)
+CPUS_EMBEDDINGS = parsear_cpus(os.environ.get("ASISTENTE_CPUS_EMBEDDINGS"))
+
+# Prompt en español optimizado para contexto académico
+PLANTILLA_PROMPT = """Eres un asistente académico experto. Usa el siguiente contexto para responder la pregunta del estudiante.
 
-from langchain.chains import RetrievalQA
-from langchain.document_loaders import PyPDFLoader
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
+Si no sabes la respuesta con base en el contexto proporcionado, di claramente "No tengo suficiente información en los documentos para responder esa pregunta".
+
+Contexto:
+{context}
+
+Pregunta: {question}
+
+Respuesta detallada y académica:"""
+
+# Turno de seguimiento: se envía a continuación del contexto de Ollama, así que
+# la plantilla y los fragmentos del primer turno no se vuelven a procesar
+PLANTILLA_SEGUIMIENTO = """
+
+{contexto_adicional}Pregunta de seguimiento: {question}
+
+Respuesta detallada y académica:"""
+
+PLANTILLA_CONTEXTO_ADICIONAL = """Contexto adicional:
+{context}
+
+"""
+
+NUM_CTX = 4096
+
+# Un modelo de embeddings por configuración (modelo, dispositivo, modo, hilos, núcleos),
+# compartido entre instancias
+_embeddings_cargados = {}
+_lock_embeddings = threading.Lock()
+
+# Consultas idénticas simultáneas de cualquier sesión comparten una sola generación
+COALESCEDOR = CoalescedorConsultas()
+
+# Admisión, prioridad y plazos de las generaciones de todo el proceso
+PLANIFICADOR = (
+    PlanificadorGeneraciones(max_concurrencia=PERFIL_HARDWARE.max_concurrencia) if PERFIL_HARDWARE
+    else PlanificadorGeneraciones()
+)
+
+RESPUESTA_SIN_INFORMACION = "No tengo suficiente información en los documentos para responder esa pregunta."
+
+MENSAJE_SATURADO = (
+    "⏳ El asistente está saturado en este momento y no puede generar una respuesta a tiempo. "
+    "Estas son las fuentes más relevantes para tu pregunta; inténtalo de nuevo en unos segundos."
+)
+
+
+def _clave_embeddings(modelo: str, dispositivo: str, modo: Optional[str], hilos: Optional[int],
+                      cpus: Optional[Sequence[int]]) -> tuple:
+    cpus = tuple(sorted(set(cpus))) if cpus else CPUS_EMBEDDINGS
+    return (modelo, dispositivo, modo or MODO_EMBEDDINGS, hilos or HILOS_EMBEDDINGS, cpus)
+
+
+def obtener_embeddings(modelo: str = MODELO_EMBEDDINGS, dispositivo: str = "cpu", modo: Optional[str] = None,
+                       hilos: Optional[int] = None, cpus: Optional[Sequence[int]] = None):
+    """
+    Devuelve el modelo de embeddings, cargándolo la primera vez que se pide
+
+    Hilos y núcleos se aplican a todo el proceso al cargar (ver
+    embeddings_cpu.configurar_hilos); pedir otros carga otra instancia.
+
+    Args:
+        modelo: Nombre del modelo de sentence-transformers
+        dispositivo: 'cpu' o 'cuda'
+        modo: 'fp32', 'int8' u 'onnx' (None = MODO_EMBEDDINGS); si el modo optimizado
+            no concuerda con fp32 se usa fp32 (ver embeddings_cpu.crear_embeddings)
+        hilos: Hilos de inferencia en CPU (None = HILOS_EMBEDDINGS)
+        cpus: Núcleos a los que fijar el proceso (None = CPUS_EMBEDDINGS)
+    """
+    clave = _clave_embeddings(modelo, dispositivo, modo, hilos, cpus)
+    with _lock_embeddings:
+        if clave not in _embeddings_cargados:
+            print("📊 Cargando modelo de embeddings...")
+            PERFILADOR.marcar("antes_embeddings")
+            _embeddings_cargados[clave] = crear_embeddings(modelo, dispositivo, *clave[2:])
+            PERFILADOR.marcar("embeddings_cargados")
+        return _embeddings_cargados[clave]
+
+
+def registrar_embeddings(embeddings, modelo: str = MODELO_EMBEDDINGS, dispositivo: str = "cpu",
+                         modo: Optional[str] = None, hilos: Optional[int] = None,
+                         cpus: Optional[Sequence[int]] = None):
+    """
+    Usa un modelo de embeddings ya construido en lugar de cargarlo
+
+    Args:
+        embeddings: Objeto con embed_documents() y embed_query()
+        modelo: Nombre bajo el que se registra
+        dispositivo: 'cpu' o 'cuda'
+        modo: Modo bajo el que se registra (None = MODO_EMBEDDINGS)
+        hilos, cpus: Configuración bajo la que se registra (ver obtener_embeddings)
+    """
+    with _lock_embeddings:
+        _embeddings_cargados[_clave_embeddings(modelo, dispositivo, modo, hilos, cpus)] = embeddings
+
+
+def precargar_ollama(modelo: str, base_url: str = OLLAMA_BASE_URL, keep_alive: str = "30m",
+                     timeout: float = 120.0) -> bool:
+    """
+    Pide a Ollama que cargue el modelo en memoria (prompt vacío + keep_alive)
+
+    Returns:
+        True si Ollama respondió correctamente
+    """
+    try:
+        import requests
+
+        respuesta = requests.post(
+            f"{base_url}/api/generate",
+            json={"model": modelo, "keep_alive": keep_alive},
+            timeout=timeout,
+        )
+        return respuesta.status_code == 200
+    except Exception as e:
+        print(f"⚠️  No se pudo precargar {modelo} en Ollama: {str(e)}")
+        return False
+
+
+def precalentar_modelos(modelo_llama: Optional[str] = None, base_url: Union[str, List[str]] = OLLAMA_BASE_URL,
+                en_segundo_plano: bool = True, modo_embeddings: Optional[str] = None,
+                hilos_embeddings: Optional[int] = None,
+                cpus_embeddings: Optional[Sequence[int]] = None) -> Optional[threading.Thread]:
+    """
+    Carga el modelo de embeddings, hace un encode de prueba y precarga el LLM
+
+    Pensado para llamarse al arrancar la interfaz, mientras se dibuja la UI.
+
+    Args:
+        modelo_llama: Modelo de Ollama a precargar (None para omitirlo)
+        base_url: URL del servidor Ollama (o lista de URLs si hay varios)
+        en_segundo_plano: Ejecutar en un hilo daemon y devolverlo
+        modo_embeddings: Modo de inferencia de los embeddings (ver obtener_embeddings)
+        hilos_embeddings: Hilos de inferencia de los embeddings
+        cpus_embeddings: Núcleos a los que fijar el proceso al cargar los embeddings
+
+    Returns:
+        El hilo lanzado, o None si se ejecutó de forma síncrona
+    """
+    def _tarea():
+        obtener_embeddings(modo=modo_embeddings, hilos=hilos_embeddings, cpus=cpus_embeddings).embed_query(
+            "precalentamiento"
+        )
+        if modelo_llama:
+            for url in [base_url] if isinstance(base_url, str) else base_url:
+                precargar_ollama(modelo_llama, url)
+
+    if not en_segundo_plano:
+        _tarea()
+        return None
+
+    hilo = threading.Thread(target=_tarea, name="precalentamiento", daemon=True)
+    hilo.start()
+    return hilo
 
 
 class AsistenteAcademico:
@@ -15,7 +203,17 @@ class AsistenteAcademico:
     Asistente académico RAG con LLaMA local
     """
 
-    def __init__(self, modelo_llama="llama2:7b", persist_directory="./chroma_db", temperatura=0.3, top_k=3):
+    def __init__(self, modelo_llama="llama2:7b", persist_directory="./chroma_db", temperatura=0.3, top_k=3,
+                 deduplicar=True, umbral_duplicados=0.85, directorio_cache_paginas="./.cache_paginas",
+                 precalentar=False, nombre_coleccion="langchain", tamano_lote=None,
+                 max_colecciones_residentes=16, base_url_ollama=OLLAMA_BASE_URL, coalescer=True,
+                 backend_llm: Optional[BackendLLM] = None,
+                 planificador: Optional[PlanificadorGeneraciones] = None, filtrar_irrelevantes=True,
+                 perfilar_memoria=False, config_indice: Optional[ConfigIndice] = None,
+                 modo_embeddings: Optional[str] = None, hilos_embeddings: Optional[int] = None,
+                 cpus_embeddings: Optional[Sequence[int]] = None,
+                 top_k_adaptativo: Union[bool, SelectorTopK] = False,
+                 comprimir_contexto: Union[bool, CompresorContexto] = False):
         """
         Inicializa el asistente
 
@@ -24,175 +222,724 @@ class AsistenteAcademico:
             persist_directory: Directorio para persistir vectores
             temperatura: Control de creatividad (0.0 - 1.0)
             top_k: Número de fragmentos a recuperar
+            deduplicar: Eliminar fragmentos duplicados o casi duplicados al cargar
+            umbral_duplicados: Similitud Jaccard (MinHash) para considerar duplicado
+            directorio_cache_paginas: Caché de texto extraído de PDFs (None la desactiva)
+            precalentar: Cargar embeddings y precargar el LLM en segundo plano
+            nombre_coleccion: Colección predeterminada (los demás cursos van en persist_directory/cursos)
+            tamano_lote: Fragmentos por lote al generar embeddings y escribir vectores
+                (None = el del perfil de hardware, o 64 sin perfil)
+            max_colecciones_residentes: Colecciones de cursos cargadas en memoria a la vez
+            base_url_ollama: URL del servidor Ollama, o lista de URLs para repartir
+                las generaciones entre varios servidores (ver BackendPoolOllama)
+            coalescer: Unir consultas idénticas simultáneas a una sola generación
+            backend_llm: Backend de generación (por defecto Ollama; ver backends_llm.py)
+            planificador: Cola de generaciones (por defecto la compartida del proceso; ver planificador.py)
+            filtrar_irrelevantes: Responder sin LLM cuando la recuperación no es relevante
+                (umbrales de persist_directory/relevancia.json; ver relevancia.py)
+            perfilar_memoria: Registrar la memoria con tracemalloc en los puntos clave
+                (ver reporte_memoria() y memoria.py)
+            config_indice: Parámetros HNSW (distancia, M, ef de construcción y de búsqueda)
+                de las colecciones que no tengan los suyos (ver indice_hnsw.py)
+            modo_embeddings: Inferencia de embeddings en CPU: 'fp32', 'int8' u 'onnx'
+                (None = variable ASISTENTE_MODO_EMBEDDINGS o fp32; ver embeddings_cpu.py)
+            hilos_embeddings: Hilos de inferencia de los embeddings (None = ASISTENTE_HILOS_EMBEDDINGS,
+                los del perfil de hardware o los de torch)
+            cpus_embeddings: Núcleos a los que se fija el proceso al cargar los embeddings
+                (None = ASISTENTE_CPUS_EMBEDDINGS; solo Linux, afecta a todo el proceso)
+            top_k_adaptativo: Elegir cuántos fragmentos enviar según sus puntajes (True o
+                un SelectorTopK con los cortes; ver top_k_adaptativo.py). top_k queda como
+                número de fragmentos para la compuerta de relevancia.
+            comprimir_contexto: Enviar al LLM solo las oraciones relevantes de cada fragmento
+                (True o un CompresorContexto; ver compresion.py)
         """
         print("🚀 Inicializando Asistente Académico...")
+        if PERFIL_HARDWARE is not None:
+            print(f"⚙️  Perfil de hardware ({RUTA_PERFIL_HARDWARE}): lote {PERFIL_HARDWARE.tamano_lote}, "
+                  f"{PERFIL_HARDWARE.hilos_embeddings or 'auto'} hilos de embeddings, "
+                  f"{PERFIL_HARDWARE.max_concurrencia} generaciones simultáneas")
+        if tamano_lote is None:
+            tamano_lote = PERFIL_HARDWARE.tamano_lote if PERFIL_HARDWARE else 64
+        if perfilar_memoria:
+            PERFILADOR.activar()
 
         # Guardar parámetros configurables
+        if modo_embeddings is not None and modo_embeddings not in MODOS_EMBEDDINGS:
+            raise ValueError(f"Modo de embeddings desconocido: {modo_embeddings} (opciones: {', '.join(MODOS_EMBEDDINGS)})")
+        self.modo_embeddings = modo_embeddings or MODO_EMBEDDINGS
+        self.hilos_embeddings = hilos_embeddings
+        self.cpus_embeddings = cpus_embeddings
         self.modelo_llama = modelo_llama
+        self.base_url_ollama = base_url_ollama
         self.temperatura = temperatura
         self.top_k = top_k
-
-        # Configurar embeddings (gratuito y en español)
-        print("📊 Cargando modelo de embeddings...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={"device": "cpu"},  # Cambiar a 'cuda' si tienen GPU
-        )
-
-        # Configurar LLaMA local
-        print(f"🦙 Conectando con LLaMA ({modelo_llama})...")
-        self.llm = Ollama(
-            model=modelo_llama,
-            temperature=temperatura,
-            num_ctx=4096,  # Contexto grande para documentos largos
-            request_timeout=300.0,  # Agregar esto (5 minutos)
+        self.selector_top_k = SelectorTopK() if top_k_adaptativo is True else (top_k_adaptativo or None)
+        self.compresor = CompresorContexto() if comprimir_contexto is True else (comprimir_contexto or None)
+        self.deduplicar = deduplicar
+        self.umbral_duplicados = umbral_duplicados
+        self.cache_paginas = CachePaginas(directorio_cache_paginas) if directorio_cache_paginas else None
+        self.coalescedor = COALESCEDOR if coalescer else None
+        self.planificador = planificador or PLANIFICADOR
+        self.compuerta = None
+        if filtrar_irrelevantes:
+            ruta_relevancia = os.path.join(persist_directory, ARCHIVO_RELEVANCIA)
+            self.compuerta = CompuertaRelevancia.cargar(ruta_relevancia) or CompuertaRelevancia()
+
+        # Embeddings y LLM se crean al primer uso (ver propiedades)
+        self._llm = backend_llm
+        self._lock_llm = threading.Lock()
+
+        # Base de datos vectorial: una colección versionada por curso
+        self.persist_directory = persist_directory
+        self.nombre_coleccion = nombre_coleccion
+        self.colecciones = GestorColecciones(
+            persist_directory,
+            predeterminada=nombre_coleccion,
+            obtener_embeddings=lambda: self.embeddings,
+            tamano_lote=tamano_lote,
+            max_residentes=max_colecciones_residentes,
+            config_indice=config_indice,
         )
 
-        # Base de datos vectorial
-        self.persist_directory = persist_directory
-        self.vectorstore = None
-        self.qa_chain = None
+        precalentar_llm = modelo_llama if backend_llm is None or backend_llm.nombre in ("ollama", "pool_ollama") else None
+        self.hilo_precalentamiento = precalentar_modelos(
+            precalentar_llm, base_url_ollama, modo_embeddings=self.modo_embeddings, hilos_embeddings=hilos_embeddings,
+            cpus_embeddings=cpus_embeddings,
+        ) if precalentar else None
 
+        PERFILADOR.marcar("asistente_inicializado")
         print("✅ Asistente inicializado correctamente")
 
-    def cargar_documentos(self, rutas_pdf: List[str]):
+    @property
+    def embeddings(self):
+        """
+        Modelo de embeddings (gratuito y en español), cargado bajo demanda
+        """
+        return obtener_embeddings(modo=self.modo_embeddings, hilos=self.hilos_embeddings, cpus=self.cpus_embeddings)
+
+    @property
+    def llm(self) -> BackendLLM:
+        """
+        Backend de generación (LLaMA local por defecto), creado bajo demanda
+        """
+        with self._lock_llm:
+            if self._llm is None:
+                self._llm = self._crear_llm()
+            return self._llm
+
+    @property
+    def vectorstore(self):
+        """
+        Vectorstore de la colección predeterminada (None si no está cargada)
+        """
+        return self.colecciones.obtener().vectorstore
+
+    @property
+    def version_coleccion(self) -> int:
+        return self.colecciones.obtener().version
+
+    def _crear_llm(self) -> BackendLLM:
+        urls = [self.base_url_ollama] if isinstance(self.base_url_ollama, str) else list(self.base_url_ollama)
+        if len(urls) > 1:
+            print(f"🦙 Conectando con LLaMA ({self.modelo_llama}) en {len(urls)} servidores...")
+            return BackendPoolOllama(self.modelo_llama, urls, temperatura=self.temperatura, num_ctx=NUM_CTX, timeout=300)
+
+        print(f"🦙 Conectando con LLaMA ({self.modelo_llama})...")
+        return BackendOllama(
+            self.modelo_llama,
+            base_url=urls[0],
+            temperatura=self.temperatura,
+            num_ctx=NUM_CTX,  # Contexto grande para documentos largos
+            timeout=300,  # 5 minutos
+        )
+
+    def cargar_documentos(self, rutas_pdf: List, progreso=None, reemplazar=False, coleccion=None, etiquetas=None):
         """
         Carga y procesa documentos PDF
 
+        Si se agregan documentos, los vectores se insertan en el sitio en la
+        versión activa (el costo depende solo de lo nuevo) y las versiones
+        anteriores de los mismos documentos se borran al terminar. Con
+        reemplazar=True, o si la colección está vacía, se escribe una versión
+        nueva que se activa de forma atómica al terminar. En ambos casos las
+        consultas siguen respondiéndose durante la carga.
+
         Args:
-            rutas_pdf: Lista de rutas a archivos PDF
+            rutas_pdf: Lista de PDFs: rutas, bytes/memoryview, objetos tipo archivo
+                (p. ej. archivos subidos en Streamlit) o DocumentoPDF
+            progreso: Callback opcional progreso(etapa, actual, total) con etapa
+                en 'archivos', 'embeddings' o 'vectores'
+            reemplazar: Si es True, la colección queda solo con estos documentos;
+                si es False, se conservan los de la versión activa (salvo las
+                versiones anteriores de estos mismos documentos, que se sustituyen)
+            coleccion: Curso al que pertenecen los documentos (None = predeterminada)
+            etiquetas: Etiquetas para filtrar después las consultas ('parcial, lab' o lista)
         """
+        notificar = progreso or (lambda etapa, actual, total: None)
         print(f"\n📚 Cargando {len(rutas_pdf)} documentos...")
 
-        documentos = []
-        for ruta in rutas_pdf:
-            print(f"  - Procesando: {os.path.basename(ruta)}")
-            loader = PyPDFLoader(ruta)
-            documentos.extend(loader.load())
+        pdfs = []
+        vistos = set()
+        for fuente in rutas_pdf:
+            pdf = DocumentoPDF.desde(fuente)
+            if pdf.hash in vistos:
+                print(f"  - Omitido (contenido repetido): {pdf.nombre_corto}")
+            else:
+                vistos.add(pdf.hash)
+                pdfs.append(pdf)
 
-        print(f"✅ {len(documentos)} páginas cargadas")
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-        # Dividir en chunks
-        print("✂️  Dividiendo documentos en fragmentos...")
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,  # Tamaño de cada fragmento
             chunk_overlap=200,  # Solapamiento entre fragmentos
             length_function=len,
             separators=["\n\n", "\n", " ", ""],
         )
+        # Eliminar duplicados (diapositivas re-exportadas, encabezados, sílabos repetidos)
+        deduplicador = DeduplicadorMinHash(umbral=self.umbral_duplicados) if self.deduplicar else None
+
+        # Páginas → fragmentos → embeddings → vectores, cada etapa en su hilo
+        # y unidas por colas acotadas: la memoria no depende del tamaño del corpus
+        flujo = FlujoFragmentos(
+            pdfs, self._iterar_paginas, text_splitter, deduplicador,
+            etiquetas=separar_etiquetas(etiquetas), notificar=notificar,
+        )
 
-        chunks = text_splitter.split_documents(documentos)
-        print(f"✅ {len(chunks)} fragmentos creados")
+        destino = self._coleccion_modificable(coleccion)
+        with destino.lock_escritura:
+            anterior = None if reemplazar else (destino.vectorstore or destino.abrir_activa())
+            fragmentos = en_segundo_plano(flujo, profundidad=2 * destino.tamano_lote, nombre=f"fragmentos-{destino.nombre}")
+            if anterior is None:
+                # Colección nueva o reemplazo completo: versión nueva que se activa al terminar
+                print(f"🔢 Extrayendo, dividiendo y almacenando vectores en una versión nueva de '{destino.nombre}'...")
+                vectorstore, version, indice = destino.construir_version(
+                    fragmentos, None, notificar, deduplicador=deduplicador
+                )
+                destino.activar(vectorstore, version, indice)
+            else:
+                # Volver a cargar un documento lo sustituye en lugar de duplicar sus vectores
+                print(f"🔢 Extrayendo, dividiendo y agregando vectores a '{destino.nombre}'...")
+                destino.agregar(fragmentos, notificar, [pdf.nombre for pdf in pdfs], deduplicador=deduplicador)
+            PERFILADOR.marcar("vectores_escritos")
+
+            print(f"✅ {flujo.paginas} páginas, {flujo.fragmentos} fragmentos")
+            if deduplicador is not None:
+                print(
+                    f"🧹 {deduplicador.eliminados} duplicados eliminados "
+                    f"({deduplicador.duplicados_exactos} exactos, {deduplicador.casi_duplicados} similares); "
+                    f"{flujo.fragmentos - deduplicador.eliminados} fragmentos únicos"
+                )
+            if self.cache_paginas is not None:
+                print(f"🗃️  Caché de páginas: {self.cache_paginas.aciertos} aciertos, {self.cache_paginas.fallos} extracciones")
+            print("💾 Base de datos vectorial persistida")
+        self.colecciones.usar(destino.nombre)
+        PERFILADOR.marcar("vectores_activados")
+
+    def _coleccion_modificable(self, coleccion=None):
+        destino = self.colecciones.obtener(coleccion)
+        if destino.solo_lectura:
+            raise ValueError(
+                f"La colección '{destino.nombre}' es una instantánea montada de solo lectura; "
+                "usa importar_instantanea() para poder modificarla"
+            )
+        return destino
 
-        # Crear vectorstore
-        print("🔢 Generando embeddings y almacenando vectores...")
-        self.vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory,
-        )
+    def eliminar_documentos(self, fuentes: List[str], colecciones=None) -> int:
+        """
+        Elimina documentos ya cargados sin reconstruir la base
+
+        Args:
+            fuentes: Rutas o nombres de archivo (como aparecen en las fuentes)
+            colecciones: Ver consultar()
 
-        print("💾 Base de datos vectorial persistida")
-        self._crear_qa_chain()
+        Returns:
+            Número de fragmentos quitados (borrados, o desvinculados si otro
+            documento comparte el mismo texto)
+        """
+        eliminados = 0
+        for nombre in self.colecciones.resolver(colecciones):
+            eliminados += self._coleccion_modificable(nombre).eliminar_fuentes(fuentes)
+        print(f"🗑️  {eliminados} fragmentos quitados de {len(fuentes)} documentos")
+        return eliminados
 
-    def cargar_vectorstore_existente(self):
+    def _iterar_paginas(self, pdf: DocumentoPDF):
+        """
+        Páginas de un PDF de una en una, pasando primero por la caché de páginas
         """
-        Carga vectorstore previamente guardado
+        if self.cache_paginas is not None:
+            return self.cache_paginas.iterar(pdf)
+        return pdf.iterar_paginas()
+
+    def cargar_vectorstore_existente(self, coleccion=None):
+        """
+        Carga vectorstore previamente guardado (versión activa)
+
+        Args:
+            coleccion: Curso a cargar (None = predeterminada)
         """
         try:
             print("📂 Cargando base de datos existente...")
-            self.vectorstore = Chroma(
-                persist_directory=self.persist_directory, embedding_function=self.embeddings
-            )
-            self._crear_qa_chain()
+            self.colecciones.obtener(coleccion).cargar(recargar=True)
             print("✅ Base de datos cargada")
         except Exception as e:
             print(f"❌ Error al cargar base de datos: {str(e)}")
             print("💡 Asegúrate de haber cargado documentos primero")
             raise
 
-    def _crear_qa_chain(self, top_k=None):
+    def exportar_instantanea(self, ruta: str, coleccion=None) -> Dict:
         """
-        Crea la cadena de pregunta-respuesta
-        
-        Args:
-            top_k: Número de fragmentos a recuperar (usa self.top_k si no se especifica)
+        Escribe la versión activa de una colección en un solo archivo (ver instantanea.py)
+
+        Returns:
+            El manifiesto de la instantánea
+        """
+        cabecera = escribir_instantanea(self.colecciones.obtener(coleccion), ruta, MODELO_EMBEDDINGS)
+        tamano = os.path.getsize(ruta) / 1e6
+        print(f"📦 Instantánea de '{cabecera['coleccion']}' v{cabecera['version']}: "
+              f"{cabecera['fragmentos']} fragmentos, {tamano:.1f} MB en {ruta}")
+        return cabecera
+
+    def _abrir_instantanea(self, ruta: str, coleccion=None) -> ColeccionInstantanea:
+        montada = ColeccionInstantanea.abrir(ruta)
+        modelo = montada.instantanea.cabecera["modelo_embeddings"]
+        if modelo != MODELO_EMBEDDINGS:
+            raise ValueError(f"La instantánea usa el modelo de embeddings {modelo}, no {MODELO_EMBEDDINGS}")
+        montada.nombre = self.colecciones.obtener(coleccion or montada.nombre).nombre
+        return montada
+
+    def montar_instantanea(self, ruta: str, coleccion=None) -> str:
         """
-        if top_k is None:
-            top_k = self.top_k
-            
-        # Prompt en español optimizado para contexto académico
-        template = """Eres un asistente académico experto. Usa el siguiente contexto para responder la pregunta del estudiante.
+        Sirve una colección directamente desde una instantánea (mmap, solo lectura)
 
-Si no sabes la respuesta con base en el contexto proporcionado, di claramente "No tengo suficiente información en los documentos para responder esa pregunta".
+        No abre Chroma ni copia vectores: la primera consulta se responde en
+        cuanto el modelo de embeddings está cargado.
 
-Contexto:
-{context}
+        Args:
+            ruta: Archivo de instantánea
+            coleccion: Nombre bajo el que se sirve (None = el de la instantánea)
 
-Pregunta: {question}
+        Returns:
+            Nombre de la colección montada
+        """
+        inicio = time.perf_counter()
+        nombre = self.colecciones.montar(self._abrir_instantanea(ruta, coleccion))
+        print(f"📦 Instantánea montada como '{nombre}' ({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+        return nombre
 
-Respuesta detallada y académica:"""
+    def importar_instantanea(self, ruta: str, coleccion=None):
+        """
+        Copia una instantánea a Chroma como nueva versión (sin recalcular embeddings)
+        """
+        montada = self._abrir_instantanea(ruta, coleccion)
+        destino = self._coleccion_modificable(montada.nombre)
+        with destino.lock_escritura:
+            vectorstore, version, indice = destino.construir_version([], montada, lambda *_: None)
+            destino.activar(vectorstore, version, indice)
+        montada.instantanea.cerrar()
+        print(f"📥 Instantánea importada en '{destino.nombre}' v{version} ({len(indice)} fragmentos)")
+
+    def configurar_indice(self, config: ConfigIndice, coleccion=None) -> bool:
+        """
+        Cambia y guarda los parámetros HNSW de una colección (ver Coleccion.configurar_indice)
 
-        PROMPT = PromptTemplate(
-            template=template, input_variables=["context", "question"]
-        )
+        Returns:
+            True si hubo que reconstruir el índice
+        """
+        return self._coleccion_modificable(coleccion).configurar_indice(config)
 
-        # Crear chain con retrieval
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": top_k}  # Recuperar top_k fragmentos
-            ),
-            chain_type_kwargs={"prompt": PROMPT},
-            return_source_documents=True,
-        )
-    
-    def actualizar_parametros(self, temperatura=None, top_k=None):
+    def actualizar_parametros(self, temperatura=None, top_k=None, top_k_adaptativo=None, comprimir_contexto=None):
         """
-        Actualiza parámetros del modelo y recrea la cadena QA si es necesario
-        
+        Actualiza parámetros del modelo
+
         Args:
-            temperatura: Nueva temperatura (requiere recrear LLM)
-            top_k: Nuevo número de fragmentos (requiere recrear QA chain)
+            temperatura: Nueva temperatura
+            top_k: Nuevo número de fragmentos a recuperar
+            top_k_adaptativo: Activar (True o SelectorTopK) o desactivar (False) el top-k adaptativo
+            comprimir_contexto: Activar (True o CompresorContexto) o desactivar (False) la compresión
         """
         if temperatura is not None and temperatura != self.temperatura:
             self.temperatura = temperatura
-            self.llm = Ollama(
-                model=self.modelo_llama,
-                temperature=temperatura,
-                num_ctx=4096,
-            )
-            if self.qa_chain is not None:
-                self._crear_qa_chain()
-        
+            if self._llm is not None:
+                self._llm.temperatura = temperatura
+
         if top_k is not None and top_k != self.top_k:
             self.top_k = top_k
-            if self.qa_chain is not None:
-                self._crear_qa_chain(top_k=top_k)
 
-    def consultar(self, pregunta: str):
+        if top_k_adaptativo is not None and (top_k_adaptativo is not True or self.selector_top_k is None):
+            self.selector_top_k = SelectorTopK() if top_k_adaptativo is True else (top_k_adaptativo or None)
+
+        if comprimir_contexto is not None and (comprimir_contexto is not True or self.compresor is None):
+            self.compresor = CompresorContexto() if comprimir_contexto is True else (comprimir_contexto or None)
+
+    @property
+    def k_busqueda(self) -> int:
         """
-        Realiza una consulta al asistente
+        Candidatos a recuperar: max_k con top-k adaptativo, top_k si no
+        """
+        return self.selector_top_k.max_k if self.selector_top_k is not None else self.top_k
+
+    def seleccionar_fragmentos(self, candidatos) -> Tuple[List[Recuperado], Dict]:
+        """
+        Se queda con los fragmentos que se enviarán al LLM
+
+        Con top-k adaptativo corta la lista según los puntajes (ver
+        top_k_adaptativo.py); si no, conserva los top_k primeros.
+
+        Args:
+            candidatos: Lista de Recuperado ordenada por puntaje (k_busqueda elementos)
+
+        Returns:
+            (fragmentos elegidos, dict con 'k', 'candidatos', 'motivo' y 'tokens')
+        """
+        if self.selector_top_k is not None:
+            return self.selector_top_k.seleccionar(candidatos)
+        elegidos = list(candidatos)[:self.top_k]
+        return elegidos, {"k": len(elegidos), "candidatos": len(candidatos), "motivo": "fijo",
+                          "tokens": sum(tokens_estimados(r.documento.page_content) for r in elegidos)}
+
+    def buscar(self, pregunta: str, colecciones=None, k: Optional[int] = None,
+               filtros: Optional[Dict] = None, ef: Optional[int] = None) -> List[Recuperado]:
+        """
+        Recupera los fragmentos más relevantes para una pregunta
 
         Args:
             pregunta: Pregunta del estudiante
+            colecciones: None (predeterminada), un curso, una lista de cursos o "todas"
+            k: Número de fragmentos (usa self.top_k si no se especifica)
+            filtros: dict opcional con 'fuentes' (documentos), 'paginas' (desde, hasta)
+                y/o 'etiquetas'; se aplican antes de la búsqueda por similitud
+            ef: ef de búsqueda HNSW para esta consulta (None = el de cada colección)
 
         Returns:
-            dict con 'respuesta' y 'fuentes'
+            Lista de Recuperado ordenada por puntaje
+        """
+        nombres = self.colecciones.resolver(colecciones)
+        vector = self.embeddings.embed_query(pregunta)
+        return self.colecciones.buscar(vector, nombres, k or self.top_k, filtros, ef)
+
+    def fuentes_disponibles(self, colecciones=None) -> Dict[str, List[str]]:
+        """
+        Documentos y etiquetas indexados, para construir filtros
+
+        Returns:
+            dict con 'fuentes' y 'etiquetas' (listas ordenadas)
+        """
+        fuentes, etiquetas = set(), set()
+        for nombre in self.colecciones.resolver(colecciones):
+            coleccion = self.colecciones.obtener(nombre)
+            if not coleccion.existe():
+                continue
+            indice = coleccion.obtener_indice()
+            fuentes.update(indice.nombres_fuentes())
+            etiquetas.update(indice.etiquetas)
+        return {"fuentes": sorted(fuentes), "etiquetas": sorted(etiquetas)}
+
+    def buscar_lote(self, preguntas: List[str], colecciones=None, k: Optional[int] = None,
+                    filtros: Optional[Dict] = None, ef: Optional[int] = None) -> List[List[Recuperado]]:
+        """
+        Recupera fragmentos para varias preguntas a la vez
+
+        Los embeddings se calculan en un solo lote y cada colección recibe una
+        única consulta con todos los vectores.
+
+        Returns:
+            Una lista de Recuperado por pregunta, en el mismo orden
+        """
+        nombres = self.colecciones.resolver(colecciones)
+        vectores = self.embeddings.embed_documents(list(preguntas))
+        return self.colecciones.buscar_lote(vectores, nombres, k or self.top_k, filtros, ef)
+
+    def comprimir_fuentes(self, pregunta: str, fuentes) -> Tuple[List, Optional[Dict]]:
         """
-        if self.qa_chain is None:
-            return {"respuesta": "❌ Primero debes cargar documentos", "fuentes": []}
+        Reduce los fragmentos a sus oraciones relevantes para el prompt (ver compresion.py)
 
+        Los Documents devueltos conservan los metadatos de los originales; las
+        fuentes que se muestran al usuario siguen siendo los fragmentos completos.
+
+        Returns:
+            (Documents para el prompt, dict con el ahorro o None si la compresión está desactivada)
+        """
+        if self.compresor is None or not fuentes:
+            return list(fuentes), None
+        comprimidas, info = self.compresor.comprimir(pregunta, fuentes, self.embeddings)
+        print(f"🗜️  Contexto comprimido: {resumen_compresion(info)}")
+        return comprimidas, info
+
+    def evaluar_relevancia(self, pregunta: str, recuperados) -> Optional[Dict]:
+        """
+        Señales de la compuerta de relevancia (None si está desactivada)
+
+        Returns:
+            dict con 'similitud', 'brecha', 'solapamiento' y 'relevante'
+        """
+        if self.compuerta is None:
+            return None
+        return self.compuerta.evaluar(pregunta, recuperados)
+
+    def generar(self, pregunta: str, fuentes, prioridad: str = INTERACTIVA,
+                plazo: Optional[float] = None) -> str:
+        """
+        Genera la respuesta con el contexto "stuff" (fragmentos concatenados)
+
+        Args:
+            prioridad: 'interactiva' o 'lote' (ver planificador.py)
+            plazo: Segundos máximos hasta tener respuesta (None = el de la prioridad)
+
+        Raises:
+            RechazoGeneracion: si el planificador no puede admitirla a tiempo
+        """
+        contexto = "\n\n".join(doc.page_content for doc in fuentes)
+        prompt = PLANTILLA_PROMPT.format(context=contexto, question=pregunta)
+        with self.planificador.turno(prioridad, plazo):
+            return self.llm.generar(prompt).texto
+
+    def generar_stream(self, pregunta: str, fuentes, prioridad: str = INTERACTIVA,
+                       plazo: Optional[float] = None):
+        """
+        Igual que generar() pero entregando la respuesta por partes
+
+        El hueco del planificador se mantiene hasta que termina el flujo.
+
+        Yields:
+            Fragmentos de texto de la respuesta
+        """
+        contexto = "\n\n".join(doc.page_content for doc in fuentes)
+        prompt = PLANTILLA_PROMPT.format(context=contexto, question=pregunta)
+        with self.planificador.turno(prioridad, plazo):
+            for parte in self.llm.generar_stream(prompt):
+                if not isinstance(parte, Generacion):
+                    yield parte
+
+    def consultar(self, pregunta: str, colecciones=None, filtros: Optional[Dict] = None,
+                  prioridad: str = INTERACTIVA, plazo: Optional[float] = None, ef: Optional[int] = None):
+        """
+        Realiza una consulta al asistente
+
+        Args:
+            pregunta: Pregunta del estudiante
+            colecciones: None (predeterminada), un curso, una lista de cursos o "todas"
+            filtros: Ver buscar()
+            prioridad: 'interactiva' (usuarios) o 'lote' (evaluaciones)
+            plazo: Segundos máximos hasta tener respuesta (None = el de la prioridad)
+            ef: ef de búsqueda HNSW para esta consulta (ver buscar())
+
+        Returns:
+            dict con 'respuesta', 'fuentes' (Documents), 'puntajes', 'ids',
+            'colecciones' (colección de cada fragmento), 'k' (fragmentos enviados),
+            'seleccion_k' (motivo del corte; ver seleccionar_fragmentos) y
+            'compresion' (ahorro del contexto, None si no se comprime). Si el LLM está
+            saturado la respuesta es un aviso y se añade 'degradada': True;
+            si los fragmentos no son relevantes se responde sin generar y se
+            añade 'sin_generacion': True con las señales en 'relevancia'.
+        """
         print(f"\n❓ Pregunta: {pregunta}")
+        if self.coalescedor is None:
+            resultado = self._consultar(pregunta, colecciones, filtros, prioridad, plazo, ef)
+        else:
+            clave = self.clave_consulta(pregunta, colecciones, filtros, prioridad=prioridad, ef=ef)
+            resultado = self.coalescedor.ejecutar(
+                clave, lambda: self._consultar(pregunta, colecciones, filtros, prioridad, plazo, ef)
+            )
+        PERFILADOR.marcar("consulta_respondida")
+        # Cada llamador recibe su propio dict (las listas se comparten)
+        return dict(resultado)
+
+    def clave_consulta(self, pregunta: str, colecciones=None, filtros: Optional[Dict] = None,
+                       k: Optional[int] = None, prioridad: str = INTERACTIVA, ef: Optional[int] = None) -> str:
+        """
+        Clave con la que se unen consultas idénticas en curso (ver coalescencia.py)
+        """
+        nombres = self.colecciones.resolver(colecciones)
+        return clave_consulta(
+            pregunta,
+            self.colecciones.versiones(nombres),
+            persist_directory=os.path.abspath(self.persist_directory),
+            modelo=self._llm.modelo if self._llm is not None else self.modelo_llama,
+            backend=self._llm.nombre if self._llm is not None else "ollama",
+            temperatura=self.temperatura,
+            top_k=k or self.top_k,
+            top_k_adaptativo=self.selector_top_k.a_dict() if self.selector_top_k is not None and not k else None,
+            compresion=self.compresor.a_dict() if self.compresor is not None else None,
+            filtros={nombre: valor for nombre, valor in (filtros or {}).items() if valor},
+            # Una consulta interactiva no debe esperar detrás de un lote encolado
+            prioridad=prioridad,
+            ef=ef,
+        )
+
+    def _recuperar(self, consulta: str, colecciones=None, filtros: Optional[Dict] = None,
+                   ef: Optional[int] = None) -> Tuple[List[Recuperado], Dict]:
+        """
+        Búsqueda, selección de k y compuerta de relevancia comunes a consultar() y conversar()
+
+        Args:
+            consulta: Texto con el que se busca (la pregunta o su versión reescrita)
+
+        Returns:
+            (fragmentos elegidos, dict de resultado con 'fuentes', 'puntajes', 'ids',
+            'colecciones', 'k' y 'seleccion_k'). Si no hay que generar (sin
+            fragmentos o poco relevantes) el dict ya trae 'respuesta'.
+        """
+        # Las colecciones se cargan bajo demanda; sin datos no hay nada que consultar
+        candidatos = self.buscar(consulta, colecciones, k=self.k_busqueda, filtros=filtros, ef=ef)
+        recuperados, seleccion = self.seleccionar_fragmentos(candidatos)
+        PERFILADOR.marcar("consulta_recuperada")
+        resultado = {
+            "fuentes": [r.documento for r in recuperados],
+            "puntajes": [r.puntaje for r in recuperados],
+            "ids": [r.id for r in recuperados],
+            "colecciones": [r.coleccion for r in recuperados],
+            "k": seleccion["k"],
+            "seleccion_k": seleccion,
+        }
+        if not recuperados and filtros and any(filtros.values()):
+            resultado["respuesta"] = "❌ Ningún fragmento cumple los filtros seleccionados"
+        elif not recuperados:
+            resultado["respuesta"] = "❌ Primero debes cargar documentos"
+        else:
+            # La compuerta se calibró con top_k fragmentos, no con la selección adaptativa
+            relevancia = self.evaluar_relevancia(consulta, candidatos[:self.top_k])
+            if relevancia is not None and not relevancia["relevante"]:
+                # La plantilla respondería lo mismo tras una generación completa
+                print("🚫 Fragmentos poco relevantes: se responde sin consultar al LLM")
+                resultado.update(respuesta=RESPUESTA_SIN_INFORMACION, sin_generacion=True, relevancia=relevancia)
+        return recuperados, resultado
+
+    def _consultar(self, pregunta: str, colecciones=None, filtros: Optional[Dict] = None,
+                   prioridad: str = INTERACTIVA, plazo: Optional[float] = None, ef: Optional[int] = None):
         print("🔍 Buscando información relevante...")
+        recuperados, resultado = self._recuperar(pregunta, colecciones, filtros, ef)
+        if "respuesta" in resultado:
+            return resultado
+
+        fuentes = resultado["fuentes"]
+        contexto, resultado["compresion"] = self.comprimir_fuentes(pregunta, fuentes)
+        try:
+            resultado["respuesta"] = self.generar(pregunta, contexto, prioridad, plazo)
+        except RechazoGeneracion as e:
+            # Mejor las fuentes ahora que un timeout dentro de varios minutos
+            print(f"⏳ Generación rechazada ({e.motivo}): se devuelven solo las fuentes")
+            resultado.update(respuesta=MENSAJE_SATURADO, degradada=True, motivo=e.motivo)
+        return resultado
+
+    def conversar(self, pregunta: str, conversacion: Conversacion, colecciones=None,
+                  filtros: Optional[Dict] = None, reutilizar_contexto: bool = True):
+        """
+        Consulta en modo conversación (preguntas de seguimiento)
+
+        La búsqueda usa una consulta reescrita con el historial. Si el contexto
+        de Ollama del turno anterior sigue siendo válido, solo se envían la
+        pregunta y los fragmentos que aún no estaban en el contexto; si no, se
+        envía el prompt completo y se reinicia el contexto.
+
+        Args:
+            pregunta: Pregunta del estudiante
+            conversacion: Estado de la conversación (se actualiza)
+            colecciones: Ver consultar()
+            filtros: Ver buscar()
+            reutilizar_contexto: False envía siempre el prompt completo (línea base)
+
+        Returns:
+            dict como consultar() más 'consulta_busqueda', 'contexto_reutilizado',
+            'tokens_prompt' y 'segundos_prefill'
+        """
+        consulta = conversacion.reescribir(pregunta)
+        recuperados, resultado = self._recuperar(consulta, colecciones, filtros)
+        resultado["consulta_busqueda"] = consulta
+        if "respuesta" in resultado:
+            # Sin generación el turno no se registra: el contexto de Ollama sigue siendo el anterior
+            resultado.update(contexto_reutilizado=False, tokens_prompt=0, segundos_prefill=0.0)
+            return resultado
+
+        # Con compresión, un fragmento ya enviado solo aportó sus oraciones relevantes a esa pregunta
+        comprimidos, compresion = self.comprimir_fuentes(consulta, [r.documento for r in recuperados])
+        textos = {(r.coleccion, r.id): doc.page_content for r, doc in zip(recuperados, comprimidos)}
+        nuevos = [r for r in recuperados if (r.coleccion, r.id) not in conversacion.ids_en_contexto]
+        contexto_adicional = "\n\n".join(textos[(r.coleccion, r.id)] for r in nuevos)
+        prompt = PLANTILLA_SEGUIMIENTO.format(
+            contexto_adicional=PLANTILLA_CONTEXTO_ADICIONAL.format(context=contexto_adicional) if nuevos else "",
+            question=pregunta,
+        )
+
+        # ~3 caracteres por token es una estimación conservadora para español
+        llm = self.llm
+        reutilizar = reutilizar_contexto and llm.soporta_contexto and conversacion.puede_reutilizar(
+            llm.modelo, len(prompt) // 3, NUM_CTX
+        )
+        if reutilizar:
+            enviados = nuevos
+        else:
+            enviados = recuperados
+            prompt = PLANTILLA_PROMPT.format(
+                context="\n\n".join(textos[(r.coleccion, r.id)] for r in recuperados), question=pregunta
+            )
+
+        try:
+            with self.planificador.turno(INTERACTIVA):
+                generacion = llm.generar(prompt, conversacion.contexto if reutilizar else None)
+        except RechazoGeneracion as e:
+            # El turno no se registra: el contexto de Ollama sigue siendo el anterior
+            print(f"⏳ Generación rechazada ({e.motivo}): se devuelven solo las fuentes")
+            resultado.update(
+                respuesta=MENSAJE_SATURADO, compresion=compresion, contexto_reutilizado=False,
+                tokens_prompt=0, segundos_prefill=0.0, degradada=True, motivo=e.motivo,
+            )
+            return resultado
+        conversacion.registrar(
+            pregunta, generacion.texto, generacion.contexto, llm.modelo,
+            [(r.coleccion, r.id) for r in enviados], reutilizado=reutilizar,
+        )
+
+        resultado.update(
+            respuesta=generacion.texto, compresion=compresion, contexto_reutilizado=reutilizar,
+            tokens_prompt=generacion.tokens_prompt, segundos_prefill=generacion.segundos_prefill,
+        )
+        return resultado
+
+    def obtener_fragmentos(self, referencias) -> List:
+        """
+        Recupera fragmentos ya citados a partir de sus ids
+
+        Args:
+            referencias: Lista de pares (coleccion, id) como los devuelve consultar()
+
+        Returns:
+            Lista de Documents en el mismo orden (None si el fragmento ya no existe)
+        """
+        por_coleccion = {}
+        for coleccion, id_ in referencias:
+            por_coleccion.setdefault(coleccion, []).append(id_)
 
-        resultado = self.qa_chain({"query": pregunta})
+        encontrados = {}
+        for coleccion, ids in por_coleccion.items():
+            for id_, doc in self.colecciones.obtener(coleccion).obtener_fragmentos(ids).items():
+                encontrados[(coleccion, id_)] = doc
+        return [encontrados.get((coleccion, id_)) for coleccion, id_ in referencias]
 
-        respuesta = resultado["result"]
-        fuentes = resultado["source_documents"]
+    def reporte_memoria(self, sesion=None, caches: Optional[Dict] = None) -> Dict:
+        """
+        Memoria del proceso desglosada por componente (ver memoria.py)
+
+        Args:
+            sesion: Estado de la sesión de Streamlit (st.session_state) a incluir
+            caches: Cachés de respuestas adicionales por nombre (p. ej. las del servidor)
 
-        return {"respuesta": respuesta, "fuentes": fuentes}
+        Returns:
+            dict serializable a JSON (ver memoria.reporte_memoria)
+        """
+        with _lock_embeddings:
+            modelos = {
+                f"{modelo} ({dispositivo}, {modo}, hilos={hilos or 'auto'}, cpus={list(cpus) if cpus else 'todas'})": m
+                for (modelo, dispositivo, modo, hilos, cpus), m in _embeddings_cargados.items()
+            }
+        colecciones = {nombre: self.colecciones.obtener(nombre) for nombre in self.colecciones.residentes()}
+        return reporte_memoria(
+            modelos=modelos,
+            colecciones=colecciones,
+            caches={"coalescedor": self.coalescedor, "compresion": self.compresor, **(caches or {})},
+            sesion=sesion,
+            excluir=[self],
+        )
 
     def mostrar_fuentes(self, fuentes):
         """
@@ -207,6 +954,10 @@ Respuesta detallada y académica:"""
             source = doc.metadata.get("source", "Desconocido")
             page = doc.metadata.get("page", "?")
             print(f"\n  [{i}] {os.path.basename(source)} - Página {page}")
+            otras = [ref for ref in referencias_de(doc) if ref != (source, page)]
+            if otras:
+                copias = ", ".join(f"{os.path.basename(str(s))} p.{p}" for s, p in otras)
+                print(f"      También en: {copias}")
             print(f"      {doc.page_content[:200]}...")
 
 
@@ -0,0 +1,498 @@
+"""
+Backends de generación intercambiables para AsistenteAcademico.
+
+Todos ofrecen la misma interfaz: generación síncrona, asíncrona y por
+partes (streaming), con contabilidad de tokens. BackendOllama habla con un
+servidor Ollama; BackendFalso genera respuestas deterministas en el mismo
+proceso, con latencia, velocidad y tasa de fallos configurables, para
+probar y medir recuperación, cachés y concurrencia sin modelo ni GPU.
+BackendPoolOllama reparte las generaciones entre varios servidores Ollama.
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from cliente_ollama import OLLAMA_BASE_URL, ClienteOllama, Generacion
+
+
+class ErrorBackendLLM(RuntimeError):
+    """
+    Fallo de generación (real o simulado por BackendFalso)
+    """
+
+
+class BackendLLM:
+    """
+    Interfaz común de los backends de generación
+
+    generar_stream() entrega partes de texto (str) y, como último elemento,
+    la Generacion completa con el contexto y las estadísticas.
+    """
+
+    nombre = "base"
+    soporta_contexto = False
+
+    def __init__(self, modelo: str, temperatura: float = 0.3):
+        self.modelo = modelo
+        self.temperatura = temperatura
+        self._lock_contadores = threading.Lock()
+        self.llamadas = 0
+        self.fallos = 0
+        self.total_tokens_prompt = 0
+        self.total_tokens_respuesta = 0
+        self.segundos = 0.0
+
+    def _generar(self, prompt: str, contexto: Optional[List[int]]) -> Generacion:
+        raise NotImplementedError
+
+    def _generar_stream(self, prompt: str, contexto: Optional[List[int]]) -> Iterator:
+        # Por defecto: una sola parte con la respuesta completa
+        generacion = self._generar(prompt, contexto)
+        yield generacion.texto
+        yield generacion
+
+    def _contabilizar(self, generacion: Optional[Generacion], segundos: float):
+        with self._lock_contadores:
+            self.llamadas += 1
+            self.segundos += segundos
+            if generacion is None:
+                self.fallos += 1
+            else:
+                self.total_tokens_prompt += generacion.tokens_prompt
+                self.total_tokens_respuesta += generacion.tokens_respuesta
+
+    def generar(self, prompt: str, contexto: Optional[List[int]] = None) -> Generacion:
+        """
+        Genera una respuesta completa
+
+        Args:
+            prompt: Texto a enviar
+            contexto: Contexto devuelto por una generación anterior (si el backend lo soporta)
+        """
+        inicio = time.perf_counter()
+        generacion = None
+        try:
+            generacion = self._generar(prompt, contexto)
+            return generacion
+        finally:
+            self._contabilizar(generacion, time.perf_counter() - inicio)
+
+    async def agenerar(self, prompt: str, contexto: Optional[List[int]] = None) -> Generacion:
+        """
+        Versión asíncrona de generar() (por defecto en un hilo aparte)
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.generar, prompt, contexto)
+
+    def generar_stream(self, prompt: str, contexto: Optional[List[int]] = None) -> Iterator:
+        """
+        Genera la respuesta por partes
+
+        Yields:
+            Partes de texto (str) y al final la Generacion completa
+        """
+        inicio = time.perf_counter()
+        generacion = None
+        try:
+            for parte in self._generar_stream(prompt, contexto):
+                if isinstance(parte, Generacion):
+                    generacion = parte
+                yield parte
+        finally:
+            self._contabilizar(generacion, time.perf_counter() - inicio)
+
+    def estadisticas(self) -> Dict:
+        with self._lock_contadores:
+            return {
+                "backend": self.nombre,
+                "modelo": self.modelo,
+                "llamadas": self.llamadas,
+                "fallos": self.fallos,
+                "tokens_prompt": self.total_tokens_prompt,
+                "tokens_respuesta": self.total_tokens_respuesta,
+                "segundos": round(self.segundos, 4),
+            }
+
+
+class BackendOllama(BackendLLM):
+    """
+    Generación con un servidor Ollama (/api/generate)
+    """
+
+    nombre = "ollama"
+    soporta_contexto = True
+
+    def __init__(self, modelo: str, base_url: str = OLLAMA_BASE_URL, temperatura: float = 0.3,
+                 num_ctx: int = 4096, keep_alive: str = "30m", timeout: float = 300.0):
+        super().__init__(modelo, temperatura)
+        self.cliente = ClienteOllama(modelo, base_url, temperatura, num_ctx, keep_alive, timeout)
+
+    @property
+    def base_url(self) -> str:
+        return self.cliente.base_url
+
+    def _generar(self, prompt: str, contexto: Optional[List[int]]) -> Generacion:
+        self.cliente.temperatura = self.temperatura
+        try:
+            return self.cliente.generar(prompt, contexto)
+        except Exception as e:
+            raise ErrorBackendLLM(f"Ollama ({self.base_url}): {str(e)}") from e
+
+    def _generar_stream(self, prompt: str, contexto: Optional[List[int]]) -> Iterator:
+        self.cliente.temperatura = self.temperatura
+        try:
+            yield from self.cliente.generar_stream(prompt, contexto)
+        except Exception as e:
+            raise ErrorBackendLLM(f"Ollama ({self.base_url}): {str(e)}") from e
+
+
+class _NodoOllama:
+    """
+    Un servidor Ollama del pool y su estado de salud
+    """
+
+    def __init__(self, cliente: ClienteOllama):
+        self.cliente = cliente
+        self.en_curso = 0
+        self.sano = True
+        self.fallos_consecutivos = 0
+        self.expulsado_hasta = 0.0
+        self.expulsiones = 0
+        self.readmisiones = 0
+        self.llamadas = 0
+        self.errores = 0
+        self.latencias = deque(maxlen=200)
+        # Últimas transiciones de salud: (hora Unix, 'expulsado' | 'readmitido')
+        self.eventos = deque(maxlen=50)
+
+    def expulsar(self, segundos: float):
+        self.sano = False
+        self.expulsiones += 1
+        self.expulsado_hasta = time.monotonic() + segundos
+        self.eventos.append((time.time(), "expulsado"))
+
+    def readmitir(self):
+        self.sano = True
+        self.fallos_consecutivos = 0
+        self.readmisiones += 1
+        self.eventos.append((time.time(), "readmitido"))
+
+    @property
+    def url(self) -> str:
+        return self.cliente.base_url
+
+    def estadisticas(self) -> Dict:
+        latencias = np.asarray(self.latencias, dtype=float)
+        return {
+            "url": self.url,
+            "sano": self.sano,
+            "en_curso": self.en_curso,
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "expulsiones": self.expulsiones,
+            "readmisiones": self.readmisiones,
+            "eventos": [{"hora": round(hora, 3), "evento": evento} for hora, evento in self.eventos],
+            "latencia_p50_s": round(float(np.percentile(latencias, 50)), 4) if latencias.size else None,
+            "latencia_p95_s": round(float(np.percentile(latencias, 95)), 4) if latencias.size else None,
+        }
+
+
+class BackendPoolOllama(BackendLLM):
+    """
+    Varios servidores Ollama con el mismo modelo, balanceados por menor carga
+
+    Cada generación va al nodo sano con menos peticiones en curso. Un nodo
+    que falla max_fallos veces seguidas se expulsa durante tiempo_expulsion
+    segundos; un hilo de fondo consulta /api/tags de todos los nodos y
+    readmite a los expulsados cuando vuelven a responder. Si una llamada
+    falla antes de entregar texto se reintenta en otro nodo. Expulsiones y
+    readmisiones quedan en estadisticas()["nodos"] (el hilo de salud no
+    escribe en la consola).
+
+    El contexto de conversación (tokens) vale en cualquier nodo con el mismo
+    modelo, aunque solo el nodo que lo generó lo tiene ya procesado.
+    """
+
+    nombre = "pool_ollama"
+    soporta_contexto = True
+
+    def __init__(self, modelo: str, base_urls: List[str], temperatura: float = 0.3, num_ctx: int = 4096,
+                 keep_alive: str = "30m", timeout: float = 300.0, max_conexiones: int = 10,
+                 max_fallos: int = 3, tiempo_expulsion: float = 10.0, intervalo_salud: float = 5.0,
+                 reintentos: int = 1):
+        """
+        Args:
+            modelo: Modelo de Ollama (el mismo en todos los nodos)
+            base_urls: URLs de los servidores Ollama
+            temperatura, num_ctx, keep_alive, timeout: Ver ClienteOllama
+            max_conexiones: Conexiones persistentes por nodo
+            max_fallos: Fallos seguidos que expulsan a un nodo
+            tiempo_expulsion: Segundos mínimos fuera del pool antes de volver a probarlo
+            intervalo_salud: Segundos entre comprobaciones de salud (0 = sin hilo de salud)
+            reintentos: Nodos adicionales a probar si una llamada falla
+        """
+        if not base_urls:
+            raise ValueError("El pool necesita al menos una URL de Ollama")
+        super().__init__(modelo, temperatura)
+        self.nodos = [
+            _NodoOllama(ClienteOllama(modelo, url, temperatura, num_ctx, keep_alive, timeout, max_conexiones))
+            for url in dict.fromkeys(base_urls)
+        ]
+        self.max_fallos = max_fallos
+        self.tiempo_expulsion = tiempo_expulsion
+        self.reintentos = reintentos
+        self._lock_nodos = threading.Lock()
+        self._turno = 0
+
+        self._detener = threading.Event()
+        self._hilo_salud = None
+        if intervalo_salud > 0:
+            self._hilo_salud = threading.Thread(
+                target=self._vigilar, args=(intervalo_salud,), name="salud-ollama", daemon=True
+            )
+            self._hilo_salud.start()
+
+    @property
+    def base_url(self) -> str:
+        return ",".join(nodo.url for nodo in self.nodos)
+
+    # ---------- balanceo ----------
+
+    def _elegir(self, excluidos) -> Optional[_NodoOllama]:
+        """
+        Nodo sano con menos peticiones en curso (empates por turno rotatorio)
+
+        Si no queda ninguno sano se prueba el expulsado que antes cumple su
+        expulsión, para no dejar de responder por completo.
+        """
+        with self._lock_nodos:
+            candidatos = [n for n in self.nodos if n not in excluidos]
+            if not candidatos:
+                return None
+            sanos = [n for n in candidatos if n.sano]
+            if sanos:
+                self._turno += 1
+                orden = {id(n): (i - self._turno) % len(self.nodos) for i, n in enumerate(self.nodos)}
+                nodo = min(sanos, key=lambda n: (n.en_curso, orden[id(n)]))
+            else:
+                nodo = min(candidatos, key=lambda n: n.expulsado_hasta)
+            nodo.en_curso += 1
+            return nodo
+
+    def _registrar(self, nodo: _NodoOllama, segundos: float, exito: Optional[bool]):
+        # exito=None: llamada abandonada por el consumidor, no cuenta para el nodo
+        with self._lock_nodos:
+            nodo.en_curso -= 1
+            if exito is None:
+                return
+            nodo.llamadas += 1
+            if exito:
+                nodo.latencias.append(segundos)
+                nodo.fallos_consecutivos = 0
+                if not nodo.sano:
+                    # Era el único candidato y respondió: vuelve al pool sin esperar a la salud
+                    nodo.readmitir()
+            else:
+                nodo.errores += 1
+                self._fallo(nodo)
+
+    def _fallo(self, nodo: _NodoOllama):
+        nodo.fallos_consecutivos += 1
+        if nodo.sano and nodo.fallos_consecutivos >= self.max_fallos:
+            nodo.expulsar(self.tiempo_expulsion)
+
+    # ---------- salud ----------
+
+    def _vigilar(self, intervalo: float):
+        while not self._detener.wait(intervalo):
+            self.comprobar_salud()
+
+    def comprobar_salud(self):
+        """
+        Consulta /api/tags de cada nodo: cuenta fallos de los sanos y readmite
+        a los expulsados que ya cumplieron su expulsión y responden
+        """
+        for nodo in self.nodos:
+            if not nodo.sano and time.monotonic() < nodo.expulsado_hasta:
+                continue
+            responde = nodo.cliente.salud()
+            with self._lock_nodos:
+                if responde and not nodo.sano:
+                    nodo.readmitir()
+                elif not responde:
+                    if not nodo.sano:
+                        nodo.expulsado_hasta = time.monotonic() + self.tiempo_expulsion
+                    self._fallo(nodo)
+
+    def cerrar(self):
+        """
+        Detiene el hilo de comprobación de salud
+        """
+        self._detener.set()
+
+    # ---------- generación ----------
+
+    def _generar(self, prompt: str, contexto: Optional[List[int]]) -> Generacion:
+        excluidos, ultimo_error = [], None
+        for _ in range(self.reintentos + 1):
+            nodo = self._elegir(excluidos)
+            if nodo is None:
+                break
+            nodo.cliente.temperatura = self.temperatura
+            inicio = time.perf_counter()
+            try:
+                generacion = nodo.cliente.generar(prompt, contexto)
+            except Exception as e:
+                self._registrar(nodo, time.perf_counter() - inicio, exito=False)
+                excluidos.append(nodo)
+                ultimo_error = e
+                continue
+            self._registrar(nodo, time.perf_counter() - inicio, exito=True)
+            return generacion
+        raise ErrorBackendLLM(f"Ningún nodo Ollama respondió ({', '.join(n.url for n in excluidos)}): {ultimo_error}")
+
+    def _generar_stream(self, prompt: str, contexto: Optional[List[int]]) -> Iterator:
+        excluidos, ultimo_error = [], None
+        for _ in range(self.reintentos + 1):
+            nodo = self._elegir(excluidos)
+            if nodo is None:
+                break
+            nodo.cliente.temperatura = self.temperatura
+            inicio = time.perf_counter()
+            entregadas = 0
+            exito = False
+            try:
+                for parte in nodo.cliente.generar_stream(prompt, contexto):
+                    entregadas += 1
+                    yield parte
+                exito = True
+                return
+            except GeneratorExit:
+                exito = None
+                raise
+            except Exception as e:
+                excluidos.append(nodo)
+                ultimo_error = e
+                # Con texto ya entregado no se puede repetir en otro nodo
+                if entregadas:
+                    raise ErrorBackendLLM(f"Ollama ({nodo.url}): {str(e)}") from e
+            finally:
+                self._registrar(nodo, time.perf_counter() - inicio, exito)
+        raise ErrorBackendLLM(f"Ningún nodo Ollama respondió ({', '.join(n.url for n in excluidos)}): {ultimo_error}")
+
+    def estadisticas(self) -> Dict:
+        estadisticas = super().estadisticas()
+        with self._lock_nodos:
+            estadisticas["nodos"] = [nodo.estadisticas() for nodo in self.nodos]
+        return estadisticas
+
+
+def respuesta_falsa(prompt: str, num_tokens: int) -> List[str]:
+    """
+    Tokens de respuesta deterministas a partir del hash del prompt
+    """
+    semilla = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return [f"tok{semilla[i % 32:i % 32 + 4]} " for i in range(num_tokens)]
+
+
+class BackendFalso(BackendLLM):
+    """
+    Backend determinista en proceso, para pruebas y benchmarks sin Ollama
+    """
+
+    nombre = "falso"
+    soporta_contexto = True
+
+    def __init__(self, modelo: str = "falso", temperatura: float = 0.3, latencia: float = 0.0,
+                 tokens_por_segundo: float = 0.0, tokens_respuesta: int = 20,
+                 segundos_prefill_por_token: float = 0.0, tasa_fallos: float = 0.0, semilla: int = 0):
+        """
+        Args:
+            modelo: Nombre que se reporta
+            temperatura: Se guarda pero no afecta la respuesta (es determinista)
+            latencia: Segundos fijos por llamada (red, cola, carga)
+            tokens_por_segundo: Velocidad de generación simulada (0 = instantánea)
+            tokens_respuesta: Tokens de cada respuesta
+            segundos_prefill_por_token: Costo simulado por token nuevo del prompt
+            tasa_fallos: Probabilidad de que una llamada falle con ErrorBackendLLM
+            semilla: Semilla de los fallos (secuencia reproducible)
+        """
+        super().__init__(modelo, temperatura)
+        self.latencia = latencia
+        self.tokens_por_segundo = tokens_por_segundo
+        self.tokens_respuesta = tokens_respuesta
+        self.segundos_prefill_por_token = segundos_prefill_por_token
+        self.tasa_fallos = tasa_fallos
+        self._rng = random.Random(semilla)
+        self._lock_rng = threading.Lock()
+
+    def _preparar(self, prompt: str, contexto: Optional[List[int]]):
+        """
+        Decide si la llamada falla y calcula tokens y tiempos simulados
+        """
+        with self._lock_rng:
+            falla = self._rng.random() < self.tasa_fallos
+        # Con contexto solo se cobra el prefill de la parte nueva
+        tokens_prompt = max(1, len(prompt) // 4)
+        tokens = respuesta_falsa(prompt, self.tokens_respuesta)
+        prefill = tokens_prompt * self.segundos_prefill_por_token
+        por_token = 1.0 / self.tokens_por_segundo if self.tokens_por_segundo else 0.0
+        generacion = Generacion(
+            texto="".join(tokens),
+            contexto=list(contexto or []) + list(range(tokens_prompt + len(tokens))),
+            tokens_prompt=tokens_prompt,
+            tokens_respuesta=len(tokens),
+            segundos_prefill=prefill,
+            segundos_generacion=por_token * len(tokens),
+            segundos_total=self.latencia + prefill + por_token * len(tokens),
+        )
+        return falla, tokens, por_token, generacion
+
+    def _generar(self, prompt: str, contexto: Optional[List[int]]) -> Generacion:
+        falla, _, _, generacion = self._preparar(prompt, contexto)
+        time.sleep(self.latencia + generacion.segundos_prefill)
+        if falla:
+            raise ErrorBackendLLM("Fallo simulado")
+        time.sleep(generacion.segundos_generacion)
+        return generacion
+
+    def _generar_stream(self, prompt: str, contexto: Optional[List[int]]) -> Iterator:
+        falla, tokens, por_token, generacion = self._preparar(prompt, contexto)
+        time.sleep(self.latencia + generacion.segundos_prefill)
+        if falla:
+            raise ErrorBackendLLM("Fallo simulado")
+        for token in tokens:
+            if por_token:
+                time.sleep(por_token)
+            yield token
+        yield generacion
+
+    async def agenerar(self, prompt: str, contexto: Optional[List[int]] = None) -> Generacion:
+        inicio = time.perf_counter()
+        falla, _, _, generacion = self._preparar(prompt, contexto)
+        try:
+            await asyncio.sleep(self.latencia + generacion.segundos_prefill)
+            if falla:
+                raise ErrorBackendLLM("Fallo simulado")
+            await asyncio.sleep(generacion.segundos_generacion)
+        except BaseException:
+            self._contabilizar(None, time.perf_counter() - inicio)
+            raise
+        self._contabilizar(generacion, time.perf_counter() - inicio)
+        return generacion
+
+
+def crear_backend(nombre: str = "ollama", modelo: str = "llama2:7b", **opciones) -> BackendLLM:
+    """
+    Crea un backend por nombre ('ollama', 'pool_ollama' o 'falso')
+    """
+    backends = {"ollama": BackendOllama, "pool_ollama": BackendPoolOllama, "falso": BackendFalso}
+    if nombre not in backends:
+        raise ValueError(f"Backend desconocido: {nombre} (opciones: {sorted(backends)})")
+    return backends[nombre](modelo, **opciones)
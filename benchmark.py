@@ -0,0 +1,192 @@
+"""
+Benchmarks de rendimiento del Asistente Académico RAG.
+
+Uso:
+    python benchmark.py arranque [--repeticiones 5] [--render 2.0] [--con-llm]
+    python benchmark.py seguimiento [--repeticiones 3] [--modelo llama2:7b] [--llm-falso]
+
+Cada medición de arranque se hace en un proceso nuevo para medir en frío.
+El benchmark de seguimiento necesita documentos cargados y Ollama en
+ejecución (o --llm-falso, que simula el costo de prefill por token).
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Imports que hacía asistente.py al cargarse antes de diferirlos
+IMPORTS_ANSIOSOS = (
+    "langchain.chains",
+    "langchain.document_loaders",
+    "langchain.embeddings",
+    "langchain.llms",
+    "langchain.prompts",
+    "langchain.text_splitter",
+    "langchain.vectorstores",
+)
+
+
+def _ejecutar_medicion(argumentos):
+    """
+    Ejecuta este script en un proceso nuevo y devuelve el JSON que imprime
+    """
+    salida = subprocess.run(
+        [sys.executable, __file__, *argumentos],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def _medir_import(modulos):
+    inicio = time.perf_counter()
+    for modulo in modulos:
+        __import__(modulo)
+    print(json.dumps({"segundos": time.perf_counter() - inicio}))
+
+
+def _medir_primera_consulta(precalentar, render, con_llm, persist_directory):
+    inicio = time.perf_counter()
+    from asistente import AsistenteAcademico
+
+    asistente = AsistenteAcademico(persist_directory=persist_directory, precalentar=precalentar)
+    listo = time.perf_counter()
+
+    # Simula el tiempo que tarda la interfaz en dibujarse antes de la primera pregunta
+    time.sleep(render)
+
+    consulta = time.perf_counter()
+    asistente.cargar_vectorstore_existente()
+    pregunta = "¿Qué es RAG y cómo funciona?"
+    if con_llm:
+        asistente.consultar(pregunta)
+    else:
+        asistente.vectorstore.similarity_search(pregunta, k=asistente.top_k)
+    fin = time.perf_counter()
+
+    print(json.dumps({
+        "hasta_asistente_listo": listo - inicio,
+        "primera_consulta": fin - consulta,
+    }))
+
+
+def benchmark_arranque(repeticiones=5, render=2.0, con_llm=False, persist_directory="./chroma_db"):
+    """
+    Compara el tiempo de import y de primera consulta con y sin precalentamiento
+
+    Returns:
+        Dict con medianas en segundos
+    """
+    def mediana(argumentos, campo):
+        return statistics.median(_ejecutar_medicion(argumentos)[campo] for _ in range(repeticiones))
+
+    resultados = {
+        "import_ansioso": mediana(["_import", *IMPORTS_ANSIOSOS], "segundos"),
+        "import_asistente": mediana(["_import", "asistente"], "segundos"),
+    }
+
+    for precalentar in (False, True):
+        argumentos = ["_primera-consulta", "--render", str(render), "--persist-directory", persist_directory]
+        if precalentar:
+            argumentos.append("--precalentar")
+        if con_llm:
+            argumentos.append("--con-llm")
+        mediciones = [_ejecutar_medicion(argumentos) for _ in range(repeticiones)]
+        sufijo = "con_precalentamiento" if precalentar else "sin_precalentamiento"
+        resultados[f"asistente_listo_{sufijo}"] = statistics.median(m["hasta_asistente_listo"] for m in mediciones)
+        resultados[f"primera_consulta_{sufijo}"] = statistics.median(m["primera_consulta"] for m in mediciones)
+
+    return {k: round(v, 4) for k, v in resultados.items()}
+
+
+def benchmark_seguimiento(repeticiones=3, modelo="llama2:7b", persist_directory="./chroma_db",
+                          pregunta="¿Qué es RAG y cómo funciona?",
+                          seguimiento="¿Y cuáles son sus ventajas?", backend_llm=None):
+    """
+    Latencia del segundo turno de una conversación con y sin reutilizar el contexto de Ollama
+
+    Returns:
+        Dict con medianas de segundos, tokens de prompt procesados y segundos de prefill
+    """
+    from asistente import AsistenteAcademico
+    from conversacion import Conversacion
+
+    asistente = AsistenteAcademico(modelo_llama=modelo, persist_directory=persist_directory, backend_llm=backend_llm)
+    asistente.cargar_vectorstore_existente()
+    # Primera llamada fuera de la medición: carga el modelo en Ollama
+    asistente.conversar(pregunta, Conversacion(), reutilizar_contexto=False)
+
+    resultados = {}
+    for reutilizar in (False, True):
+        segundos, tokens, prefill = [], [], []
+        for _ in range(repeticiones):
+            conversacion = Conversacion()
+            asistente.conversar(pregunta, conversacion, reutilizar_contexto=reutilizar)
+
+            inicio = time.perf_counter()
+            resultado = asistente.conversar(seguimiento, conversacion, reutilizar_contexto=reutilizar)
+            segundos.append(time.perf_counter() - inicio)
+            tokens.append(resultado["tokens_prompt"])
+            prefill.append(resultado["segundos_prefill"])
+
+        sufijo = "con_reutilizacion" if reutilizar else "sin_reutilizacion"
+        resultados[f"segundo_turno_{sufijo}"] = round(statistics.median(segundos), 4)
+        resultados[f"tokens_prompt_{sufijo}"] = statistics.median(tokens)
+        resultados[f"prefill_{sufijo}"] = round(statistics.median(prefill), 4)
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del Asistente Académico RAG")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_arranque = sub.add_parser("arranque", help="Tiempo de import y de primera consulta")
+    p_arranque.add_argument("--repeticiones", type=int, default=5)
+    p_arranque.add_argument("--render", type=float, default=2.0,
+                            help="Segundos que tarda la UI en estar lista para preguntar")
+    p_arranque.add_argument("--con-llm", action="store_true", help="Incluir la generación con Ollama")
+    p_arranque.add_argument("--persist-directory", default="./chroma_db")
+
+    p_seguimiento = sub.add_parser("seguimiento", help="Segundo turno con y sin reutilizar contexto")
+    p_seguimiento.add_argument("--repeticiones", type=int, default=3)
+    p_seguimiento.add_argument("--modelo", default="llama2:7b")
+    p_seguimiento.add_argument("--persist-directory", default="./chroma_db")
+    p_seguimiento.add_argument("--llm-falso", action="store_true",
+                               help="Backend falso en proceso (1 ms de prefill por token)")
+
+    # Subcomandos internos: se ejecutan en un proceso nuevo
+    p_import = sub.add_parser("_import")
+    p_import.add_argument("modulos", nargs="+")
+    p_primera = sub.add_parser("_primera-consulta")
+    p_primera.add_argument("--precalentar", action="store_true")
+    p_primera.add_argument("--render", type=float, default=0.0)
+    p_primera.add_argument("--con-llm", action="store_true")
+    p_primera.add_argument("--persist-directory", default="./chroma_db")
+
+    args = parser.parse_args()
+
+    if args.comando == "_import":
+        _medir_import(args.modulos)
+    elif args.comando == "_primera-consulta":
+        _medir_primera_consulta(args.precalentar, args.render, args.con_llm, args.persist_directory)
+    elif args.comando == "arranque":
+        resultados = benchmark_arranque(args.repeticiones, args.render, args.con_llm, args.persist_directory)
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    elif args.comando == "seguimiento":
+        backend = None
+        if args.llm_falso:
+            from backends_llm import BackendFalso
+
+            backend = BackendFalso(args.modelo, segundos_prefill_por_token=0.001)
+        resultados = benchmark_seguimiento(args.repeticiones, args.modelo, args.persist_directory,
+                                           backend_llm=backend)
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
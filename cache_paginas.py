@@ -0,0 +1,222 @@
+"""
+Caché de páginas extraídas de PDFs, direccionada por contenido.
+
+La extracción de texto con PyPDFLoader es el paso de CPU más lento de la
+ingesta. Esta caché guarda el texto y la metadata de cada página en un blob
+comprimido por documento, con clave = hash del archivo + versión del loader,
+de modo que cambiar el chunking solo cueste dividir y generar embeddings.
+
+El blob es un flujo zlib sobre líneas JSON (una por página): se escribe y se
+lee página a página, sin tener nunca el documento entero en memoria.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import zlib
+from typing import Iterator, List, Optional
+
+from documentos_pdf import DocumentoPDF, hash_archivo  # noqa: F401 (hash_archivo se re-exporta)
+
+# Cambiar si cambia la forma de extraer páginas (invalida la caché)
+VERSION_EXTRACTOR = "pypdfloader-1"
+
+# Bytes comprimidos leídos de disco en cada paso de la descompresión
+TAMANO_BLOQUE_LECTURA = 1 << 16
+
+
+def _version_loader() -> str:
+    try:
+        import pypdf
+
+        return f"{VERSION_EXTRACTOR}+pypdf{pypdf.__version__}"
+    except ImportError:
+        return VERSION_EXTRACTOR
+
+
+class _EscrituraBlob:
+    """
+    Escritura incremental de un blob: comprime cada página al recibirla y
+    publica el archivo de forma atómica al cerrar
+    """
+
+    def __init__(self, ruta: str, nivel_compresion: int):
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, self.tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        self.archivo = os.fdopen(fd, "wb")
+        self.compresor = zlib.compressobj(nivel_compresion)
+
+    def escribir(self, pagina):
+        linea = json.dumps(
+            {"page_content": pagina.page_content, "metadata": pagina.metadata},
+            ensure_ascii=False,
+        )
+        self.archivo.write(self.compresor.compress(linea.encode("utf-8") + b"\n"))
+
+    def cerrar(self):
+        try:
+            self.archivo.write(self.compresor.flush())
+            self.archivo.close()
+            os.replace(self.tmp, self.ruta)
+        except BaseException:
+            self.descartar()
+            raise
+
+    def descartar(self):
+        self.archivo.close()
+        if os.path.exists(self.tmp):
+            os.unlink(self.tmp)
+
+
+class CachePaginas:
+    """
+    Caché en disco de páginas extraídas (un blob zlib de líneas JSON por documento)
+    """
+
+    def __init__(self, directorio: str = "./.cache_paginas", nivel_compresion: int = 6):
+        """
+        Args:
+            directorio: Carpeta donde se guardan los blobs
+            nivel_compresion: Nivel de zlib (1 = rápido, 9 = más compacto)
+        """
+        self.directorio = directorio
+        self.nivel_compresion = nivel_compresion
+        self.version_loader = _version_loader()
+        self.aciertos = 0
+        self.fallos = 0
+        os.makedirs(directorio, exist_ok=True)
+
+    def clave(self, hash_contenido: str) -> str:
+        """
+        Clave de caché para un contenido dado y la versión actual del loader
+        """
+        return hashlib.sha256(f"{hash_contenido}:{self.version_loader}".encode()).hexdigest()
+
+    def _ruta_blob(self, clave: str) -> str:
+        return os.path.join(self.directorio, clave[:2], f"{clave}.jsonl.z")
+
+    def _leer(self, ruta: str, source: str) -> Iterator:
+        """
+        Descomprime un blob por bloques y entrega sus páginas de una en una
+
+        Lanza OSError/zlib.error/ValueError si el blob está dañado o truncado.
+        """
+        from langchain.schema import Document
+
+        def documento(linea: bytes):
+            p = json.loads(linea.decode("utf-8"))
+            # El mismo contenido puede llegar con otro nombre: la fuente es la actual
+            return Document(page_content=p["page_content"], metadata={**p["metadata"], "source": source})
+
+        descompresor = zlib.decompressobj()
+        pendiente = b""
+        with open(ruta, "rb") as f:
+            while not descompresor.eof:
+                bloque = f.read(TAMANO_BLOQUE_LECTURA)
+                if not bloque:
+                    raise zlib.error(f"blob truncado: {ruta}")
+                *lineas, pendiente = (pendiente + descompresor.decompress(bloque)).split(b"\n")
+                for linea in lineas:
+                    yield documento(linea)
+        if pendiente:
+            raise ValueError(f"línea incompleta al final del blob: {ruta}")
+
+    def _descartar_blob(self, ruta: str):
+        try:
+            os.unlink(ruta)
+        except OSError:
+            pass
+
+    def obtener(self, clave: str, source: str) -> Optional[List]:
+        """
+        Devuelve las páginas cacheadas o None si no existen
+
+        Args:
+            clave: Clave de caché (ver clave())
+            source: Ruta/nombre con el que se cargó ahora el documento
+        """
+        ruta = self._ruta_blob(clave)
+        if not os.path.exists(ruta):
+            return None
+        try:
+            return list(self._leer(ruta, source))
+        except (OSError, zlib.error, ValueError):
+            return None
+
+    def guardar(self, clave: str, paginas):
+        """
+        Guarda las páginas de un documento de forma atómica
+
+        Args:
+            clave: Clave de caché (ver clave())
+            paginas: Iterable de Documents; se comprimen a medida que llegan
+        """
+        escritura = _EscrituraBlob(self._ruta_blob(clave), self.nivel_compresion)
+        try:
+            for pagina in paginas:
+                escritura.escribir(pagina)
+        except BaseException:
+            escritura.descartar()
+            raise
+        escritura.cerrar()
+
+    def cargar(self, documento: DocumentoPDF) -> List:
+        """
+        Carga las páginas de un PDF usando la caché; extrae y guarda si no está
+
+        Args:
+            documento: PDF en disco o en memoria (su hash se reutiliza como clave)
+
+        Returns:
+            Lista de Documents (una por página)
+        """
+        return list(self.iterar(documento))
+
+    def iterar(self, documento: DocumentoPDF) -> Iterator:
+        """
+        Como cargar(), pero entregando las páginas a medida que se piden
+
+        Con acierto, el blob se descomprime por bloques. Sin acierto, cada
+        página extraída se comprime y se escribe antes de entregarla, y el
+        blob se publica al terminar (si se abandona a medias, se descarta).
+
+        Yields:
+            Documents (uno por página)
+        """
+        clave = self.clave(documento.hash)
+        ruta = self._ruta_blob(clave)
+        if os.path.exists(ruta):
+            self.aciertos += 1
+            entregadas = 0
+            try:
+                for pagina in self._leer(ruta, documento.nombre):
+                    yield pagina
+                    entregadas += 1
+                return
+            except (OSError, zlib.error, ValueError):
+                print(f"⚠️  Caché de páginas dañada para {documento.nombre_corto}; se vuelve a extraer")
+                self._descartar_blob(ruta)
+                # Se sigue desde la primera página que aún no se había entregado
+                yield from itertools.islice(documento.iterar_paginas(), entregadas, None)
+                return
+
+        self.fallos += 1
+        escritura = _EscrituraBlob(ruta, self.nivel_compresion)
+        try:
+            for pagina in documento.iterar_paginas():
+                # Se escribe antes de entregarla: las etapas siguientes modifican la metadata
+                escritura.escribir(pagina)
+                yield pagina
+        except BaseException:
+            escritura.descartar()
+            raise
+        escritura.cerrar()
+
+    def cargar_pdf(self, ruta: str) -> List:
+        """
+        Carga las páginas de un PDF en disco usando la caché
+        """
+        return self.cargar(DocumentoPDF(ruta))
@@ -0,0 +1,142 @@
+"""
+Cliente mínimo de la API /api/generate de Ollama.
+
+A diferencia del wrapper de LangChain, expone el 'context' que devuelve
+Ollama (los tokens de la conversación ya procesados) para poder continuar
+una conversación sin volver a enviar ni re-procesar el prompt completo, y
+las estadísticas de tiempo de prefill/generación de cada llamada.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+
+@dataclass
+class Generacion:
+    """
+    Resultado de una llamada a /api/generate
+    """
+
+    texto: str
+    contexto: List[int] = field(default_factory=list)
+    tokens_prompt: int = 0  # prompt_eval_count: tokens que Ollama tuvo que procesar
+    tokens_respuesta: int = 0  # eval_count
+    segundos_prefill: float = 0.0
+    segundos_generacion: float = 0.0
+    segundos_total: float = 0.0
+
+    @classmethod
+    def desde_respuesta(cls, texto: str, datos: Dict) -> "Generacion":
+        # Ollama reporta las duraciones en nanosegundos
+        return cls(
+            texto=texto,
+            contexto=datos.get("context") or [],
+            tokens_prompt=datos.get("prompt_eval_count", 0),
+            tokens_respuesta=datos.get("eval_count", 0),
+            segundos_prefill=datos.get("prompt_eval_duration", 0) / 1e9,
+            segundos_generacion=datos.get("eval_duration", 0) / 1e9,
+            segundos_total=datos.get("total_duration", 0) / 1e9,
+        )
+
+
+class ClienteOllama:
+    """
+    Cliente HTTP de Ollama con soporte de contexto reutilizable
+    """
+
+    def __init__(self, modelo: str, base_url: str = OLLAMA_BASE_URL, temperatura: float = 0.3,
+                 num_ctx: int = 4096, keep_alive: str = "30m", timeout: float = 300.0,
+                 max_conexiones: int = 10):
+        """
+        Args:
+            modelo: Modelo de Ollama (p. ej. 'llama2:7b')
+            base_url: URL del servidor Ollama
+            temperatura: Temperatura de muestreo
+            num_ctx: Tamaño de la ventana de contexto
+            keep_alive: Tiempo que Ollama mantiene el modelo (y su caché KV) en memoria
+            timeout: Segundos máximos de espera por respuesta
+            max_conexiones: Conexiones HTTP persistentes que se reutilizan entre llamadas
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.modelo = modelo
+        self.base_url = base_url.rstrip("/")
+        self.temperatura = temperatura
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self._sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max_conexiones)
+        self._sesion.mount("http://", adaptador)
+        self._sesion.mount("https://", adaptador)
+
+    def salud(self, timeout: float = 2.0) -> bool:
+        """
+        Comprueba que el servidor responde (GET /api/tags)
+        """
+        try:
+            return self._sesion.get(f"{self.base_url}/api/tags", timeout=timeout).status_code == 200
+        except Exception:
+            return False
+
+    def _cuerpo(self, prompt: str, contexto: Optional[List[int]], stream: bool) -> Dict:
+        cuerpo = {
+            "model": self.modelo,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": self.temperatura, "num_ctx": self.num_ctx},
+        }
+        if contexto:
+            cuerpo["context"] = contexto
+        return cuerpo
+
+    def generar(self, prompt: str, contexto: Optional[List[int]] = None) -> Generacion:
+        """
+        Genera una respuesta completa
+
+        Args:
+            prompt: Texto a enviar (si hay contexto, solo la parte nueva)
+            contexto: 'context' devuelto por una generación anterior
+
+        Returns:
+            Generacion con el texto, el nuevo contexto y las estadísticas
+        """
+        respuesta = self._sesion.post(
+            f"{self.base_url}/api/generate",
+            json=self._cuerpo(prompt, contexto, stream=False),
+            timeout=self.timeout,
+        )
+        respuesta.raise_for_status()
+        datos = respuesta.json()
+        return Generacion.desde_respuesta(datos.get("response", ""), datos)
+
+    def generar_stream(self, prompt: str, contexto: Optional[List[int]] = None) -> Iterator:
+        """
+        Genera una respuesta token a token
+
+        Yields:
+            Fragmentos de texto (str) y, al final, la Generacion completa
+        """
+        partes = []
+        with self._sesion.post(
+            f"{self.base_url}/api/generate",
+            json=self._cuerpo(prompt, contexto, stream=True),
+            timeout=self.timeout,
+            stream=True,
+        ) as respuesta:
+            respuesta.raise_for_status()
+            for linea in respuesta.iter_lines():
+                if not linea:
+                    continue
+                datos = json.loads(linea)
+                if datos.get("response"):
+                    partes.append(datos["response"])
+                    yield datos["response"]
+                if datos.get("done"):
+                    yield Generacion.desde_respuesta("".join(partes), datos)
+                    return
@@ -0,0 +1,239 @@
+"""
+Coalescencia de consultas idénticas en curso ("single-flight").
+
+Si varias peticiones con la misma pregunta normalizada, la misma versión de
+las colecciones y los mismos parámetros de generación llegan mientras la
+primera todavía se está calculando, las siguientes se unen a ese cálculo y
+reciben su resultado (o su flujo de tokens) en lugar de lanzar otra
+generación. No es una caché: en cuanto el cálculo termina, la siguiente
+pregunta igual vuelve a calcularse.
+
+Hay dos variantes con la misma semántica: CoalescedorConsultas para hilos
+(Streamlit, AsistenteAcademico) y CoalescedorAsync para el servidor asyncio.
+"""
+
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Callable, Dict, Hashable, Iterator, List
+
+from deduplicacion import normalizar_texto
+
+
+def clave_consulta(pregunta: str, versiones, **parametros) -> str:
+    """
+    Clave de coalescencia: pregunta normalizada + versiones de colecciones + parámetros
+
+    Args:
+        pregunta: Pregunta tal como llegó
+        versiones: Pares (colección, versión) consultados
+        parametros: Parámetros que cambian la respuesta (modelo, temperatura, top_k, filtros...)
+    """
+    texto = normalizar_texto(pregunta).strip(" ¿?¡!.")
+    return json.dumps(
+        [texto, sorted(map(list, versiones)), parametros],
+        sort_keys=True, ensure_ascii=False, default=list,
+    )
+
+
+class _Vuelo:
+    """
+    Un cálculo en curso y lo que ya produjo
+    """
+
+    def __init__(self):
+        self.partes: List = []
+        self.resultado = None
+        self.error = None
+        self.terminado = False
+        self.seguidores = 0
+        self.cambio = None  # asyncio.Event (solo CoalescedorAsync)
+        self.tarea = None  # asyncio.Task del productor (solo ejecutar_stream)
+
+
+class _EstadisticasCoalescencia:
+    def __init__(self):
+        self.lideres = 0
+        self.seguidores = 0
+
+    def estadisticas(self) -> Dict:
+        total = self.lideres + self.seguidores
+        return {
+            "en_curso": len(self._vuelos),
+            "lideres": self.lideres,
+            "seguidores": self.seguidores,
+            "tasa_coalescencia": round(self.seguidores / total, 4) if total else 0.0,
+        }
+
+
+class CoalescedorConsultas(_EstadisticasCoalescencia):
+    """
+    Single-flight para llamadas bloqueantes desde varios hilos
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._vuelos: Dict[Hashable, _Vuelo] = {}
+        self._lock = threading.Lock()
+        self._condicion = threading.Condition(self._lock)
+
+    def _unirse(self, clave: Hashable):
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            if vuelo is not None:
+                vuelo.seguidores += 1
+                self.seguidores += 1
+                return vuelo, False
+            vuelo = self._vuelos[clave] = _Vuelo()
+            self.lideres += 1
+            return vuelo, True
+
+    def _terminar(self, clave: Hashable, vuelo: _Vuelo):
+        with self._condicion:
+            vuelo.terminado = True
+            if self._vuelos.get(clave) is vuelo:
+                del self._vuelos[clave]
+            self._condicion.notify_all()
+
+    def ejecutar(self, clave: Hashable, funcion: Callable):
+        """
+        Ejecuta funcion() o espera el resultado de otra llamada igual en curso
+
+        Returns:
+            El resultado de la llamada (compartido entre todos los que se unieron)
+        """
+        vuelo, lider = self._unirse(clave)
+        if lider:
+            try:
+                vuelo.resultado = funcion()
+            except BaseException as e:
+                vuelo.error = e
+            finally:
+                self._terminar(clave, vuelo)
+        else:
+            with self._condicion:
+                self._condicion.wait_for(lambda: vuelo.terminado)
+
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.resultado
+
+    def ejecutar_stream(self, clave: Hashable, generador: Callable[[], Iterator]) -> Iterator:
+        """
+        Comparte un flujo de partes (tokens) entre llamadas iguales concurrentes
+
+        El generador corre en un hilo propio, así que un consumidor lento o que
+        abandona no frena a los demás. Quien se une tarde recibe primero las
+        partes ya producidas y después las nuevas.
+        """
+        vuelo, lider = self._unirse(clave)
+        if lider:
+            def producir():
+                try:
+                    for parte in generador():
+                        with self._condicion:
+                            vuelo.partes.append(parte)
+                            self._condicion.notify_all()
+                except BaseException as e:
+                    vuelo.error = e
+                finally:
+                    self._terminar(clave, vuelo)
+
+            threading.Thread(target=producir, name="coalescencia-stream", daemon=True).start()
+
+        leidas = 0
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: vuelo.terminado or len(vuelo.partes) > leidas)
+                nuevas = vuelo.partes[leidas:]
+                terminado = vuelo.terminado
+            yield from nuevas
+            leidas += len(nuevas)
+            if terminado and leidas == len(vuelo.partes):
+                break
+
+        if vuelo.error is not None:
+            raise vuelo.error
+
+
+class CoalescedorAsync(_EstadisticasCoalescencia):
+    """
+    Single-flight para corrutinas y generadores asíncronos en un mismo loop
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._vuelos: Dict[Hashable, _Vuelo] = {}
+
+    def _unirse(self, clave: Hashable):
+        vuelo = self._vuelos.get(clave)
+        if vuelo is not None:
+            vuelo.seguidores += 1
+            self.seguidores += 1
+            return vuelo, False
+        vuelo = self._vuelos[clave] = _Vuelo()
+        vuelo.cambio = asyncio.Event()
+        self.lideres += 1
+        return vuelo, True
+
+    def _terminar(self, clave: Hashable, vuelo: _Vuelo):
+        vuelo.terminado = True
+        vuelo.tarea = None
+        if self._vuelos.get(clave) is vuelo:
+            del self._vuelos[clave]
+        vuelo.cambio.set()
+
+    async def ejecutar(self, clave: Hashable, corrutina: Callable):
+        """
+        Espera corrutina() o el resultado de otra llamada igual en curso
+        """
+        vuelo, lider = self._unirse(clave)
+        if lider:
+            try:
+                vuelo.resultado = await corrutina()
+            except BaseException as e:
+                vuelo.error = e
+            finally:
+                self._terminar(clave, vuelo)
+        else:
+            while not vuelo.terminado:
+                await vuelo.cambio.wait()
+
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.resultado
+
+    async def ejecutar_stream(self, clave: Hashable, generador: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """
+        Comparte un generador asíncrono entre llamadas iguales concurrentes
+        """
+        vuelo, lider = self._unirse(clave)
+        if lider:
+            async def producir():
+                try:
+                    async for parte in generador():
+                        vuelo.partes.append(parte)
+                        vuelo.cambio.set()
+                        vuelo.cambio = asyncio.Event()
+                except Exception as e:
+                    vuelo.error = e
+                finally:
+                    self._terminar(clave, vuelo)
+
+            # El loop solo guarda una referencia débil: el vuelo la mantiene hasta _terminar
+            vuelo.tarea = asyncio.get_running_loop().create_task(producir())
+
+        leidas = 0
+        while True:
+            if leidas < len(vuelo.partes):
+                nuevas = vuelo.partes[leidas:]
+                leidas += len(nuevas)
+                for parte in nuevas:
+                    yield parte
+                continue
+            if vuelo.terminado:
+                break
+            await vuelo.cambio.wait()
+
+        if vuelo.error is not None:
+            raise vuelo.error
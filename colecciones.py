@@ -0,0 +1,1043 @@
+"""
+Colecciones vectoriales por curso (shards) con carga diferida.
+
+Cada curso tiene su propia colección versionada de Chroma en su propio
+directorio. Solo las colecciones usadas recientemente quedan residentes en
+memoria; las búsquedas sobre varios cursos se reparten en hilos y se
+fusionan por puntaje.
+"""
+
+import heapq
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from deduplicacion import FirmasFragmentos, quitar_referencias
+from indice_fuentes import IndiceFuentes
+from indice_hnsw import ConfigIndice, ControlEf, indice_hnsw
+from ingesta import en_segundo_plano
+from memoria import bytes_hnsw, tamano_profundo
+
+TODAS = "todas"
+FILTROS_VALIDOS = ("fuentes", "paginas", "etiquetas")
+
+
+def _clave_filtros(filtros: Dict) -> str:
+    desconocidos = set(filtros) - set(FILTROS_VALIDOS)
+    if desconocidos:
+        raise ValueError(f"Filtros no soportados: {sorted(desconocidos)} (válidos: {FILTROS_VALIDOS})")
+    return json.dumps({k: v for k, v in sorted(filtros.items()) if v}, sort_keys=True, default=list)
+
+
+def lotes_vectorstore(vectorstore, tamano_lote: int) -> Iterator[Dict]:
+    """
+    Recorre una colección de Chroma por lotes con vectores, textos y metadata
+
+    Yields:
+        dicts con 'ids', 'embeddings', 'documents' y 'metadatas'
+    """
+    offset = 0
+    while True:
+        lote = vectorstore._collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=tamano_lote, offset=offset,
+        )
+        if not lote["ids"]:
+            return
+        offset += len(lote["ids"])
+        yield lote
+
+
+def agrupar(elementos: Iterable, tamano_lote: int) -> Iterator[List]:
+    """
+    Agrupa un iterable (posiblemente infinito o de largo desconocido) en listas de tamano_lote
+    """
+    iterador = iter(elementos)
+    while True:
+        lote = list(islice(iterador, tamano_lote))
+        if not lote:
+            return
+        yield lote
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """
+    Convierte el nombre de un curso en un nombre de colección válido para Chroma
+
+    Chroma exige entre 3 y 63 caracteres; a los nombres cortos se les antepone
+    'curso-' y los largos se recortan para que quepa el sufijo de versión.
+
+    >>> normalizar_nombre("Cálculo I")
+    'calculo-i'
+    >>> normalizar_nombre("IA")
+    'curso-ia'
+    """
+    ascii_ = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_.lower()).strip("-")
+    if not slug:
+        raise ValueError(f"Nombre de colección inválido: {nombre!r}")
+    if len(slug) < 3:
+        slug = f"curso-{slug}"
+    return slug[:50].rstrip("-")
+
+
+@dataclass
+class Recuperado:
+    """
+    Fragmento recuperado con su puntaje (similitud coseno, mayor es mejor)
+    """
+
+    documento: object
+    puntaje: float
+    id: str
+    coleccion: str
+
+
+class Coleccion:
+    """
+    Colección versionada de un curso
+
+    Las cargas que agregan documentos escriben en el sitio sobre la versión
+    activa (el índice HNSW sigue respondiendo mientras se insertan vectores).
+    Las que reemplazan toda la colección, y la compactación, construyen una
+    versión nueva aparte y la activan de forma atómica (puntero en disco +
+    intercambio en memoria). Los borrados se hacen en el sitio y dejan
+    lápidas en el índice HNSW; cuando superan un umbral, la colección se
+    compacta en segundo plano copiando solo los vectores vivos a una versión
+    nueva (grafo reconstruido, sin recalcular embeddings).
+    """
+
+    solo_lectura = False
+
+    def __init__(self, nombre: str, directorio: str, obtener_embeddings: Callable, tamano_lote: int = 64,
+                 max_filtros_cacheados: int = 32, umbral_compactacion: float = 0.2,
+                 config_indice: Optional[ConfigIndice] = None):
+        """
+        Args:
+            nombre: Nombre base de la colección en Chroma
+            directorio: Directorio de persistencia de esta colección
+            obtener_embeddings: Función que devuelve el modelo de embeddings
+            tamano_lote: Fragmentos por lote al generar embeddings y escribir vectores
+            max_filtros_cacheados: Subconjuntos de vectores filtrados que se mantienen en memoria
+            umbral_compactacion: Proporción de fragmentos borrados que dispara la compactación
+            config_indice: Parámetros HNSW por defecto; los guardados junto a la
+                colección (ver configurar_indice) tienen prioridad
+        """
+        self.nombre = nombre
+        self.directorio = directorio
+        self.obtener_embeddings = obtener_embeddings
+        self.tamano_lote = tamano_lote
+        self.max_filtros_cacheados = max_filtros_cacheados
+        self.umbral_compactacion = umbral_compactacion
+        self.config_indice = ConfigIndice.cargar(self._ruta_config_indice()) or config_indice or ConfigIndice()
+        self._control_ef = ControlEf()
+
+        self.vectorstore = None
+        self._indice: Optional[IndiceFuentes] = None
+        self._cache_filtros: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.version = 0
+        # Cambia con cada escritura en el sitio (cargas, borrados) dentro de una versión
+        self.revision = 0
+        self.ultimo_uso = 0.0
+        self._cliente = None
+        self._en_uso = 0
+        self._lock = threading.RLock()
+        # Serializa las escrituras (ingesta, borrados, compactación); las lecturas no esperan
+        self.lock_escritura = threading.Lock()
+        self._compactando = False
+
+    # ---------- versiones ----------
+
+    def _ruta_puntero(self) -> str:
+        return os.path.join(self.directorio, f"{self.nombre}.activa.json")
+
+    def _ruta_config_indice(self) -> str:
+        return os.path.join(self.directorio, f"{self.nombre}.hnsw.json")
+
+    def _nombre_version(self, version: int) -> str:
+        # La versión 0 es la colección sin versionar (bases creadas antes de versionar)
+        return self.nombre if version == 0 else f"{self.nombre}__v{version}"
+
+    def _ruta_indice(self, version: int) -> str:
+        return os.path.join(self.directorio, f"{self._nombre_version(version)}.indice.json")
+
+    def _ruta_firmas(self, version: int) -> str:
+        return os.path.join(self.directorio, f"{self._nombre_version(version)}.firmas.npz")
+
+    def _leer_puntero(self) -> int:
+        """
+        Devuelve la versión activa de la colección (0 si no hay puntero)
+        """
+        try:
+            with open(self._ruta_puntero(), "r", encoding="utf-8") as f:
+                return int(json.load(f)["version"])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    @property
+    def version_activa(self) -> int:
+        """
+        Versión con la que se responden las consultas (sin cargar la colección)
+        """
+        return self.version if self.vectorstore is not None else self._leer_puntero()
+
+    def existe(self) -> bool:
+        """
+        Indica si hay datos persistidos, sin cargar la colección
+        """
+        if self.vectorstore is not None or os.path.exists(self._ruta_puntero()):
+            return True
+        # Bases sin versionar: colección con el nombre base en chroma.sqlite3
+        return os.path.exists(os.path.join(self.directorio, "chroma.sqlite3")) and 0 in self._versiones_existentes()
+
+    def _cliente_chroma(self):
+        if self._cliente is None:
+            import chromadb
+
+            self._cliente = chromadb.PersistentClient(path=self.directorio)
+        return self._cliente
+
+    def _versiones_existentes(self) -> List[int]:
+        prefijo = f"{self.nombre}__v"
+        versiones = []
+        for coleccion in self._cliente_chroma().list_collections():
+            if coleccion.name == self.nombre:
+                versiones.append(0)
+            elif coleccion.name.startswith(prefijo) and coleccion.name[len(prefijo):].isdigit():
+                versiones.append(int(coleccion.name[len(prefijo):]))
+        return versiones
+
+    def _abrir_version(self, version: int, crear: bool = False):
+        from langchain.vectorstores import Chroma
+
+        return Chroma(
+            collection_name=self._nombre_version(version),
+            client=self._cliente_chroma(),
+            persist_directory=self.directorio,
+            embedding_function=self.obtener_embeddings(),
+            # Los parámetros HNSW solo se pasan al crear: al abrir una versión
+            # existente, Chroma sobrescribiría su metadata sin reconstruir el índice
+            collection_metadata=self.config_indice.metadata() if crear else None,
+        )
+
+    def abrir_activa(self):
+        """
+        Abre la versión activa persistida, o None si no existe o está vacía
+        """
+        version = self._leer_puntero()
+        if version not in self._versiones_existentes():
+            return None
+        vectorstore = self._abrir_version(version)
+        return vectorstore if vectorstore._collection.count() > 0 else None
+
+    def cargar(self, recargar: bool = False):
+        """
+        Deja residente la versión activa y la devuelve
+
+        Args:
+            recargar: Volver a leer el puntero aunque ya esté cargada
+        """
+        with self._lock:
+            if self.vectorstore is None or recargar:
+                version = self._leer_puntero()
+                self.vectorstore = self._abrir_version(version)
+                self.version = version
+                self._indice = None
+                self._cache_filtros.clear()
+            self.ultimo_uso = time.time()
+            return self.vectorstore
+
+    def construir_version(self, chunks, anterior, notificar, excluir=(), deduplicador=None):
+        """
+        Escribe una nueva versión de la colección por lotes
+
+        Los vectores de la versión anterior se copian sin recalcular embeddings
+        (y, si es la versión activa de esta colección, sus firmas MinHash).
+        El índice de fuentes se construye a la vez que se escriben los vectores.
+        Los embeddings de los fragmentos nuevos se calculan en otro hilo, un
+        lote por delante de la escritura.
+
+        Args:
+            chunks: Documents nuevos (se calculan sus embeddings); puede ser un
+                iterador, que se consume por lotes sin materializarlo
+            anterior: Vectorstore cuyos vectores se copian, u objeto con lotes()
+                y len() como una Instantanea (ver instantanea.py), o None
+            excluir: Ids de la versión anterior que no se copian (documentos reemplazados)
+            deduplicador: DeduplicadorMinHash por el que pasa chunks (opcional); al
+                agotarlos se corrige la metadata de los fragmentos que recibieron
+                duplicados y se guardan sus firmas
+
+        Returns:
+            (vectorstore, version, indice)
+        """
+        excluir = set(excluir)
+        if anterior is None:
+            lotes, previos = [], 0
+        elif hasattr(anterior, "lotes"):
+            lotes, previos = anterior.lotes(self.tamano_lote), len(anterior)
+        else:
+            lotes, previos = lotes_vectorstore(anterior, self.tamano_lote), anterior._collection.count()
+        previas = None
+        if anterior is not None and anterior is self.vectorstore:
+            previas = FirmasFragmentos.cargar(self._ruta_firmas(self.version))
+        with self._lock:
+            version = max([self.version, self._leer_puntero(), *self._versiones_existentes()]) + 1
+            vectorstore = self._abrir_version(version, crear=True)
+        coleccion = vectorstore._collection
+        # Con un iterador no se conoce el total de fragmentos nuevos: se informa 0
+        total = len(chunks) + previos - len(excluir) if hasattr(chunks, "__len__") else 0
+        escritos = 0
+        indice = IndiceFuentes()
+
+        for lote in lotes:
+            copiar = [i for i, id_ in enumerate(lote["ids"]) if id_ not in excluir]
+            if not copiar:
+                continue
+            coleccion.upsert(
+                ids=[lote["ids"][i] for i in copiar],
+                embeddings=[list(lote["embeddings"][i]) for i in copiar],
+                documents=[lote["documents"][i] for i in copiar],
+                metadatas=[lote["metadatas"][i] for i in copiar],
+            )
+            for i in copiar:
+                indice.agregar(lote["ids"][i], lote["metadatas"][i] or {})
+            escritos += len(copiar)
+            notificar("vectores", escritos, total)
+
+        firmas = previas.conservar(indice.ids) if previas is not None else FirmasFragmentos()
+        self._escribir_fragmentos(coleccion, chunks, indice, notificar, escritos, total, deduplicador, firmas)
+        firmas.guardar(self._ruta_firmas(version))
+        return vectorstore, version, indice
+
+    def _escribir_fragmentos(self, coleccion, chunks, indice: IndiceFuentes, notificar,
+                             escritos: int = 0, total: int = 0, deduplicador=None,
+                             firmas: Optional[FirmasFragmentos] = None) -> List[str]:
+        """
+        Calcula los embeddings de chunks y los escribe en una colección de Chroma
+
+        Los embeddings se calculan en otro hilo, un lote por delante de la escritura.
+
+        Args:
+            escritos, total: Contadores con que se informa el progreso
+            deduplicador: Ver construir_version
+            firmas: Donde se agregan las firmas de los fragmentos escritos
+
+        Returns:
+            Ids de los fragmentos escritos, en el orden de chunks
+        """
+        embeddings = self.obtener_embeddings()
+        embebidos = escritos
+
+        def embeber():
+            for lote in agrupar(chunks, self.tamano_lote):
+                textos = [doc.page_content for doc in lote]
+                yield lote, textos, embeddings.embed_documents(textos)
+
+        nuevos_ids = []
+        for lote, textos, vectores in en_segundo_plano(embeber(), profundidad=2, nombre=f"embeddings-{self.nombre}"):
+            embebidos += len(lote)
+            notificar("embeddings", embebidos, total)
+
+            ids = [uuid.uuid4().hex for _ in lote]
+            coleccion.upsert(
+                ids=ids, embeddings=vectores,
+                documents=textos, metadatas=[doc.metadata for doc in lote],
+            )
+            for id_, doc in zip(ids, lote):
+                indice.agregar(id_, doc.metadata)
+            nuevos_ids.extend(ids)
+            escritos += len(lote)
+            notificar("vectores", escritos, total)
+
+        if deduplicador is None:
+            return nuevos_ids
+        for lote in agrupar(deduplicador.actualizados(), self.tamano_lote):
+            ids = [nuevos_ids[posicion] for posicion, _ in lote]
+            coleccion.update(ids=ids, metadatas=[metadata for _, metadata in lote])
+            for id_, (_, metadata) in zip(ids, lote):
+                indice.agregar_referencias(id_, metadata)
+        if firmas is not None:
+            firmas.agregar(nuevos_ids, *deduplicador.firmas_emitidas())
+        return nuevos_ids
+
+    def agregar(self, chunks, notificar, fuentes_reemplazadas: Sequence[str] = (), deduplicador=None) -> int:
+        """
+        Agrega fragmentos a la versión activa en el sitio, sin copiar la colección
+
+        El costo depende solo de los fragmentos nuevos. Las consultas siguen
+        respondiéndose durante la carga; las versiones anteriores de los
+        documentos reemplazados se quitan al final (ver eliminar_fuentes), así
+        que el documento no desaparece mientras se reescribe. El índice de
+        fuentes se actualiza sobre una copia y se publica al terminar.
+        Requiere tener lock_escritura.
+
+        Con deduplicador, los fragmentos nuevos se comparan también con los
+        ya almacenados (firmas guardadas junto a la colección): un duplicado
+        de un fragmento existente no se escribe y solo agrega su referencia.
+
+        Args:
+            chunks: Documents nuevos (iterable, ver construir_version); si hay
+                deduplicador deben salir de su procesar()
+            fuentes_reemplazadas: Documentos que se vuelven a cargar (rutas o nombres)
+            deduplicador: DeduplicadorMinHash aún sin usar (ver construir_version)
+
+        Returns:
+            Número de fragmentos nuevos escritos
+        """
+        vectorstore = self.cargar()
+        propios, compartidos, nombres = self.fragmentos_de_fuentes(fuentes_reemplazadas)
+        if propios or compartidos:
+            print(f"♻️  {len(propios)} fragmentos de versiones anteriores de estos documentos se sustituyen "
+                  f"({len(compartidos)} compartidos con otros documentos se desvinculan)")
+        indice = self.obtener_indice().copia()
+        firmas = None
+        if deduplicador is not None:
+            firmas = FirmasFragmentos.cargar(self._ruta_firmas(self.version)) or FirmasFragmentos()
+            borrar = set(propios)
+            deduplicador.sembrar(
+                firmas, self._metadata_de,
+                vivo=lambda id_: indice.vivo(id_) and id_ not in borrar, conocidas=compartidos,
+            )
+        # Las referencias antiguas se quitan antes de que los fragmentos nuevos agreguen las suyas
+        indice.quitar_fuentes(nombres)
+        nuevos = self._escribir_fragmentos(vectorstore._collection, chunks, indice, notificar,
+                                           deduplicador=deduplicador, firmas=firmas)
+        if deduplicador is not None:
+            existentes = dict(deduplicador.existentes_actualizados())
+            for id_, metadata in existentes.items():
+                indice.agregar_referencias(id_, metadata)
+            compartidos.update(existentes)
+            firmas.guardar(self._ruta_firmas(self.version))
+        self._desvincular(compartidos)
+        self._borrar(propios, indice)
+        self._publicar_indice(indice)
+        if indice.proporcion_borrados >= self.umbral_compactacion:
+            self.compactar_en_segundo_plano()
+        return len(nuevos)
+
+    def activar(self, vectorstore, version: int, indice: Optional[IndiceFuentes] = None):
+        """
+        Publica una versión de la colección: puntero en disco + intercambio en memoria
+        """
+        if indice is not None:
+            indice.guardar(self._ruta_indice(version))
+
+        with self._lock:
+            tmp = self._ruta_puntero() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"coleccion": self._nombre_version(version), "version": version}, f)
+            os.replace(tmp, self._ruta_puntero())
+
+            anterior = self.version
+            self.vectorstore = vectorstore
+            self.version = version
+            self._indice = indice
+            self._cache_filtros.clear()
+            self.ultimo_uso = time.time()
+
+        # Se conserva la versión previa para las consultas que aún estén en curso
+        self._limpiar_versiones(conservar={version, anterior})
+
+    def _limpiar_versiones(self, conservar):
+        """
+        Elimina versiones antiguas de la colección
+        """
+        for version in self._versiones_existentes():
+            if version not in conservar:
+                self._cliente_chroma().delete_collection(self._nombre_version(version))
+                for ruta in (self._ruta_indice(version), self._ruta_firmas(version)):
+                    if os.path.exists(ruta):
+                        os.unlink(ruta)
+
+    # ---------- residencia en memoria ----------
+
+    @property
+    def residente(self) -> bool:
+        return self.vectorstore is not None
+
+    def descargar(self) -> bool:
+        """
+        Suelta las referencias de esta colección (vectorstore, cliente, índice
+        de fuentes y subconjuntos filtrados) si no está en uso
+
+        El sistema de Chroma del directorio es compartido por todos los clientes
+        del proceso (otras sesiones pueden estar usándolo), así que no se detiene:
+        el índice HNSW se libera cuando Chroma deja de referenciarlo.
+
+        Returns:
+            True si se descargó
+        """
+        with self._lock:
+            if self._en_uso or self._cliente is None or self.lock_escritura.locked():
+                return False
+            self.vectorstore = None
+            self._cliente = None
+            self._indice = None
+            self._cache_filtros.clear()
+            return True
+
+    def memoria(self) -> Dict[str, int]:
+        """
+        Bytes estimados en memoria de la versión residente
+
+        Returns:
+            dict con 'vectores' (índice HNSW), 'indice_fuentes',
+            'cache_embeddings' (subconjuntos filtrados) y 'fragmentos'
+        """
+        with self._lock:
+            vectorstore, indice = self.vectorstore, self._indice
+            cache = list(self._cache_filtros.values())
+        fragmentos = vectores = 0
+        if vectorstore is not None:
+            coleccion = vectorstore._collection
+            fragmentos = coleccion.count()
+            muestra = coleccion.get(limit=1, include=["embeddings"])["embeddings"] if fragmentos else []
+            if muestra:
+                m = int((coleccion.metadata or {}).get("hnsw:M", 16))
+                vectores = bytes_hnsw(fragmentos, len(muestra[0]), m)
+        return {
+            "vectores": vectores,
+            "indice_fuentes": tamano_profundo(indice) if indice is not None else 0,
+            "cache_embeddings": tamano_profundo(cache),
+            "fragmentos": fragmentos,
+        }
+
+    # ---------- parámetros del índice HNSW ----------
+
+    def parametros_indice(self) -> ConfigIndice:
+        """
+        Parámetros con los que está construida la versión activa (y el ef de búsqueda configurado)
+        """
+        vectorstore = self.cargar()
+        construida = ConfigIndice.desde_metadata(vectorstore._collection.metadata)
+        construida.ef_busqueda = self.config_indice.ef_busqueda
+        return construida
+
+    def configurar_indice(self, config: ConfigIndice, guardar: bool = True) -> bool:
+        """
+        Cambia los parámetros HNSW de la colección
+
+        El ef de búsqueda se aplica desde la siguiente consulta. Si cambian la
+        distancia, M o el ef de construcción, la colección se reconstruye en
+        una versión nueva copiando sus vectores (sin recalcular embeddings).
+
+        Args:
+            config: Parámetros nuevos
+            guardar: Persistirlos junto a la colección para los próximos arranques
+
+        Returns:
+            True si hubo que reconstruir el índice
+        """
+        with self.lock_escritura:
+            self.config_indice = config
+            if guardar:
+                os.makedirs(self.directorio, exist_ok=True)
+                config.guardar(self._ruta_config_indice())
+            if not self.existe() or config.misma_construccion(self.parametros_indice()):
+                return False
+            inicio = time.time()
+            vectorstore, version, indice = self.construir_version([], self.cargar(), lambda *_: None)
+            self.activar(vectorstore, version, indice)
+        print(
+            f"🔧 Índice de '{self.nombre}' reconstruido (M={config.m}, ef_construccion={config.ef_construccion}, "
+            f"{config.espacio}) en {time.time() - inicio:.1f} s"
+        )
+        return True
+
+    # ---------- índice de fuentes ----------
+
+    def obtener_indice(self) -> IndiceFuentes:
+        """
+        Índice de fuentes de la versión activa (se construye una vez si falta)
+        """
+        with self._lock:
+            vectorstore = self.cargar()
+            if self._indice is None:
+                ruta = self._ruta_indice(self.version)
+                indice = IndiceFuentes.cargar(ruta)
+                # Una escritura en el sitio interrumpida deja el índice desfasado
+                if indice is not None and indice.vivos != vectorstore._collection.count():
+                    indice = None
+                if indice is None:
+                    indice = IndiceFuentes.desde_coleccion(vectorstore._collection)
+                    indice.guardar(ruta)
+                self._indice = indice
+            return self._indice
+
+    def _vectores_filtrados(self, filtros: Dict):
+        """
+        Ids y matriz normalizada de los fragmentos que cumplen los filtros (con caché LRU)
+
+        La clave incluye versión y revisión: un resultado calculado mientras
+        otra escritura publicaba cambios no llega a guardarse.
+        """
+        with self._lock:
+            indice = self.obtener_indice()
+            vectorstore, estado = self.vectorstore, (self.version, self.revision)
+            clave = (estado, _clave_filtros(filtros))
+            if clave in self._cache_filtros:
+                self._cache_filtros.move_to_end(clave)
+                return self._cache_filtros[clave]
+
+        ids = indice.ids_de(indice.resolver(**filtros))
+        if ids:
+            r = vectorstore._collection.get(ids=ids, include=["embeddings"])
+            por_id = dict(zip(r["ids"], r["embeddings"]))
+            ids = [id_ for id_ in ids if id_ in por_id]
+            matriz = np.asarray([por_id[id_] for id_ in ids], dtype=np.float32)
+            matriz /= np.linalg.norm(matriz, axis=1, keepdims=True) + 1e-12
+        else:
+            matriz = np.empty((0, 0), dtype=np.float32)
+
+        with self._lock:
+            if (self.version, self.revision) == estado:
+                self._cache_filtros[clave] = (ids, matriz)
+                while len(self._cache_filtros) > self.max_filtros_cacheados:
+                    self._cache_filtros.popitem(last=False)
+        return ids, matriz
+
+    def lotes(self, tamano_lote: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Recorre la versión activa por lotes (ver lotes_vectorstore)
+        """
+        return lotes_vectorstore(self.cargar(), tamano_lote or self.tamano_lote)
+
+    def __len__(self):
+        return self.cargar()._collection.count() if self.existe() else 0
+
+    # ---------- borrado y compactación ----------
+
+    def fragmentos_de_fuentes(self, fuentes: Sequence[str]) -> Tuple[List[str], Dict[str, Dict], set]:
+        """
+        Fragmentos que citan las fuentes indicadas
+
+        Los fragmentos deduplicados que también citan otro documento no se
+        borran: siguen siendo la copia de ese otro documento y solo pierden
+        las referencias a estas fuentes.
+
+        Args:
+            fuentes: Rutas o nombres de archivo
+
+        Returns:
+            (ids que solo citan estas fuentes, {id: metadata sin estas fuentes}
+            de los compartidos, nombres de fuente del índice que coinciden)
+        """
+        if not fuentes or not self.existe():
+            return [], {}, set()
+        indice = self.obtener_indice()
+        nombres = indice.coincidencias(fuentes)
+        candidatos = indice.ids_de(indice.resolver(fuentes=list(nombres))) if nombres else []
+        propios, compartidos = [], {}
+        for lote in agrupar(candidatos, self.tamano_lote):
+            r = self.vectorstore._collection.get(ids=lote, include=["metadatas"])
+            for id_, meta in zip(r["ids"], r["metadatas"]):
+                restante = quitar_referencias(meta or {}, nombres)
+                if restante is None:
+                    propios.append(id_)
+                elif restante != meta:
+                    compartidos[id_] = restante
+        return propios, compartidos, nombres
+
+    def eliminar_fuentes(self, fuentes: Sequence[str], compactar: bool = True) -> int:
+        """
+        Elimina de la versión activa los fragmentos de unos documentos
+
+        El borrado es inmediato y no recalcula nada: los vectores se quitan de
+        Chroma y el índice de fuentes guarda lápidas. Los fragmentos
+        deduplicados que también citan otro documento se conservan sin las
+        referencias a estos. Si las lápidas superan umbral_compactacion se
+        lanza la compactación en segundo plano.
+
+        Returns:
+            Número de fragmentos que dejaron de citar los documentos (borrados o desvinculados)
+        """
+        with self.lock_escritura:
+            propios, compartidos, nombres = self.fragmentos_de_fuentes(fuentes)
+            if not propios and not compartidos:
+                return 0
+            indice = self.obtener_indice().copia()
+            indice.quitar_fuentes(nombres)
+            self._desvincular(compartidos)
+            self._borrar(propios, indice)
+            self._publicar_indice(indice)
+            proporcion = indice.proporcion_borrados
+
+        if compactar and proporcion >= self.umbral_compactacion:
+            self.compactar_en_segundo_plano()
+        return len(propios) + len(compartidos)
+
+    def _metadata_de(self, id_: str) -> Dict:
+        return self.vectorstore._collection.get(ids=[id_], include=["metadatas"])["metadatas"][0] or {}
+
+    def _desvincular(self, compartidos: Dict[str, Dict]):
+        """
+        Escribe la metadata de fragmentos compartidos que perdieron referencias
+        """
+        for lote in agrupar(list(compartidos.items()), self.tamano_lote):
+            self.vectorstore._collection.update(
+                ids=[id_ for id_, _ in lote], metadatas=[metadata for _, metadata in lote]
+            )
+
+    def _borrar(self, ids: List[str], indice: IndiceFuentes):
+        """
+        Quita fragmentos de la versión activa y los marca como lápidas en el índice
+        """
+        for inicio in range(0, len(ids), self.tamano_lote):
+            self.vectorstore._collection.delete(ids=ids[inicio:inicio + self.tamano_lote])
+        indice.eliminar(ids)
+
+    def _publicar_indice(self, indice: IndiceFuentes):
+        """
+        Guarda y publica el índice de fuentes tras una escritura en el sitio
+        """
+        indice.guardar(self._ruta_indice(self.version))
+        with self._lock:
+            self._indice = indice
+            self.revision += 1
+            self._cache_filtros.clear()
+
+    def compactar(self) -> bool:
+        """
+        Reescribe la colección con solo los fragmentos vivos en una versión nueva
+
+        Libera las lápidas del índice HNSW (que siguen recorriéndose en cada
+        búsqueda) y del índice de fuentes. Las consultas siguen usando la
+        versión anterior hasta la activación.
+
+        Returns:
+            True si se compactó
+        """
+        with self.lock_escritura:
+            if not self.existe():
+                return False
+            anterior = self.cargar()
+            borrados = len(self.obtener_indice().borrados)
+            if not borrados:
+                return False
+            inicio = time.time()
+            vectorstore, version, indice = self.construir_version([], anterior, lambda *_: None)
+            self.activar(vectorstore, version, indice)
+        print(
+            f"🧽 Colección '{self.nombre}' compactada: {borrados} lápidas liberadas, "
+            f"{len(indice)} fragmentos vivos ({time.time() - inicio:.1f} s)"
+        )
+        return True
+
+    def compactar_en_segundo_plano(self) -> Optional[threading.Thread]:
+        """
+        Lanza compactar() en un hilo daemon (si no hay otra compactación en curso)
+        """
+        with self._lock:
+            if self._compactando:
+                return None
+            self._compactando = True
+
+        def _tarea():
+            try:
+                self.compactar()
+            except Exception as e:
+                print(f"⚠️  No se pudo compactar '{self.nombre}': {str(e)}")
+            finally:
+                self._compactando = False
+
+        hilo = threading.Thread(target=_tarea, name=f"compactacion-{self.nombre}", daemon=True)
+        hilo.start()
+        return hilo
+
+    # ---------- búsqueda ----------
+
+    def buscar(self, vector: Sequence[float], k: int, filtros: Optional[Dict] = None,
+               ef: Optional[int] = None) -> List[Recuperado]:
+        """
+        Busca los k fragmentos más similares a un vector de consulta
+
+        Args:
+            vector: Embedding de la pregunta
+            k: Número de fragmentos
+            filtros: Restricciones previas a la búsqueda: 'fuentes' (lista de
+                documentos), 'paginas' (desde, hasta) y/o 'etiquetas' (lista)
+            ef: ef de búsqueda HNSW para esta consulta (None = el configurado);
+                más alto = más exacto y más lento. Con filtros la búsqueda ya es exacta
+
+        Returns:
+            Lista de Recuperado ordenada por puntaje descendente
+        """
+        return self.buscar_lote([vector], k, filtros, ef)[0]
+
+    def buscar_lote(self, vectores: Sequence[Sequence[float]], k: int,
+                    filtros: Optional[Dict] = None, ef: Optional[int] = None) -> List[List[Recuperado]]:
+        """
+        Igual que buscar() para varias consultas con una sola llamada al índice
+
+        Returns:
+            Una lista de Recuperado por vector, en el mismo orden
+        """
+        from langchain.schema import Document
+
+        with self._lock:
+            self._en_uso += 1
+        try:
+            if filtros and any(filtros.values()):
+                return self._buscar_filtrado(vectores, k, filtros)
+            coleccion = self.cargar()._collection
+            n = coleccion.count()
+            if n == 0:
+                return [[] for _ in vectores]
+
+            espacio = (coleccion.metadata or {}).get("hnsw:space", "l2")
+            incluir = ["documents", "metadatas", "distances"]
+            if espacio != "cosine":
+                incluir.append("embeddings")
+            with self._control_ef.usar(indice_hnsw(self._cliente_chroma(), coleccion),
+                                       ef or self.config_indice.ef_busqueda):
+                r = coleccion.query(
+                    query_embeddings=[list(v) for v in vectores], n_results=min(k, n), include=incluir
+                )
+        finally:
+            with self._lock:
+                self._en_uso -= 1
+
+        resultados = []
+        for i, vector in enumerate(vectores):
+            if espacio == "cosine":
+                puntajes = [1.0 - d for d in r["distances"][i]]
+            else:
+                # Colecciones antiguas (l2/ip): el puntaje se calcula como coseno exacto
+                q = np.asarray(vector, dtype=np.float32)
+                m = np.asarray(r["embeddings"][i], dtype=np.float32)
+                puntajes = (m @ q / (np.linalg.norm(m, axis=1) * np.linalg.norm(q) + 1e-12)).tolist()
+
+            resultados.append([
+                Recuperado(
+                    documento=Document(page_content=texto, metadata=dict(meta or {})),
+                    puntaje=float(puntaje),
+                    id=id_,
+                    coleccion=self.nombre,
+                )
+                for id_, texto, meta, puntaje in zip(r["ids"][i], r["documents"][i], r["metadatas"][i], puntajes)
+            ])
+        return resultados
+
+    def _buscar_filtrado(self, vectores: Sequence[Sequence[float]], k: int,
+                         filtros: Dict) -> List[List[Recuperado]]:
+        """
+        Búsqueda exacta solo sobre los fragmentos que cumplen los filtros
+
+        El índice de fuentes da los ids candidatos antes de puntuar, así que el
+        costo depende del tamaño del subconjunto y no de la colección completa.
+        """
+        ids, matriz = self._vectores_filtrados(filtros)
+        if not ids:
+            return [[] for _ in vectores]
+
+        q = np.asarray(vectores, dtype=np.float32)
+        q /= np.linalg.norm(q, axis=1, keepdims=True) + 1e-12
+        todos = q @ matriz.T
+        k = min(k, len(ids))
+
+        seleccion = []
+        for puntajes in todos:
+            mejores = np.argpartition(-puntajes, k - 1)[:k]
+            seleccion.append((puntajes, mejores[np.argsort(-puntajes[mejores])]))
+
+        por_id = self._documentos_por_id({ids[i] for _, mejores in seleccion for i in mejores})
+        return [
+            [
+                Recuperado(documento=por_id[ids[i]], puntaje=float(puntajes[i]), id=ids[i], coleccion=self.nombre)
+                for i in mejores
+                if ids[i] in por_id
+            ]
+            for puntajes, mejores in seleccion
+        ]
+
+    def _documentos_por_id(self, ids: List[str]) -> Dict:
+        from langchain.schema import Document
+
+        r = self.vectorstore._collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return {
+            id_: Document(page_content=texto, metadata=dict(meta or {}))
+            for id_, texto, meta in zip(r["ids"], r["documents"], r["metadatas"])
+        }
+
+    def obtener_fragmentos(self, ids: List[str]) -> Dict:
+        """
+        Recupera fragmentos por id desde la versión activa
+
+        Returns:
+            dict id -> Document (los ids que ya no existen se omiten)
+        """
+        with self._lock:
+            self._en_uso += 1
+        try:
+            if not self.existe():
+                return {}
+            self.cargar()
+            return self._documentos_por_id(ids)
+        finally:
+            with self._lock:
+                self._en_uso -= 1
+
+
+class GestorColecciones:
+    """
+    Administra las colecciones por curso: carga diferida, LRU de residentes y
+    búsqueda en paralelo sobre varias colecciones
+    """
+
+    def __init__(self, persist_directory: str, predeterminada: str, obtener_embeddings: Callable,
+                 tamano_lote: int = 64, max_residentes: int = 16, max_hilos: int = 8,
+                 config_indice: Optional[ConfigIndice] = None):
+        """
+        Args:
+            persist_directory: Directorio raíz de la base vectorial
+            predeterminada: Colección por defecto (vive en persist_directory por compatibilidad)
+            obtener_embeddings: Función que devuelve el modelo de embeddings
+            tamano_lote: Ver Coleccion
+            max_residentes: Colecciones que pueden estar cargadas en memoria a la vez
+            max_hilos: Hilos para buscar en varias colecciones en paralelo
+            config_indice: Parámetros HNSW por defecto de las colecciones (ver indice_hnsw.py)
+        """
+        self.persist_directory = persist_directory
+        self.predeterminada = predeterminada
+        self.obtener_embeddings = obtener_embeddings
+        self.tamano_lote = tamano_lote
+        self.max_residentes = max_residentes
+        self.config_indice = config_indice
+        self._colecciones: Dict[str, Coleccion] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="busqueda")
+
+    def _directorio_cursos(self) -> str:
+        return os.path.join(self.persist_directory, "cursos")
+
+    def obtener(self, nombre: Optional[str] = None) -> Coleccion:
+        """
+        Devuelve el objeto de una colección (sin cargarla)
+
+        Args:
+            nombre: Nombre del curso (None para la colección predeterminada)
+        """
+        nombre = self.predeterminada if nombre is None or nombre == self.predeterminada else normalizar_nombre(nombre)
+        with self._lock:
+            if nombre not in self._colecciones:
+                directorio = (
+                    self.persist_directory if nombre == self.predeterminada
+                    else os.path.join(self._directorio_cursos(), nombre)
+                )
+                self._colecciones[nombre] = Coleccion(
+                    nombre, directorio, self.obtener_embeddings, self.tamano_lote,
+                    config_indice=self.config_indice,
+                )
+            return self._colecciones[nombre]
+
+    def montar(self, coleccion) -> str:
+        """
+        Sirve una colección ya construida (p. ej. una instantánea de solo lectura)
+        bajo su nombre, en lugar de la colección de Chroma
+
+        Returns:
+            El nombre con el que quedó registrada
+        """
+        with self._lock:
+            anterior = self._colecciones.get(coleccion.nombre)
+            self._colecciones[coleccion.nombre] = coleccion
+        if anterior is not None and anterior is not coleccion:
+            anterior.descargar()
+        return coleccion.nombre
+
+    def usar(self, nombre: Optional[str] = None) -> Coleccion:
+        """
+        Carga una colección (si hace falta) y descarga las menos usadas
+        """
+        coleccion = self.obtener(nombre)
+        coleccion.cargar()
+        self._expulsar_frias()
+        return coleccion
+
+    def _expulsar_frias(self):
+        with self._lock:
+            residentes = sorted(
+                (c for c in self._colecciones.values() if c.residente), key=lambda c: c.ultimo_uso
+            )
+        for coleccion in residentes[:max(0, len(residentes) - self.max_residentes)]:
+            coleccion.descargar()
+
+    def nombres(self) -> List[str]:
+        """
+        Colecciones con datos persistidos
+        """
+        nombres = []
+        if self.obtener().existe():
+            nombres.append(self.predeterminada)
+        if os.path.isdir(self._directorio_cursos()):
+            for nombre in sorted(os.listdir(self._directorio_cursos())):
+                if os.path.exists(os.path.join(self._directorio_cursos(), nombre, f"{nombre}.activa.json")):
+                    nombres.append(nombre)
+        with self._lock:
+            montadas = sorted(n for n, c in self._colecciones.items() if c.solo_lectura)
+        return list(dict.fromkeys(nombres + montadas))
+
+    def residentes(self) -> List[str]:
+        with self._lock:
+            return [c.nombre for c in self._colecciones.values() if c.residente]
+
+    def resolver(self, colecciones=None) -> List[str]:
+        """
+        Normaliza la selección de colecciones: None, un nombre, una lista o 'todas'
+        """
+        if colecciones is None:
+            return [self.predeterminada]
+        if colecciones == TODAS:
+            return self.nombres()
+        if isinstance(colecciones, str):
+            colecciones = [colecciones]
+        return list(dict.fromkeys(self.obtener(c).nombre for c in colecciones))
+
+    def versiones(self, nombres: List[str]) -> List[tuple]:
+        """
+        Tripletas (colección, versión activa, revisión) de las colecciones indicadas
+        """
+        return [(n, self.obtener(n).version_activa, self.obtener(n).revision) for n in nombres]
+
+    def buscar(self, vector: Sequence[float], nombres: List[str], k: int,
+               filtros: Optional[Dict] = None, ef: Optional[int] = None) -> List[Recuperado]:
+        """
+        Busca en varias colecciones en paralelo y fusiona el top-k por puntaje
+
+        Args:
+            filtros, ef: Ver Coleccion.buscar (se aplican en cada colección)
+        """
+        return self.buscar_lote([vector], nombres, k, filtros, ef)[0]
+
+    def buscar_lote(self, vectores: Sequence[Sequence[float]], nombres: List[str], k: int,
+                    filtros: Optional[Dict] = None, ef: Optional[int] = None) -> List[List[Recuperado]]:
+        """
+        Igual que buscar() para varias consultas: una llamada por colección para todo el lote
+
+        Returns:
+            Una lista de Recuperado por vector, en el mismo orden
+        """
+        colecciones = [self.obtener(n) for n in nombres]
+        colecciones = [c for c in colecciones if c.residente or c.existe()]
+        if not colecciones:
+            return [[] for _ in vectores]
+        if len(colecciones) == 1:
+            por_coleccion = [colecciones[0].buscar_lote(vectores, k, filtros, ef)]
+        else:
+            futuros = [self._pool.submit(c.buscar_lote, vectores, k, filtros, ef) for c in colecciones]
+            por_coleccion = [futuro.result() for futuro in futuros]
+        self._expulsar_frias()
+        return [
+            heapq.nlargest(k, (r for lote in por_coleccion for r in lote[i]), key=lambda r: r.puntaje)
+            for i in range(len(vectores))
+        ]
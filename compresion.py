@@ -0,0 +1,181 @@
+"""
+Compresión del contexto a nivel de oración antes de generar.
+
+Los fragmentos recuperados (~1000 caracteres) suelen tener solo un par de
+oraciones que responden la pregunta. El compresor divide cada fragmento en
+oraciones, las compara con la pregunta usando el modelo de embeddings ya
+cargado (una sola llamada por lotes para la pregunta y las oraciones que
+no están en caché) y conserva las relevantes más sus vecinas. El resto se
+sustituye por "…".
+
+Cada fragmento comprimido conserva los metadatos del original (source,
+page, referencias), así que las citas y mostrar_fuentes no cambian; solo
+el prompt es más corto, y con él el prefill del LLM.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SEPARADOR_OMITIDO = " … "
+
+# Fin de oración seguido de algo que parece un comienzo de oración
+_FIN_ORACION = re.compile(r"(?<=[.!?…])\s+(?=[\"'(¿¡]?[A-ZÁÉÍÓÚÑ0-9])")
+_GUION_DE_CORTE = re.compile(r"-\n(?=\w)")
+
+
+def dividir_oraciones(texto: str, largo_minimo: int = 25) -> List[str]:
+    """
+    Divide un fragmento en oraciones
+
+    Los saltos de línea del PDF se tratan como espacios (las palabras
+    cortadas con guion se unen) y las oraciones más cortas que largo_minimo
+    (títulos, numeraciones) se pegan a la siguiente.
+    """
+    limpio = _GUION_DE_CORTE.sub("", texto)
+    limpio = re.sub(r"\s+", " ", limpio).strip()
+    oraciones, pendiente = [], ""
+    for parte in _FIN_ORACION.split(limpio):
+        pendiente = f"{pendiente} {parte}".strip() if pendiente else parte
+        if len(pendiente) >= largo_minimo:
+            oraciones.append(pendiente)
+            pendiente = ""
+    if pendiente:
+        if oraciones:
+            oraciones[-1] = f"{oraciones[-1]} {pendiente}"
+        else:
+            oraciones.append(pendiente)
+    return oraciones
+
+
+class CompresorContexto:
+    """
+    Conserva las oraciones relevantes de cada fragmento y su vecindad
+    """
+
+    def __init__(self, umbral: float = 0.35, vecindad: int = 1, min_oraciones: int = 1,
+                 max_oraciones_cacheadas: int = 4096):
+        """
+        Args:
+            umbral: Similitud coseno mínima con la pregunta para conservar una oración
+            vecindad: Oraciones vecinas (antes y después) que acompañan a cada oración conservada
+            min_oraciones: Mejores oraciones que se conservan de cada fragmento aunque no lleguen al umbral
+            max_oraciones_cacheadas: Embeddings de oraciones que se guardan entre consultas
+        """
+        if vecindad < 0 or min_oraciones < 0:
+            raise ValueError("'vecindad' y 'min_oraciones' no pueden ser negativos")
+        self.umbral = umbral
+        self.vecindad = vecindad
+        self.min_oraciones = min_oraciones
+        self.max_oraciones_cacheadas = max_oraciones_cacheadas
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _vectores(self, pregunta: str, oraciones: List[str], embeddings) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vector normalizado de la pregunta y matriz normalizada de las oraciones
+        """
+        with self._lock:
+            conocidos = {}
+            for oracion in dict.fromkeys(oraciones):
+                if oracion in self._cache:
+                    self._cache.move_to_end(oracion)
+                    conocidos[oracion] = self._cache[oracion]
+        faltantes = [oracion for oracion in dict.fromkeys(oraciones) if oracion not in conocidos]
+        matriz = np.asarray(embeddings.embed_documents([pregunta] + faltantes), dtype=np.float32)
+        matriz /= np.clip(np.linalg.norm(matriz, axis=1, keepdims=True), 1e-12, None)
+
+        nuevos = dict(zip(faltantes, matriz[1:]))
+        with self._lock:
+            self._cache.update(nuevos)
+            while len(self._cache) > self.max_oraciones_cacheadas:
+                self._cache.popitem(last=False)
+        conocidos.update(nuevos)
+        return matriz[0], np.vstack([conocidos[oracion] for oracion in oraciones])
+
+    def _conservar(self, puntajes: np.ndarray) -> List[int]:
+        elegidas = set(np.flatnonzero(puntajes >= self.umbral).tolist())
+        elegidas.update(np.argsort(-puntajes)[:self.min_oraciones].tolist())
+        con_vecinas = set()
+        for i in elegidas:
+            con_vecinas.update(range(max(0, i - self.vecindad), min(len(puntajes), i + self.vecindad + 1)))
+        return sorted(con_vecinas)
+
+    def comprimir(self, pregunta: str, documentos, embeddings) -> Tuple[List, Dict]:
+        """
+        Comprime los fragmentos que se enviarán al LLM
+
+        Args:
+            pregunta: Pregunta del estudiante
+            documentos: Documents recuperados, en el orden del prompt
+            embeddings: Modelo con embed_documents()
+
+        Returns:
+            (Documents con el texto comprimido y los metadatos originales,
+            dict con 'oraciones', 'oraciones_conservadas', 'caracteres_originales'
+            y 'caracteres_comprimidos')
+        """
+        from langchain.schema import Document
+
+        documentos = list(documentos)
+        por_documento = [dividir_oraciones(doc.page_content) for doc in documentos]
+        todas = [oracion for oraciones in por_documento for oracion in oraciones]
+        info = {
+            "oraciones": len(todas),
+            "oraciones_conservadas": 0,
+            "caracteres_originales": sum(len(doc.page_content) for doc in documentos),
+            "caracteres_comprimidos": 0,
+        }
+        if not todas:
+            info["caracteres_comprimidos"] = info["caracteres_originales"]
+            return documentos, info
+
+        vector_pregunta, matriz = self._vectores(pregunta, todas, embeddings)
+        puntajes = matriz @ vector_pregunta
+
+        comprimidos, inicio = [], 0
+        for doc, oraciones in zip(documentos, por_documento):
+            if not oraciones:
+                comprimidos.append(doc)
+                info["caracteres_comprimidos"] += len(doc.page_content)
+                continue
+            conservadas = self._conservar(puntajes[inicio:inicio + len(oraciones)])
+            inicio += len(oraciones)
+            info["oraciones_conservadas"] += len(conservadas)
+            if len(conservadas) == len(oraciones):
+                comprimidos.append(doc)
+                info["caracteres_comprimidos"] += len(doc.page_content)
+                continue
+
+            tramos, anterior = [], None
+            for i in conservadas:
+                if anterior is not None and i == anterior + 1:
+                    tramos[-1].append(oraciones[i])
+                else:
+                    tramos.append([oraciones[i]])
+                anterior = i
+            texto = SEPARADOR_OMITIDO.join(" ".join(tramo) for tramo in tramos)
+            if conservadas[0] > 0:
+                texto = SEPARADOR_OMITIDO.lstrip() + texto
+            if conservadas[-1] < len(oraciones) - 1:
+                texto += SEPARADOR_OMITIDO.rstrip()
+            comprimidos.append(Document(page_content=texto, metadata=dict(doc.metadata)))
+            info["caracteres_comprimidos"] += len(texto)
+        return comprimidos, info
+
+    def a_dict(self) -> Dict:
+        return {"umbral": self.umbral, "vecindad": self.vecindad, "min_oraciones": self.min_oraciones}
+
+
+def resumen_compresion(info: Optional[Dict]) -> str:
+    """
+    Línea legible con el ahorro de una compresión
+    """
+    if not info or not info["caracteres_originales"]:
+        return "sin compresión"
+    ahorro = 1 - info["caracteres_comprimidos"] / info["caracteres_originales"]
+    return (f"{info['oraciones_conservadas']}/{info['oraciones']} oraciones, "
+            f"{info['caracteres_comprimidos']}/{info['caracteres_originales']} caracteres (-{ahorro:.0%})")
@@ -0,0 +1,109 @@
+"""
+Estado de una conversación con el asistente (modo de preguntas de seguimiento).
+
+Guarda el 'context' que devuelve Ollama tras cada respuesta: el prompt con la
+plantilla y los fragmentos recuperados queda como prefijo estable y las
+preguntas de seguimiento solo envían la parte nueva, sin volver a procesar
+(prefill) el contexto completo.
+"""
+
+import re
+from collections import deque
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Palabras que suelen indicar que la pregunta depende de la anterior
+_REFERENCIAS = {
+    "eso", "esto", "ese", "esa", "este", "esta", "esos", "esas", "estos", "estas", "ello",
+    "anterior", "mismo", "misma", "dicho", "dicha", "su", "sus", "él", "ella",
+    "también", "tambien", "además", "ademas", "otro", "otra", "otros", "otras",
+}
+_CONECTORES_INICIALES = {"y", "entonces", "pero", "además", "ademas", "también", "tambien", "o"}
+
+
+def _palabras(texto: str) -> List[str]:
+    return re.findall(r"\w+", texto.lower())
+
+
+def es_seguimiento(pregunta: str, max_palabras: int = 6) -> bool:
+    """
+    Heurística: ¿la pregunta se entiende solo con la anterior?
+
+    Se consideran de seguimiento las preguntas muy cortas, las que empiezan con
+    un conector ('¿Y...', 'Entonces...') o las que usan demostrativos/pronombres.
+    """
+    palabras = _palabras(pregunta)
+    if not palabras:
+        return False
+    return (
+        len(palabras) <= max_palabras
+        or palabras[0] in _CONECTORES_INICIALES
+        or any(p in _REFERENCIAS for p in palabras)
+    )
+
+
+class Conversacion:
+    """
+    Historial y contexto de Ollama de una conversación
+    """
+
+    def __init__(self, max_turnos: int = 6):
+        """
+        Args:
+            max_turnos: Turnos (pregunta, respuesta) que se recuerdan para reescribir consultas
+        """
+        self.turnos: deque = deque(maxlen=max_turnos)
+        self.contexto: List[int] = []
+        self.ids_en_contexto: Set[Tuple[str, str]] = set()
+        self.modelo: Optional[str] = None
+
+    def reiniciar_contexto(self):
+        """
+        Descarta el contexto de Ollama (el siguiente turno envía el prompt completo)
+        """
+        self.contexto = []
+        self.ids_en_contexto = set()
+
+    def reiniciar(self):
+        self.turnos.clear()
+        self.reiniciar_contexto()
+
+    def reescribir(self, pregunta: str) -> str:
+        """
+        Consulta de búsqueda que tiene en cuenta el historial
+
+        Para preguntas de seguimiento se antepone la pregunta anterior, de modo
+        que '¿y sus desventajas?' recupere fragmentos del mismo tema. No se usa
+        el LLM para reescribir: eso añadiría otra generación completa por turno.
+        """
+        if not self.turnos or not es_seguimiento(pregunta):
+            return pregunta
+        anterior = self.turnos[-1][0]
+        return f"{anterior} {pregunta}"
+
+    def puede_reutilizar(self, modelo: str, tokens_nuevos: int, num_ctx: int, reserva: int = 512) -> bool:
+        """
+        ¿Se puede continuar sobre el contexto actual sin exceder la ventana?
+
+        Args:
+            modelo: Modelo que generará la respuesta (el contexto es específico del modelo)
+            tokens_nuevos: Estimación de tokens del prompt nuevo
+            num_ctx: Ventana de contexto del modelo
+            reserva: Tokens reservados para la respuesta
+        """
+        return (
+            bool(self.contexto)
+            and self.modelo == modelo
+            and len(self.contexto) + tokens_nuevos + reserva <= num_ctx
+        )
+
+    def registrar(self, pregunta: str, respuesta: str, contexto: List[int], modelo: str,
+                  ids: Iterable[Tuple[str, str]], reutilizado: bool):
+        """
+        Guarda el turno y el contexto devuelto por Ollama
+        """
+        self.turnos.append((pregunta, respuesta))
+        if not reutilizado:
+            self.ids_en_contexto = set()
+        self.ids_en_contexto.update(ids)
+        self.contexto = list(contexto)
+        self.modelo = modelo
@@ -0,0 +1,361 @@
+"""
+Eliminación de fragmentos duplicados durante la ingesta.
+
+Detecta duplicados exactos (hash del texto normalizado) y casi duplicados
+(MinHash + LSH) en una sola pasada, sin comparar todos los pares.
+
+Las firmas de los fragmentos almacenados se guardan junto a cada colección
+(FirmasFragmentos), así que una carga posterior también se compara con lo
+que ya está en la base y no solo consigo misma.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Primo de Mersenne 2^61 - 1 para la familia de hashes (a * x + b) mod p
+_PRIMO_MERSENNE = np.uint64((1 << 61) - 1)
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza un texto para comparar fragmentos (minúsculas y espacios colapsados)
+    """
+    return re.sub(r"\s+", " ", texto.lower()).strip()
+
+
+class FirmasFragmentos:
+    """
+    Firmas MinHash y hashes exactos de los fragmentos almacenados en una colección
+    """
+
+    def __init__(self, num_permutaciones: int = 128, semilla: int = 1):
+        self.num_permutaciones = num_permutaciones
+        self.semilla = semilla
+        self.ids: List[str] = []
+        self.exactos: List[str] = []
+        self.firmas = np.empty((0, num_permutaciones), dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def agregar(self, ids: List[str], firmas: np.ndarray, exactos: List[str]):
+        if not ids:
+            return
+        self.ids.extend(ids)
+        self.exactos.extend(exactos)
+        self.firmas = np.vstack([self.firmas, np.asarray(firmas, dtype=np.uint32)])
+
+    def conservar(self, ids: Iterable[str]) -> "FirmasFragmentos":
+        """
+        Copia con solo las firmas de los ids indicados (los que siguen en la colección)
+        """
+        ids = set(ids)
+        filas = [i for i, id_ in enumerate(self.ids) if id_ in ids]
+        copia = FirmasFragmentos(self.num_permutaciones, self.semilla)
+        copia.agregar([self.ids[i] for i in filas], self.firmas[filas], [self.exactos[i] for i in filas])
+        return copia
+
+    def guardar(self, ruta: str):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta) or ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f, ids=np.array(self.ids, dtype=str), exactos=np.array(self.exactos, dtype=str),
+                firmas=self.firmas, parametros=np.array([self.num_permutaciones, self.semilla]),
+            )
+        os.replace(tmp, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> Optional["FirmasFragmentos"]:
+        """
+        Carga firmas guardadas (None si el archivo no existe o no es válido)
+        """
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with np.load(ruta, allow_pickle=False) as datos:
+                num_permutaciones, semilla = (int(v) for v in datos["parametros"])
+                firmas = cls(num_permutaciones, semilla)
+                firmas.agregar(datos["ids"].tolist(), datos["firmas"], datos["exactos"].tolist())
+            return firmas
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+class DeduplicadorMinHash:
+    """
+    Deduplicador en streaming de fragmentos (Documents de LangChain)
+    """
+
+    def __init__(self, num_permutaciones: int = 128, bandas: int = 32, umbral: float = 0.85,
+                 tamano_shingle: int = 5, semilla: int = 1):
+        """
+        Args:
+            num_permutaciones: Tamaño de la firma MinHash
+            bandas: Número de bandas LSH (debe dividir a num_permutaciones)
+            umbral: Similitud Jaccard estimada a partir de la cual se considera duplicado
+            tamano_shingle: Palabras por shingle
+            semilla: Semilla de la familia de hashes (firmas reproducibles)
+        """
+        if num_permutaciones % bandas != 0:
+            raise ValueError("num_permutaciones debe ser múltiplo de bandas")
+
+        self.num_permutaciones = num_permutaciones
+        self.bandas = bandas
+        self.filas = num_permutaciones // bandas
+        self.umbral = umbral
+        self.tamano_shingle = tamano_shingle
+        self.semilla = semilla
+
+        # a, b < 2^31 y hashes de 32 bits: a * x + b nunca desborda uint64
+        rng = np.random.RandomState(semilla)
+        self._a = rng.randint(1, 1 << 31, size=num_permutaciones).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_permutaciones).astype(np.uint64)
+
+        self._exactos: Dict[str, int] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bandas)]
+        self._firmas: List[np.ndarray] = []
+        self._claves_exactas: List[str] = []
+        # Solo la metadata de cada representante: el texto no se retiene tras emitirlo
+        self._representantes: List[Optional[Dict]] = []
+        self._fusionados: set = set()
+        # Representantes ya almacenados (ver sembrar): ocupan las primeras posiciones
+        self._ids_semilla: List[str] = []
+        self._obtener_metadata: Optional[Callable[[str], Dict]] = None
+
+        self.total_procesados = 0
+        self.duplicados_exactos = 0
+        self.casi_duplicados = 0
+
+    def _shingles(self, texto: str) -> List[str]:
+        palabras = texto.split(" ")
+        if len(palabras) <= self.tamano_shingle:
+            return [texto]
+        return [
+            " ".join(palabras[i:i + self.tamano_shingle])
+            for i in range(len(palabras) - self.tamano_shingle + 1)
+        ]
+
+    def firma(self, texto_normalizado: str) -> np.ndarray:
+        """
+        Calcula la firma MinHash de un texto ya normalizado
+        """
+        hashes = np.array(
+            [
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                for s in set(self._shingles(texto_normalizado))
+            ],
+            dtype=np.uint64,
+        )
+        permutados = (np.outer(hashes, self._a) + self._b) % _PRIMO_MERSENNE & _MASCARA_32
+        return permutados.min(axis=0).astype(np.uint32)
+
+    def sembrar(self, firmas: FirmasFragmentos, obtener_metadata: Callable[[str], Dict],
+                vivo: Callable[[str], bool] = lambda id_: True, conocidas: Optional[Dict[str, Dict]] = None) -> int:
+        """
+        Registra fragmentos ya almacenados como representantes
+
+        Los fragmentos nuevos que los dupliquen no se emiten: su referencia se
+        agrega a la metadata del almacenado (ver existentes_actualizados).
+        Debe llamarse antes de procesar().
+
+        Args:
+            firmas: Firmas guardadas de la colección
+            obtener_metadata: Función id -> metadata actual, para los que reciban duplicados
+            vivo: Filtra los ids que siguen en la colección (y no se van a borrar)
+            conocidas: Metadata ya corregida de algunos ids (p. ej. sin las referencias a un
+                documento reemplazado); se reporta como actualizada aunque no reciba duplicados
+
+        Returns:
+            Número de fragmentos registrados
+        """
+        if self._representantes:
+            raise RuntimeError("sembrar() debe llamarse antes de procesar fragmentos")
+        if (firmas.num_permutaciones, firmas.semilla) != (self.num_permutaciones, self.semilla):
+            print("⚠️  Las firmas guardadas usan otros parámetros MinHash; no se comparan con lo almacenado")
+            return 0
+        conocidas = conocidas or {}
+        self._obtener_metadata = obtener_metadata
+        for fila, (id_, clave_exacta) in enumerate(zip(firmas.ids, firmas.exactos)):
+            if not vivo(id_):
+                continue
+            idx = len(self._representantes)
+            self._representantes.append(conocidas.get(id_))
+            if id_ in conocidas:
+                self._fusionados.add(idx)
+            self._ids_semilla.append(id_)
+            self._firmas.append(firmas.firmas[fila])
+            self._claves_exactas.append(clave_exacta)
+            self._exactos.setdefault(clave_exacta, idx)
+            for banda, clave in self._claves_lsh(firmas.firmas[fila]):
+                self._buckets[banda].setdefault(clave, []).append(idx)
+        return len(self._ids_semilla)
+
+    def _claves_lsh(self, firma: np.ndarray) -> Iterator[Tuple[int, bytes]]:
+        for banda in range(self.bandas):
+            inicio = banda * self.filas
+            yield banda, firma[inicio:inicio + self.filas].tobytes()
+
+    def _buscar_candidato(self, firma: np.ndarray) -> int:
+        """
+        Devuelve el índice del representante más parecido o -1 si no hay ninguno
+        """
+        vistos = set()
+        mejor, mejor_similitud = -1, self.umbral
+        for banda, clave in self._claves_lsh(firma):
+            for idx in self._buckets[banda].get(clave, ()):
+                if idx in vistos:
+                    continue
+                vistos.add(idx)
+                similitud = float(np.mean(self._firmas[idx] == firma))
+                if similitud >= mejor_similitud:
+                    mejor, mejor_similitud = idx, similitud
+        return mejor
+
+    @staticmethod
+    def _referencia(doc) -> List:
+        return [doc.metadata.get("source", "Desconocido"), doc.metadata.get("page", "?")]
+
+    def _fusionar(self, idx: int, duplicado):
+        """
+        Agrega la referencia (source, page) del duplicado al representante
+        """
+        metadata = self._representantes[idx]
+        if metadata is None:
+            metadata = self._representantes[idx] = dict(self._obtener_metadata(self._ids_semilla[idx]))
+        referencias = [list(ref) for ref in referencias_de_metadata(metadata)]
+        ref = self._referencia(duplicado)
+        if ref not in referencias:
+            referencias.append(ref)
+        metadata["referencias"] = json.dumps(referencias, ensure_ascii=False)
+        metadata["num_duplicados"] = metadata.get("num_duplicados", 0) + 1
+        self._fusionados.add(idx)
+
+    def procesar(self, chunks: Iterable) -> Iterator:
+        """
+        Filtra un flujo de fragmentos y emite solo la primera copia de cada uno
+
+        Las referencias de los duplicados se agregan a la metadata del
+        representante ya emitido, por lo que el consumidor debe almacenar
+        los fragmentos después de agotar el iterador (o actualizar su metadata).
+
+        Args:
+            chunks: Iterable de Documents
+
+        Yields:
+            Documents únicos con metadata 'referencias' (JSON) y 'num_duplicados'
+        """
+        for doc in chunks:
+            self.total_procesados += 1
+            texto = normalizar_texto(doc.page_content)
+            if not texto:
+                continue
+
+            clave_exacta = hashlib.sha1(texto.encode("utf-8")).hexdigest()
+            idx = self._exactos.get(clave_exacta)
+            if idx is not None:
+                self.duplicados_exactos += 1
+                self._fusionar(idx, doc)
+                continue
+
+            firma = self.firma(texto)
+            idx = self._buscar_candidato(firma)
+            if idx >= 0:
+                self.casi_duplicados += 1
+                self._exactos[clave_exacta] = idx
+                self._fusionar(idx, doc)
+                continue
+
+            idx = len(self._representantes)
+            doc.metadata["referencias"] = json.dumps([self._referencia(doc)], ensure_ascii=False)
+            doc.metadata["num_duplicados"] = 0
+            self._representantes.append(doc.metadata)
+            self._firmas.append(firma)
+            self._claves_exactas.append(clave_exacta)
+            self._exactos[clave_exacta] = idx
+            for banda, clave in self._claves_lsh(firma):
+                self._buckets[banda].setdefault(clave, []).append(idx)
+            yield doc
+
+    def actualizados(self) -> List[Tuple[int, Dict]]:
+        """
+        Representantes cuya metadata cambió después de emitirse
+
+        Returns:
+            Pares (posición en el flujo de salida, metadata actual), para que
+            un consumidor que ya los almacenó actualice sus referencias
+        """
+        semillas = len(self._ids_semilla)
+        return [(idx - semillas, self._representantes[idx]) for idx in sorted(self._fusionados) if idx >= semillas]
+
+    def existentes_actualizados(self) -> List[Tuple[str, Dict]]:
+        """
+        Fragmentos ya almacenados (ver sembrar) cuya metadata cambió
+
+        Returns:
+            Pares (id, metadata actual)
+        """
+        semillas = len(self._ids_semilla)
+        return [(self._ids_semilla[idx], self._representantes[idx]) for idx in sorted(self._fusionados) if idx < semillas]
+
+    def firmas_emitidas(self) -> Tuple[np.ndarray, List[str]]:
+        """
+        Firmas y hashes exactos de los fragmentos emitidos, en el orden del flujo de salida
+        """
+        semillas = len(self._ids_semilla)
+        firmas = self._firmas[semillas:]
+        matriz = np.vstack(firmas) if firmas else np.empty((0, self.num_permutaciones), dtype=np.uint32)
+        return matriz, self._claves_exactas[semillas:]
+
+    @property
+    def eliminados(self) -> int:
+        return self.duplicados_exactos + self.casi_duplicados
+
+
+def referencias_de_metadata(metadata: Dict) -> List[Tuple[str, object]]:
+    """
+    Devuelve todas las referencias (source, page) guardadas en la metadata de un fragmento
+    """
+    crudo = metadata.get("referencias")
+    if not crudo:
+        return [(metadata.get("source", "Desconocido"), metadata.get("page", "?"))]
+    return [tuple(ref) for ref in json.loads(crudo)]
+
+
+def quitar_referencias(metadata: Dict, fuentes) -> Optional[Dict]:
+    """
+    Metadata de un fragmento sin las referencias a unas fuentes
+
+    Si 'source' era una de ellas, pasa a la primera referencia que queda.
+
+    Args:
+        metadata: Metadata del fragmento
+        fuentes: Nombres de fuente (tal como aparecen en las referencias) a quitar
+
+    Returns:
+        Metadata nueva, o None si el fragmento solo citaba esas fuentes
+    """
+    referencias = referencias_de_metadata(metadata)
+    restantes = [ref for ref in referencias if ref[0] not in fuentes]
+    if not restantes:
+        return None
+    nueva = dict(metadata)
+    if len(restantes) < len(referencias):
+        nueva["referencias"] = json.dumps([list(ref) for ref in restantes], ensure_ascii=False)
+        nueva["num_duplicados"] = max(0, metadata.get("num_duplicados", 0) - (len(referencias) - len(restantes)))
+        if nueva.get("source") in fuentes:
+            nueva["source"], nueva["page"] = restantes[0]
+    return nueva
+
+
+def referencias_de(doc) -> List[Tuple[str, object]]:
+    """
+    Devuelve todas las referencias (source, page) de un fragmento deduplicado
+    """
+    return referencias_de_metadata(doc.metadata)
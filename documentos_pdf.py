@@ -0,0 +1,136 @@
+"""
+Fuentes de PDFs para la ingesta: rutas en disco, bytes en memoria u objetos
+tipo archivo (por ejemplo los UploadedFile de Streamlit).
+
+Los PDFs subidos se procesan directamente desde memoria, sin escribirlos a un
+archivo temporal, y el hash de su contenido se calcula una sola vez y se
+reutiliza para la caché de páginas y para descartar subidas repetidas.
+"""
+
+import hashlib
+import io
+import os
+from typing import Iterator, List, Optional
+
+
+def hash_archivo(ruta: str, tamano_bloque: int = 1 << 20) -> str:
+    """
+    SHA-256 del contenido de un archivo, leído por bloques
+    """
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class DocumentoPDF:
+    """
+    PDF a ingerir, independiente de dónde esté su contenido
+    """
+
+    def __init__(self, origen, nombre: Optional[str] = None, hash_contenido: Optional[str] = None):
+        """
+        Args:
+            origen: Ruta (str), bytes/bytearray/memoryview u objeto tipo archivo binario
+            nombre: Nombre a usar como 'source' (por defecto la ruta o el .name del archivo)
+            hash_contenido: SHA-256 ya calculado del contenido, si se conoce
+        """
+        self.ruta = origen if isinstance(origen, str) else None
+        self._archivo = None
+        self._datos = None
+
+        if self.ruta is None:
+            if isinstance(origen, (bytes, bytearray, memoryview)):
+                self._datos = memoryview(origen)
+            elif hasattr(origen, "read"):
+                self._archivo = origen
+                # getbuffer() expone el buffer de un BytesIO sin copiarlo
+                if hasattr(origen, "getbuffer"):
+                    self._datos = origen.getbuffer()
+                elif hasattr(origen, "getvalue"):
+                    self._datos = memoryview(origen.getvalue())
+                else:
+                    origen.seek(0)
+                    self._datos = memoryview(origen.read())
+            else:
+                raise TypeError(f"Fuente de PDF no soportada: {type(origen).__name__}")
+
+        self.nombre = nombre or self.ruta or getattr(origen, "name", None) or "documento.pdf"
+        self._hash = hash_contenido
+
+    @classmethod
+    def desde(cls, origen) -> "DocumentoPDF":
+        """
+        Convierte cualquier fuente soportada en DocumentoPDF
+        """
+        return origen if isinstance(origen, cls) else cls(origen)
+
+    @property
+    def en_memoria(self) -> bool:
+        return self.ruta is None
+
+    @property
+    def hash(self) -> str:
+        """
+        SHA-256 del contenido (se calcula una sola vez)
+        """
+        if self._hash is None:
+            if self.ruta is not None:
+                self._hash = hash_archivo(self.ruta)
+            else:
+                self._hash = hashlib.sha256(self._datos).hexdigest()
+        return self._hash
+
+    @property
+    def nombre_corto(self) -> str:
+        return os.path.basename(self.nombre)
+
+    def _flujo(self):
+        if self._archivo is not None and hasattr(self._archivo, "seek"):
+            self._archivo.seek(0)
+            return self._archivo
+        return io.BytesIO(self._datos)
+
+    def extraer_paginas(self) -> List:
+        """
+        Extrae el texto de cada página (mismo formato que PyPDFLoader)
+
+        Returns:
+            Lista de Documents con metadata 'source' y 'page'
+        """
+        if self.ruta is not None:
+            from langchain.document_loaders import PyPDFLoader
+
+            return PyPDFLoader(self.ruta).load()
+
+        import pypdf
+        from langchain.schema import Document
+
+        lector = pypdf.PdfReader(self._flujo())
+        return [
+            Document(page_content=pagina.extract_text(), metadata={"source": self.nombre, "page": i})
+            for i, pagina in enumerate(lector.pages)
+        ]
+
+    def iterar_paginas(self) -> Iterator:
+        """
+        Igual que extraer_paginas() pero entregando las páginas de una en una
+
+        Las páginas ya entregadas no se retienen, así que un documento largo
+        no se materializa completo como lista de Documents.
+
+        Yields:
+            Documents con metadata 'source' y 'page'
+        """
+        import pypdf
+        from langchain.schema import Document
+
+        source = self.ruta if self.ruta is not None else self.nombre
+        flujo = open(self.ruta, "rb") if self.ruta is not None else self._flujo()
+        try:
+            for i, pagina in enumerate(pypdf.PdfReader(flujo).pages):
+                yield Document(page_content=pagina.extract_text(), metadata={"source": source, "page": i})
+        finally:
+            if self.ruta is not None:
+                flujo.close()
@@ -0,0 +1,439 @@
+"""
+Modos de inferencia en CPU para el modelo de embeddings.
+
+    fp32  SentenceTransformer de PyTorch tal cual (camino por defecto)
+    int8  Cuantización dinámica int8 de las capas Linear con torch
+    onnx  Grafo exportado a ONNX y ejecutado con ONNX Runtime
+          (requiere `pip install onnxruntime`)
+
+Un modo optimizado solo se usa si sus vectores concuerdan con los de fp32:
+la similitud coseno mínima sobre las frases de control debe superar el
+umbral. Si no la supera, o si falta alguna dependencia, se usa fp32 con un
+aviso. Así los vectores ya indexados con fp32 siguen sirviendo.
+
+El grafo ONNX se exporta una sola vez a .cache_onnx/ junto con el
+tokenizador y el resultado de la verificación; los arranques siguientes lo
+cargan sin pasar por el modelo de PyTorch.
+
+Uso (benchmark de rendimiento):
+    python embeddings_cpu.py [--modos fp32 int8 onnx] [--hilos 1 4] [--textos 256] [--json]
+
+El modo del asistente se elige con AsistenteAcademico(modo_embeddings=...),
+la variable de entorno ASISTENTE_MODO_EMBEDDINGS o --modo-embeddings en servidor.py.
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MODOS = ("fp32", "int8", "onnx")
+UMBRAL_CONCORDANCIA = 0.98
+DIRECTORIO_ONNX = "./.cache_onnx"
+ARCHIVO_ONNX = "modelo.onnx"
+ARCHIVO_CONFIG_ONNX = "embeddings_onnx.json"
+
+# Frases con las que se compara cada modo optimizado contra fp32
+FRASES_CONTROL = (
+    "¿Qué es RAG y cómo funciona?",
+    "La recuperación aumentada con generación combina búsqueda de documentos con un modelo generativo.",
+    "Los embeddings representan el significado de un texto como un vector de números reales.",
+    "¿Cuál es la diferencia entre precisión y recall?",
+    "Una base de datos vectorial permite buscar fragmentos por similitud semántica.",
+    "El modelo de lenguaje genera la respuesta a partir del contexto recuperado.",
+    "Explica el teorema de Pitágoras con un ejemplo.",
+    "Las redes neuronales se entrenan ajustando sus pesos con descenso de gradiente.",
+    "What is the capital of France?",
+    "1. Descripción inicial del problema\nEn el ámbito académico, los estudiantes suelen consultar grandes volúmenes de material.",
+    "HNSW",
+)
+
+
+def parsear_cpus(texto: Optional[str]) -> Optional[Tuple[int, ...]]:
+    """
+    Convierte una lista de núcleos como "0-3,6" en (0, 1, 2, 3, 6)
+
+    Returns:
+        Tupla ordenada de núcleos, o None si el texto está vacío
+    """
+    if not texto or not texto.strip():
+        return None
+    cpus = set()
+    for parte in texto.split(","):
+        inicio, _, fin = parte.strip().partition("-")
+        try:
+            cpus.update(range(int(inicio), int(fin or inicio) + 1))
+        except ValueError:
+            raise ValueError(f"Lista de núcleos no válida: {texto!r} (ejemplo: 0-3,6)")
+    return tuple(sorted(cpus))
+
+
+def configurar_hilos(hilos: Optional[int] = None, cpus: Optional[Sequence[int]] = None):
+    """
+    Fija los hilos de inferencia de torch y, opcionalmente, los núcleos del proceso
+
+    Args:
+        hilos: Hilos intra-op de torch (None = los que elija torch)
+        cpus: Núcleos a los que se fija el proceso (solo Linux; afecta a todo el proceso)
+    """
+    if cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, set(cpus))
+        else:
+            print("⚠️  La afinidad de CPU solo está disponible en Linux")
+    if hilos:
+        try:
+            import torch
+
+            torch.set_num_threads(hilos)
+        except ImportError:
+            pass
+
+
+def cargar_fp32(modelo: str, dispositivo: str = "cpu"):
+    """
+    Modelo de sentence-transformers en fp32 envuelto para LangChain
+    """
+    from langchain.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=modelo,
+        model_kwargs={"device": dispositivo},  # Cambiar a 'cuda' si tienen GPU
+    )
+
+
+def cuantizar_int8(base):
+    """
+    Copia de unos HuggingFaceEmbeddings con las capas Linear cuantizadas a int8
+
+    La capa de embeddings de tokens no se cuantiza: la ganancia es de
+    velocidad en el encoder, no de memoria.
+    """
+    import torch
+
+    cliente = torch.quantization.quantize_dynamic(base.client, {torch.nn.Linear}, dtype=torch.qint8)
+    return base.copy(update={"client": cliente})
+
+
+def _ruta_onnx(modelo: str, directorio_cache: str = DIRECTORIO_ONNX) -> str:
+    return os.path.join(directorio_cache, modelo.replace("/", "__"))
+
+
+def _leer_config_onnx(directorio: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directorio, ARCHIVO_CONFIG_ONNX), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_config_onnx(directorio: str, config: Dict):
+    with open(os.path.join(directorio, ARCHIVO_CONFIG_ONNX), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+def exportar_onnx(base, directorio: str) -> str:
+    """
+    Exporta el transformer de unos HuggingFaceEmbeddings a ONNX con su tokenizador
+
+    Solo admite modelos con mean pooling (como paraphrase-multilingual-MiniLM-L12-v2).
+
+    Returns:
+        Directorio con modelo.onnx, el tokenizador y embeddings_onnx.json
+    """
+    import torch
+
+    transformer, pooling = base.client[0], base.client[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError("La exportación a ONNX solo admite modelos con mean pooling")
+
+    os.makedirs(directorio, exist_ok=True)
+    ejemplo = transformer.tokenizer(["ejemplo de exportación"], return_tensors="pt")
+    torch.onnx.export(
+        transformer.auto_model,
+        (ejemplo["input_ids"], ejemplo["attention_mask"]),
+        os.path.join(directorio, ARCHIVO_ONNX),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "lote", 1: "secuencia"},
+            "attention_mask": {0: "lote", 1: "secuencia"},
+            "last_hidden_state": {0: "lote", 1: "secuencia"},
+        },
+        opset_version=14,
+    )
+    transformer.tokenizer.save_pretrained(directorio)
+    normalizar = any(type(capa).__name__ == "Normalize" for capa in base.client)
+    _guardar_config_onnx(directorio, {
+        "max_longitud": base.client.max_seq_length,
+        "normalizar": normalizar,
+    })
+    return directorio
+
+
+class EmbeddingsONNX:
+    """
+    Embeddings con el grafo ONNX del modelo en ONNX Runtime
+
+    Reproduce lo que hace sentence-transformers: tokenización truncada a
+    max_longitud y mean pooling con la máscara de atención.
+    """
+
+    def __init__(self, directorio: str, hilos: Optional[int] = None, tamano_lote: int = 32):
+        """
+        Args:
+            directorio: Resultado de exportar_onnx()
+            hilos: Hilos intra-op de ONNX Runtime (None = todos los núcleos)
+            tamano_lote: Textos por llamada a la sesión
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        opciones = onnxruntime.SessionOptions()
+        opciones.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+            opciones.inter_op_num_threads = 1
+
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, ARCHIVO_ONNX)
+        self.sesion = onnxruntime.InferenceSession(self.ruta, opciones, providers=["CPUExecutionProvider"])
+        self.tokenizador = AutoTokenizer.from_pretrained(directorio)
+        self.config = _leer_config_onnx(directorio) or {}
+        self.max_longitud = self.config.get("max_longitud", 128)
+        self.tamano_lote = tamano_lote
+
+    def _codificar(self, textos: List[str]) -> np.ndarray:
+        vectores = []
+        for inicio in range(0, len(textos), self.tamano_lote):
+            lote = self.tokenizador(
+                textos[inicio:inicio + self.tamano_lote], padding=True, truncation=True,
+                max_length=self.max_longitud, return_tensors="np",
+            )
+            mascara = lote["attention_mask"].astype(np.int64)
+            estados = self.sesion.run(None, {
+                "input_ids": lote["input_ids"].astype(np.int64),
+                "attention_mask": mascara,
+            })[0]
+            pesos = mascara[..., None].astype(np.float32)
+            vectores.append((estados * pesos).sum(axis=1) / np.clip(pesos.sum(axis=1), 1e-9, None))
+        resultado = np.concatenate(vectores) if vectores else np.zeros((0, 0), dtype=np.float32)
+        if self.config.get("normalizar"):
+            resultado /= np.clip(np.linalg.norm(resultado, axis=1, keepdims=True), 1e-12, None)
+        return resultado
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        return self._codificar([t.replace("\n", " ") for t in textos]).tolist()
+
+    def embed_query(self, texto: str) -> List[float]:
+        return self.embed_documents([texto])[0]
+
+    def bytes_pesos(self) -> int:
+        """
+        Tamaño del grafo ONNX (los pesos que carga ONNX Runtime)
+        """
+        return os.path.getsize(self.ruta)
+
+
+def concordancia(referencia, candidato) -> Dict[str, float]:
+    """
+    Similitud coseno fila a fila entre dos matrices de embeddings
+
+    Returns:
+        dict con la similitud 'minima' y 'media'
+    """
+    a = np.asarray(referencia, dtype=np.float64)
+    b = np.asarray(candidato, dtype=np.float64)
+    normas = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    cosenos = np.sum(a * b, axis=1) / np.clip(normas, 1e-12, None)
+    return {"minima": float(cosenos.min()), "media": float(cosenos.mean())}
+
+
+def verificar_concordancia(referencia, candidato, textos: Sequence[str] = FRASES_CONTROL,
+                           umbral: float = UMBRAL_CONCORDANCIA) -> Dict:
+    """
+    Compara los embeddings de un modo optimizado con los de fp32
+
+    Returns:
+        dict con 'minima', 'media', 'umbral' y 'aceptado'
+    """
+    textos = list(textos)
+    resultado = concordancia(referencia.embed_documents(textos), candidato.embed_documents(textos))
+    resultado["umbral"] = umbral
+    resultado["aceptado"] = resultado["minima"] >= umbral
+    return resultado
+
+
+def crear_embeddings(modelo: str, dispositivo: str = "cpu", modo: str = "fp32", hilos: Optional[int] = None,
+                     cpus: Optional[Sequence[int]] = None, umbral: float = UMBRAL_CONCORDANCIA,
+                     directorio_cache: str = DIRECTORIO_ONNX):
+    """
+    Construye el modelo de embeddings en el modo pedido, o en fp32 si no es posible
+
+    Args:
+        modelo: Nombre del modelo de sentence-transformers
+        dispositivo: 'cpu' o 'cuda' (los modos optimizados son solo para CPU)
+        modo: 'fp32', 'int8' u 'onnx'
+        hilos: Hilos de inferencia (ver configurar_hilos)
+        cpus: Núcleos a los que fijar el proceso
+        umbral: Similitud coseno mínima con fp32 para aceptar el modo
+        directorio_cache: Dónde se guardan los grafos ONNX exportados
+
+    Returns:
+        Objeto con embed_documents() y embed_query()
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de embeddings desconocido: {modo} (opciones: {', '.join(MODOS)})")
+    configurar_hilos(hilos, cpus)
+    if modo != "fp32" and dispositivo != "cpu":
+        print(f"⚠️  El modo {modo} es solo para CPU; se usa fp32 en {dispositivo}")
+        modo = "fp32"
+    if modo == "fp32":
+        return cargar_fp32(modelo, dispositivo)
+
+    directorio = _ruta_onnx(modelo, directorio_cache)
+    if modo == "onnx":
+        verificacion = (_leer_config_onnx(directorio) or {}).get("concordancia", {})
+        if verificacion.get("minima", 0.0) >= umbral:
+            try:
+                return EmbeddingsONNX(directorio, hilos)
+            except Exception as e:
+                print(f"⚠️  No se pudo abrir el grafo ONNX guardado ({str(e)}); se vuelve a exportar")
+
+    base = cargar_fp32(modelo, dispositivo)
+    try:
+        if modo == "int8":
+            candidato = cuantizar_int8(base)
+        else:
+            candidato = EmbeddingsONNX(exportar_onnx(base, directorio), hilos)
+        resultado = verificar_concordancia(base, candidato, umbral=umbral)
+    except Exception as e:
+        print(f"⚠️  No se pudo preparar el modo {modo} de embeddings ({str(e)}); se usa fp32")
+        return base
+
+    if modo == "onnx":
+        config = _leer_config_onnx(directorio) or {}
+        config["concordancia"] = resultado
+        _guardar_config_onnx(directorio, config)
+    if not resultado["aceptado"]:
+        print(f"⚠️  El modo {modo} concuerda {resultado['minima']:.4f} con fp32 "
+              f"(mínimo {umbral}); se usa fp32")
+        return base
+    print(f"⚡ Embeddings en modo {modo} (coseno con fp32: mínimo {resultado['minima']:.4f}, "
+          f"media {resultado['media']:.4f})")
+    return candidato
+
+
+def _textos_corpus(directorio: str = "documentos", maximo: int = 256) -> List[str]:
+    """
+    Fragmentos de los PDFs del corpus, o las frases de control si no hay PDFs
+    """
+    pdfs = sorted(glob.glob(os.path.join(directorio, "*.pdf")))
+    if not pdfs:
+        return list(FRASES_CONTROL)
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    from documentos_pdf import DocumentoPDF
+
+    paginas = [pagina for ruta in pdfs for pagina in DocumentoPDF.desde(ruta).extraer_paginas()]
+    divisor = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len,
+                                             separators=["\n\n", "\n", " ", ""])
+    return [c.page_content for c in divisor.split_documents(paginas)][:maximo]
+
+
+def benchmark(modelo: str, modos: Sequence[str] = MODOS, hilos: Sequence[Optional[int]] = (None,),
+              textos: Optional[List[str]] = None, repeticiones: int = 3,
+              directorio_cache: str = DIRECTORIO_ONNX) -> List[Dict]:
+    """
+    Mide el rendimiento y la concordancia con fp32 de cada modo y número de hilos
+
+    Returns:
+        Una fila por (modo, hilos) con textos_por_s, consulta_ms, concordancia y pesos_mb
+    """
+    from memoria import bytes_modelo
+
+    textos = textos or _textos_corpus()
+    base = cargar_fp32(modelo)
+    referencia = np.asarray(base.embed_documents(textos))
+    filas = []
+    for n_hilos in hilos:
+        configurar_hilos(n_hilos)
+        for modo in modos:
+            try:
+                if modo == "fp32":
+                    candidato = base
+                elif modo == "int8":
+                    candidato = cuantizar_int8(base)
+                else:
+                    directorio = _ruta_onnx(modelo, directorio_cache)
+                    if not os.path.exists(os.path.join(directorio, ARCHIVO_ONNX)):
+                        exportar_onnx(base, directorio)
+                    candidato = EmbeddingsONNX(directorio, n_hilos)
+            except Exception as e:
+                print(f"⚠️  Modo {modo} no disponible: {str(e)}")
+                continue
+
+            candidato.embed_documents(textos[:2])  # primera llamada fuera de la medición
+            lote = min(_medir(lambda: candidato.embed_documents(textos)) for _ in range(repeticiones))
+            consulta = min(_medir(lambda: candidato.embed_query(textos[0])) for _ in range(repeticiones * 5))
+            filas.append({
+                "modo": modo,
+                "hilos": n_hilos,
+                "textos_por_s": round(len(textos) / lote, 1),
+                "consulta_ms": round(consulta * 1000, 2),
+                "concordancia": concordancia(referencia, candidato.embed_documents(textos)),
+                "pesos_mb": round(bytes_modelo(candidato) / 1024 ** 2, 1),
+            })
+    return filas
+
+
+def _medir(funcion) -> float:
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+
+def imprimir_benchmark(filas: List[Dict], textos: int, umbral: float = UMBRAL_CONCORDANCIA):
+    print(f"\n📊 Embeddings en CPU ({textos} textos)")
+    print(f"   {'modo':<6}{'hilos':>7}{'textos/s':>11}{'consulta ms':>13}{'coseno mín':>12}{'pesos MB':>10}")
+    referencia = {fila["hilos"]: fila["textos_por_s"] for fila in filas if fila["modo"] == "fp32"}
+    for fila in filas:
+        hilos = fila["hilos"] or "auto"
+        marca = "✅" if fila["concordancia"]["minima"] >= umbral else "❌"
+        aceleracion = ""
+        if fila["modo"] != "fp32" and referencia.get(fila["hilos"]):
+            aceleracion = f"  x{fila['textos_por_s'] / referencia[fila['hilos']]:.2f}"
+        print(f"   {fila['modo']:<6}{hilos:>7}{fila['textos_por_s']:>11}{fila['consulta_ms']:>13}"
+              f"{fila['concordancia']['minima']:>12.4f}{fila['pesos_mb']:>10} {marca}{aceleracion}")
+
+
+def main():
+    from asistente import MODELO_EMBEDDINGS
+
+    parser = argparse.ArgumentParser(description="Benchmark de los modos de embeddings en CPU")
+    parser.add_argument("--modelo", default=MODELO_EMBEDDINGS)
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--hilos", nargs="+", type=int, default=[None],
+                        help="Hilos de inferencia a probar (por defecto los que elija torch)")
+    parser.add_argument("--documentos", default="documentos", help="Carpeta con los PDFs a codificar")
+    parser.add_argument("--textos", type=int, default=256, help="Máximo de fragmentos a codificar")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--umbral", type=float, default=UMBRAL_CONCORDANCIA)
+    parser.add_argument("--json", action="store_true", help="Imprimir las filas en JSON")
+    args = parser.parse_args()
+
+    textos = _textos_corpus(args.documentos, args.textos)
+    filas = benchmark(args.modelo, args.modos, args.hilos, textos, args.repeticiones)
+    if args.json:
+        print(json.dumps(filas, indent=2, ensure_ascii=False))
+    else:
+        imprimir_benchmark(filas, len(textos), args.umbral)
+
+
+if __name__ == "__main__":
+    main()
@@ -71,14 +71,18 @@ class EvaluadorRAG:
         bleu_scores = [r["metricas"]["bleu"] for r in self.resultados if "bleu" in r["metricas"]]
         rouge1_f1 = [r["metricas"]["rouge"]["rouge1"]["f1"] for r in self.resultados if "rouge" in r["metricas"]]
         rougeL_f1 = [r["metricas"]["rouge"]["rougeL"]["f1"] for r in self.resultados if "rouge" in r["metricas"]]
+        recuperacion = [r["metricas"]["recuperacion"] for r in self.resultados if "recuperacion" in r["metricas"]]
 
         reporte = {
             "total_preguntas": len(self.resultados),
             "promedio_bleu": round(sum(bleu_scores) / len(bleu_scores), 4) if bleu_scores else 0.0,
             "promedio_rouge1_f1": round(sum(rouge1_f1) / len(rouge1_f1), 4) if rouge1_f1 else 0.0,
             "promedio_rougeL_f1": round(sum(rougeL_f1) / len(rougeL_f1), 4) if rougeL_f1 else 0.0,
-            "resultados_detallados": self.resultados,
         }
+        if recuperacion:
+            for clave in ("precision", "recall", "f1_score"):
+                reporte[f"promedio_{clave}"] = round(sum(r[clave] for r in recuperacion) / len(recuperacion), 4)
+        reporte["resultados_detallados"] = self.resultados
 
         # Guardar reporte
         with open(archivo_salida, 'w', encoding='utf-8') as f:
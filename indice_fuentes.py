@@ -0,0 +1,242 @@
+"""
+Índice secundario de una colección: documento/página/etiqueta → fragmentos.
+
+Cada fragmento recibe un ordinal según el orden de inserción. Como los
+fragmentos de un mismo documento se insertan seguidos, el índice guarda
+rangos contiguos de ordinales [ini, fin) en lugar de listas de ids, y los
+filtros se resuelven antes de calcular similitudes.
+
+Los fragmentos eliminados quedan como lápidas (ordinales borrados) hasta que
+la colección se compacta y el índice se reconstruye.
+"""
+
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from deduplicacion import referencias_de_metadata
+
+
+def _agregar_a_rangos(rangos: List[List], ordinal: int, *clave):
+    """
+    Extiende el último rango si el ordinal es consecutivo; si no, abre uno nuevo
+
+    Cada rango es [*clave, ini, fin).
+    """
+    n = len(clave)
+    if rangos and rangos[-1][:n] == list(clave) and rangos[-1][n + 1] == ordinal:
+        rangos[-1][n + 1] = ordinal + 1
+    else:
+        rangos.append([*clave, ordinal, ordinal + 1])
+
+
+def _expandir(rangos: Iterable[Sequence[int]]) -> np.ndarray:
+    partes = [np.arange(ini, fin) for ini, fin in rangos]
+    return np.concatenate(partes) if partes else np.empty(0, dtype=np.int64)
+
+
+def separar_etiquetas(etiquetas) -> List[str]:
+    """
+    Normaliza etiquetas de ingesta ('a, b' o ['a', 'b']) a una lista
+    """
+    if not etiquetas:
+        return []
+    if isinstance(etiquetas, str):
+        etiquetas = etiquetas.split(",")
+    return [e.strip().lower() for e in etiquetas if e.strip()]
+
+
+class IndiceFuentes:
+    """
+    Índice compacto fuente → página → rangos de fragmentos, y etiqueta → rangos
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self._ordinal: Dict[str, int] = {}
+        # source -> [[pagina, ini, fin], ...]
+        self.fuentes: Dict[str, List[List]] = {}
+        # etiqueta -> [[ini, fin], ...]
+        self.etiquetas: Dict[str, List[List]] = {}
+        # Ordinales de fragmentos eliminados (lápidas)
+        self.borrados: set = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def vivos(self) -> int:
+        return len(self.ids) - len(self.borrados)
+
+    def vivo(self, id_: str) -> bool:
+        ordinal = self._ordinal.get(id_)
+        return ordinal is not None and ordinal not in self.borrados
+
+    @property
+    def proporcion_borrados(self) -> float:
+        return len(self.borrados) / len(self.ids) if self.ids else 0.0
+
+    def copia(self) -> "IndiceFuentes":
+        """
+        Copia independiente (para modificarla mientras la original sigue sirviendo consultas)
+        """
+        indice = IndiceFuentes()
+        indice.ids = list(self.ids)
+        indice._ordinal = dict(self._ordinal)
+        indice.fuentes = {s: [list(rango) for rango in rangos] for s, rangos in self.fuentes.items()}
+        indice.etiquetas = {e: [list(rango) for rango in rangos] for e, rangos in self.etiquetas.items()}
+        indice.borrados = set(self.borrados)
+        return indice
+
+    def agregar(self, id_: str, metadata: Dict):
+        """
+        Registra un fragmento con todas sus referencias (source, page)
+        """
+        ordinal = len(self.ids)
+        self.ids.append(id_)
+        self._ordinal[id_] = ordinal
+
+        for source, page in dict.fromkeys(referencias_de_metadata(metadata)):
+            pagina = page if isinstance(page, int) else -1
+            _agregar_a_rangos(self.fuentes.setdefault(source, []), ordinal, pagina)
+
+        for etiqueta in separar_etiquetas(metadata.get("etiquetas")):
+            _agregar_a_rangos(self.etiquetas.setdefault(etiqueta, []), ordinal)
+
+    def agregar_referencias(self, id_: str, metadata: Dict):
+        """
+        Registra las referencias (source, page) nuevas de un fragmento ya agregado
+        """
+        ordinal = self._ordinal[id_]
+        for source, page in dict.fromkeys(referencias_de_metadata(metadata)):
+            pagina = page if isinstance(page, int) else -1
+            rangos = self.fuentes.setdefault(source, [])
+            if not any(p == pagina and ini <= ordinal < fin for p, ini, fin in rangos):
+                rangos.append([pagina, ordinal, ordinal + 1])
+
+    def quitar_fuentes(self, nombres: Iterable[str]):
+        """
+        Retira unas fuentes del índice (sus fragmentos ya no las citan)
+        """
+        for nombre in nombres:
+            self.fuentes.pop(nombre, None)
+
+    def nombres_fuentes(self) -> List[str]:
+        return sorted(self.fuentes)
+
+    def _fuentes_que_coinciden(self, fuente: str) -> List[str]:
+        # Se acepta la ruta completa o solo el nombre del archivo
+        if fuente in self.fuentes:
+            return [fuente]
+        return [s for s in self.fuentes if os.path.basename(s) == os.path.basename(fuente)]
+
+    def coincidencias(self, fuentes: Sequence[str]) -> set:
+        """
+        Nombres de fuente del índice que corresponden a las fuentes indicadas
+        """
+        return {s for f in fuentes for s in self._fuentes_que_coinciden(f)}
+
+    def eliminar(self, ids: Iterable[str]):
+        """
+        Marca fragmentos como borrados y retira las fuentes y etiquetas que quedan vacías
+        """
+        self.borrados.update(self._ordinal[id_] for id_ in ids if id_ in self._ordinal)
+        for tabla in (self.fuentes, self.etiquetas):
+            for clave in [c for c, rangos in tabla.items() if self._todos_borrados(rangos)]:
+                del tabla[clave]
+
+    def _todos_borrados(self, rangos: List[List]) -> bool:
+        return all(i in self.borrados for *_, ini, fin in rangos for i in range(ini, fin))
+
+    def resolver(self, fuentes: Optional[Sequence[str]] = None, paginas: Optional[Sequence[int]] = None,
+                 etiquetas: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Ordinales de los fragmentos que cumplen todos los filtros
+
+        Args:
+            fuentes: Documentos permitidos (ruta o nombre de archivo)
+            paginas: Rango inclusivo (desde, hasta) de páginas
+            etiquetas: Etiquetas de ingesta (basta con una)
+
+        Returns:
+            Array ordenado de ordinales
+        """
+        seleccion = None
+
+        if fuentes or paginas:
+            nombres = (
+                [s for f in fuentes for s in self._fuentes_que_coinciden(f)] if fuentes
+                else list(self.fuentes)
+            )
+            desde, hasta = paginas if paginas else (-1, float("inf"))
+            seleccion = np.unique(_expandir(
+                (ini, fin)
+                for nombre in nombres
+                for pagina, ini, fin in self.fuentes.get(nombre, [])
+                if desde <= pagina <= hasta
+            ))
+
+        if etiquetas:
+            por_etiqueta = np.unique(_expandir(
+                rango for e in separar_etiquetas(etiquetas) for rango in self.etiquetas.get(e, [])
+            ))
+            seleccion = por_etiqueta if seleccion is None else np.intersect1d(seleccion, por_etiqueta)
+
+        if seleccion is None:
+            seleccion = np.arange(len(self.ids))
+        if self.borrados:
+            seleccion = np.setdiff1d(seleccion, np.fromiter(self.borrados, dtype=np.int64), assume_unique=True)
+        return seleccion
+
+    def ids_de(self, ordinales: np.ndarray) -> List[str]:
+        return [self.ids[i] for i in ordinales]
+
+    # ---------- persistencia ----------
+
+    def a_dict(self) -> Dict:
+        return {"ids": self.ids, "fuentes": self.fuentes, "etiquetas": self.etiquetas,
+                "borrados": sorted(self.borrados)}
+
+    @classmethod
+    def desde_dict(cls, datos: Dict) -> "IndiceFuentes":
+        indice = cls()
+        indice.ids = datos["ids"]
+        indice._ordinal = {id_: i for i, id_ in enumerate(indice.ids)}
+        indice.fuentes = datos["fuentes"]
+        indice.etiquetas = datos["etiquetas"]
+        indice.borrados = set(datos.get("borrados", []))
+        return indice
+
+    def guardar(self, ruta: str):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.a_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> Optional["IndiceFuentes"]:
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls.desde_dict(datos)
+
+    @classmethod
+    def desde_coleccion(cls, coleccion, tamano_lote: int = 1000) -> "IndiceFuentes":
+        """
+        Construye el índice recorriendo la metadata de una colección de Chroma
+        """
+        indice = cls()
+        offset = 0
+        while True:
+            lote = coleccion.get(include=["metadatas"], limit=tamano_lote, offset=offset)
+            if not lote["ids"]:
+                break
+            for id_, meta in zip(lote["ids"], lote["metadatas"]):
+                indice.agregar(id_, meta or {})
+            offset += len(lote["ids"])
+        return indice
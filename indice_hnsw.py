@@ -0,0 +1,311 @@
+"""
+Parámetros del índice HNSW de las colecciones y su ajuste por colección.
+
+Chroma guarda en la metadata de cada colección los parámetros de su índice
+HNSW (distancia, M, ef de construcción y ef de búsqueda). Los de
+construcción solo se aplican al crear una versión; el ef de búsqueda se
+aplica en cada consulta y se puede cambiar por consulta.
+
+La herramienta mide, sobre una rejilla de parámetros, el recall@k contra la
+búsqueda exacta y la latencia p50/p99 de cada colección, y recomienda la
+configuración más rápida que alcanza el recall pedido (exacta para las
+colecciones pequeñas). Con --aplicar la guarda junto a la colección y, si
+cambian los parámetros de construcción, reconstruye el índice sin
+recalcular embeddings.
+
+Uso:
+    python indice_hnsw.py [--coleccion curso ...] [--persist-directory ./chroma_db]
+                          [--m 8 16 32] [--ef-construccion 100 200] [--ef-busqueda 10 20 40 80 160]
+                          [--recall-minimo 0.95] [--json rejilla.json] [--aplicar]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+ESPACIOS = ("cosine", "l2", "ip")
+
+
+@dataclass
+class ConfigIndice:
+    """
+    Parámetros HNSW de una colección (mismos valores por defecto que Chroma, salvo la distancia)
+    """
+
+    espacio: str = "cosine"
+    m: int = 16
+    ef_construccion: int = 100
+    ef_busqueda: int = 10
+
+    def __post_init__(self):
+        if self.espacio not in ESPACIOS:
+            raise ValueError(f"Distancia desconocida: {self.espacio} (opciones: {ESPACIOS})")
+        for nombre in ("m", "ef_construccion", "ef_busqueda"):
+            if int(getattr(self, nombre)) < 1:
+                raise ValueError(f"{nombre} debe ser un entero positivo")
+            setattr(self, nombre, int(getattr(self, nombre)))
+
+    def metadata(self) -> Dict:
+        """
+        Metadata de Chroma con la que se crea una colección
+        """
+        return {
+            "hnsw:space": self.espacio,
+            "hnsw:M": self.m,
+            "hnsw:construction_ef": self.ef_construccion,
+            "hnsw:search_ef": self.ef_busqueda,
+        }
+
+    @classmethod
+    def desde_metadata(cls, metadata: Optional[Dict]) -> "ConfigIndice":
+        """
+        Parámetros con que se construyó una colección de Chroma (sus valores por defecto si faltan)
+        """
+        metadata = metadata or {}
+        return cls(
+            espacio=metadata.get("hnsw:space", "l2"),
+            m=metadata.get("hnsw:M", 16),
+            ef_construccion=metadata.get("hnsw:construction_ef", 100),
+            ef_busqueda=metadata.get("hnsw:search_ef", 10),
+        )
+
+    def misma_construccion(self, otra: "ConfigIndice") -> bool:
+        return (self.espacio, self.m, self.ef_construccion) == (otra.espacio, otra.m, otra.ef_construccion)
+
+    def guardar(self, ruta: str):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> Optional["ConfigIndice"]:
+        """
+        Carga una configuración guardada (None si el archivo no existe o no es válido)
+        """
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+
+def indice_hnsw(cliente, coleccion):
+    """
+    Índice hnswlib detrás de una colección de Chroma
+
+    Returns:
+        El objeto hnswlib.Index, o None si está vacía o esta versión de Chroma no lo expone
+    """
+    try:
+        from chromadb.segment import VectorReader
+
+        segmento = cliente._server._manager.get_segment(coleccion.id, VectorReader)
+        return getattr(segmento, "_index", None)
+    except (AttributeError, ImportError, KeyError):
+        return None
+
+
+class ControlEf:
+    """
+    Aplica el ef de búsqueda de cada consulta sobre un índice compartido
+
+    El ef es un estado del índice, no de la consulta: las búsquedas con el
+    mismo ef corren en paralelo y una con otro ef espera a que terminen antes
+    de cambiarlo.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._aplicado = None  # (id del índice, ef)
+        self._en_curso = 0
+
+    @contextmanager
+    def usar(self, indice, ef: int):
+        if indice is None:
+            yield
+            return
+        with self._condicion:
+            while self._en_curso and self._aplicado != (id(indice), ef):
+                self._condicion.wait()
+            if self._aplicado != (id(indice), ef):
+                indice.set_ef(ef)
+                self._aplicado = (id(indice), ef)
+            self._en_curso += 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._en_curso -= 1
+                self._condicion.notify_all()
+
+
+# ---------- rejilla de recall y latencia ----------
+
+def _vectores_coleccion(coleccion) -> np.ndarray:
+    matrices = [np.asarray(lote["embeddings"], dtype=np.float32) for lote in coleccion.lotes()]
+    return np.concatenate(matrices) if matrices else np.empty((0, 0), dtype=np.float32)
+
+
+def busqueda_exacta(matriz: np.ndarray, consultas: np.ndarray, k: int, espacio: str = "cosine") -> np.ndarray:
+    """
+    Filas de los k vecinos exactos de cada consulta (la verdad de referencia del recall)
+    """
+    if espacio == "cosine":
+        normas = np.linalg.norm(matriz, axis=1) + 1e-12
+        puntajes = (consultas / (np.linalg.norm(consultas, axis=1, keepdims=True) + 1e-12)) @ (matriz / normas[:, None]).T
+    elif espacio == "ip":
+        puntajes = consultas @ matriz.T
+    else:
+        puntajes = -((consultas ** 2).sum(1)[:, None] - 2 * consultas @ matriz.T + (matriz ** 2).sum(1)[None, :])
+    mejores = np.argpartition(-puntajes, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(mejores, np.argsort(-np.take_along_axis(puntajes, mejores, 1), axis=1), 1)
+
+
+def evaluar_rejilla(matriz: np.ndarray, k: int = 3, espacio: str = "cosine", ms: Sequence[int] = (16,),
+                    efs_construccion: Sequence[int] = (100,), efs_busqueda: Sequence[int] = (10, 20, 40, 80),
+                    consultas: int = 200, ruido: float = 0.1, semilla: int = 0) -> List[Dict]:
+    """
+    Recall@k y latencia de cada combinación de parámetros sobre unos vectores
+
+    Cada (m, ef_construccion) se construye en una colección de Chroma en
+    memoria y se consulta con cada ef_busqueda, una consulta a la vez, igual
+    que en producción. Las consultas son vectores de la colección con ruido
+    gaussiano (para que el vecino más cercano no sea siempre el propio vector).
+
+    Args:
+        matriz: Vectores de la colección (n x d)
+        k: Vecinos por consulta (normalmente el top_k del asistente)
+        espacio: Distancia del índice
+        ms, efs_construccion, efs_busqueda: Valores de la rejilla
+        consultas: Número de consultas de prueba
+        ruido: Desviación del ruido relativa a la norma de cada vector
+        semilla: Semilla del muestreo y del ruido
+
+    Returns:
+        Una fila por combinación con recall, latencias (ms) y tiempo de construcción (s)
+    """
+    import chromadb
+
+    n = len(matriz)
+    k = min(k, n)
+    rng = np.random.default_rng(semilla)
+    filas = rng.choice(n, size=min(consultas, n), replace=False)
+    base = matriz[filas]
+    q = base + rng.normal(size=base.shape).astype(np.float32) * (
+        ruido * np.linalg.norm(base, axis=1, keepdims=True) / np.sqrt(matriz.shape[1])
+    )
+    exactos = busqueda_exacta(matriz, q, k, espacio)
+    ids = [str(i) for i in range(n)]
+
+    cliente = chromadb.EphemeralClient()
+    resultados = []
+    for m in ms:
+        for ef_construccion in efs_construccion:
+            nombre = f"rejilla_{uuid.uuid4().hex[:8]}"
+            config = ConfigIndice(espacio, m, ef_construccion)
+            coleccion = cliente.create_collection(nombre, metadata=config.metadata())
+            inicio = time.perf_counter()
+            for desde in range(0, n, 1000):
+                coleccion.add(ids=ids[desde:desde + 1000], embeddings=matriz[desde:desde + 1000].tolist())
+            construccion = time.perf_counter() - inicio
+            indice = indice_hnsw(cliente, coleccion)
+
+            for ef in efs_busqueda:
+                if indice is not None:
+                    indice.set_ef(ef)
+                latencias, aciertos = [], 0
+                for vector, verdad in zip(q, exactos):
+                    inicio = time.perf_counter()
+                    r = coleccion.query(query_embeddings=[vector.tolist()], n_results=k, include=["distances"])
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    aciertos += len({int(i) for i in r["ids"][0]} & set(verdad.tolist()))
+                resultados.append({
+                    **asdict(ConfigIndice(espacio, m, ef_construccion, ef)),
+                    "recall": round(aciertos / (len(q) * k), 4),
+                    "p50_ms": round(float(np.percentile(latencias, 50)), 3),
+                    "p99_ms": round(float(np.percentile(latencias, 99)), 3),
+                    "construccion_s": round(construccion, 3),
+                })
+            cliente.delete_collection(nombre)
+    return resultados
+
+
+def recomendar(filas: List[Dict], recall_minimo: float) -> Dict:
+    """
+    La combinación más rápida (p50) que alcanza el recall mínimo, o la de mayor recall si ninguna lo alcanza
+    """
+    validas = [f for f in filas if f["recall"] >= recall_minimo]
+    if not validas:
+        return max(filas, key=lambda f: (f["recall"], -f["p50_ms"]))
+    return min(validas, key=lambda f: (f["p50_ms"], -f["recall"], f["construccion_s"]))
+
+
+def main():
+    from asistente import AsistenteAcademico
+
+    parser = argparse.ArgumentParser(description="Recall y latencia del índice HNSW por colección")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--coleccion", action="append", default=[], help="Colección a evaluar (por defecto todas)")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construccion", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--ef-busqueda", type=int, nargs="+", default=[10, 20, 40, 80, 160])
+    parser.add_argument("--recall-minimo", type=float, default=0.95)
+    parser.add_argument("--tamano-pequena", type=int, default=5000,
+                        help="Colecciones con menos fragmentos exigen búsqueda exacta (recall 1.0)")
+    parser.add_argument("--json", help="Guardar la rejilla completa en este archivo")
+    parser.add_argument("--aplicar", action="store_true", help="Guardar la recomendación y reconstruir si hace falta")
+    args = parser.parse_args()
+
+    asistente = AsistenteAcademico(persist_directory=args.persist_directory, filtrar_irrelevantes=False)
+    nombres = args.coleccion or asistente.colecciones.nombres()
+    if not nombres:
+        parser.error(f"No hay colecciones en {args.persist_directory}")
+
+    informe = {}
+    for nombre in nombres:
+        coleccion = asistente.colecciones.usar(nombre)
+        matriz = _vectores_coleccion(coleccion)
+        if not len(matriz):
+            print(f"⚠️  '{nombre}' está vacía")
+            continue
+        # Las instantáneas guardan vectores normalizados y buscan por coseno
+        espacio = coleccion.parametros_indice().espacio if hasattr(coleccion, "parametros_indice") else "cosine"
+        print(f"\n📐 '{nombre}': {len(matriz)} vectores de {matriz.shape[1]} dimensiones ({espacio})")
+        filas = evaluar_rejilla(matriz, args.k, espacio, args.m, args.ef_construccion, args.ef_busqueda, args.consultas)
+        recall_minimo = 1.0 if len(matriz) < args.tamano_pequena else args.recall_minimo
+        elegida = recomendar(filas, recall_minimo)
+
+        print(f"   {'M':>4}{'ef_c':>6}{'ef':>6}{'recall':>9}{'p50 ms':>9}{'p99 ms':>9}{'constr. s':>11}")
+        for f in filas:
+            marca = "  ⬅️" if f is elegida else ""
+            print(f"   {f['m']:>4}{f['ef_construccion']:>6}{f['ef_busqueda']:>6}{f['recall']:>9.4f}"
+                  f"{f['p50_ms']:>9.3f}{f['p99_ms']:>9.3f}{f['construccion_s']:>11.2f}{marca}")
+        print(f"   ✅ Recomendada (recall ≥ {recall_minimo}): M={elegida['m']}, "
+              f"ef_construccion={elegida['ef_construccion']}, ef_busqueda={elegida['ef_busqueda']}")
+        informe[nombre] = {"fragmentos": len(matriz), "recall_minimo": recall_minimo,
+                           "recomendada": elegida, "rejilla": filas}
+
+        if args.aplicar:
+            config = ConfigIndice(elegida["espacio"], elegida["m"], elegida["ef_construccion"], elegida["ef_busqueda"])
+            reconstruida = asistente.configurar_indice(config, nombre)
+            print(f"   💾 Configuración guardada{' y índice reconstruido' if reconstruida else ''}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Rejilla guardada en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
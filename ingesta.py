@@ -0,0 +1,303 @@
+"""
+Cola de trabajos de ingesta en segundo plano.
+
+Los trabajos se ejecutan en hilos trabajadores fuera del script de Streamlit:
+la interfaz no se congela, recargar la página no cancela el trabajo y las
+cargas simultáneas de varios usuarios se procesan en orden.
+
+Dentro de un trabajo, la ingesta es un flujo de etapas encadenadas
+(páginas → fragmentos → embeddings → escritura) unidas por colas acotadas:
+cada etapa corre en su propio hilo y solo hay unos pocos lotes en vuelo,
+así que la memoria no crece con el tamaño del corpus.
+"""
+
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Etapas reportadas por AsistenteAcademico.cargar_documentos
+ETAPAS = ("archivos", "embeddings", "vectores")
+
+
+class _Fin:
+    """
+    Marca de fin de una etapa (con la excepción del productor, si la hubo)
+    """
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+def en_segundo_plano(iterable: Iterable, profundidad: int = 2, nombre: str = "etapa-ingesta") -> Iterator:
+    """
+    Recorre un iterable en un hilo propio y entrega sus elementos por una cola acotada
+
+    El productor se bloquea cuando hay 'profundidad' elementos sin consumir,
+    así que entre dos etapas nunca hay más que eso en memoria. Una excepción
+    del productor se relanza en el consumidor, y si el consumidor deja de
+    iterar el productor se detiene.
+
+    Args:
+        iterable: Etapa anterior del flujo
+        profundidad: Elementos pendientes como máximo
+        nombre: Nombre del hilo productor
+
+    Yields:
+        Los elementos del iterable, en el mismo orden
+    """
+    cola: "queue.Queue" = queue.Queue(maxsize=max(1, profundidad))
+    cancelado = threading.Event()
+
+    def poner(elemento) -> bool:
+        while not cancelado.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producir():
+        iterador = iter(iterable)
+        try:
+            for elemento in iterador:
+                if not poner(elemento):
+                    return
+            poner(_Fin())
+        except BaseException as e:
+            poner(_Fin(e))
+        finally:
+            if hasattr(iterador, "close"):
+                iterador.close()
+
+    threading.Thread(target=producir, name=nombre, daemon=True).start()
+    try:
+        while True:
+            elemento = cola.get()
+            if isinstance(elemento, _Fin):
+                if elemento.error is not None:
+                    raise elemento.error
+                return
+            yield elemento
+    finally:
+        cancelado.set()
+
+
+class FlujoFragmentos:
+    """
+    Etapa de extracción y división: entrega los fragmentos de varios PDFs a medida que se leen
+
+    Las páginas se piden de una en una a paginas_de(pdf) y se dividen
+    enseguida, de modo que el texto de una página se libera en cuanto sus
+    fragmentos pasan a la etapa siguiente.
+    """
+
+    def __init__(self, pdfs: List, paginas_de: Callable, divisor, deduplicador=None,
+                 etiquetas: Optional[List[str]] = None, notificar: Optional[Callable] = None):
+        """
+        Args:
+            pdfs: DocumentoPDF a procesar (ya sin repetidos)
+            paginas_de: Función pdf -> iterador de páginas (p. ej. a través de la caché de páginas)
+            divisor: Text splitter con split_documents()
+            deduplicador: DeduplicadorMinHash opcional aplicado al flujo de fragmentos
+            etiquetas: Etiquetas que se agregan a la metadata de cada página
+            notificar: Callback notificar(etapa, actual, total) de cargar_documentos
+        """
+        self.pdfs = pdfs
+        self.paginas_de = paginas_de
+        self.divisor = divisor
+        self.deduplicador = deduplicador
+        self.etiquetas = etiquetas
+        self.notificar = notificar or (lambda etapa, actual, total: None)
+        self.paginas = 0
+        self.fragmentos = 0
+
+    def _fragmentos(self) -> Iterator:
+        for i, pdf in enumerate(self.pdfs, 1):
+            print(f"  - Procesando: {pdf.nombre_corto}")
+            for pagina in self.paginas_de(pdf):
+                self.paginas += 1
+                if self.etiquetas:
+                    pagina.metadata["etiquetas"] = ",".join(self.etiquetas)
+                for fragmento in self.divisor.split_documents([pagina]):
+                    self.fragmentos += 1
+                    yield fragmento
+            self.notificar("archivos", i, len(self.pdfs))
+
+    def __iter__(self) -> Iterator:
+        fragmentos = self._fragmentos()
+        if self.deduplicador is not None:
+            return self.deduplicador.procesar(fragmentos)
+        return fragmentos
+
+
+@dataclass
+class TrabajoIngesta:
+    """
+    Estado de un trabajo de ingesta (consultable desde la UI)
+    """
+
+    id: str
+    asistente: object
+    rutas: List  # rutas, bytes u objetos tipo archivo (ver cargar_documentos)
+    reemplazar: bool = False
+    coleccion: Optional[str] = None
+    etiquetas: Optional[List[str]] = None
+    eliminar_al_terminar: bool = False
+    estado: str = "en_cola"  # en_cola | en_proceso | completado | error
+    etapa: Optional[str] = None
+    progreso: Dict[str, List[int]] = field(default_factory=lambda: {e: [0, 0] for e in ETAPAS})
+    error: Optional[str] = None
+    creado: float = field(default_factory=time.time)
+    iniciado: Optional[float] = None
+    terminado: Optional[float] = None
+
+    def actualizar(self, etapa: str, actual: int, total: int):
+        self.etapa = etapa
+        self.progreso[etapa] = [actual, total]
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in ("en_cola", "en_proceso")
+
+    def resumen(self) -> Dict:
+        """
+        Snapshot serializable del estado del trabajo
+        """
+        fin = self.terminado or time.time()
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "etapa": self.etapa,
+            "archivos": len(self.rutas),
+            "coleccion": self.coleccion,
+            "progreso": {etapa: list(valores) for etapa, valores in self.progreso.items()},
+            "error": self.error,
+            "segundos": round(fin - self.iniciado, 1) if self.iniciado else 0.0,
+        }
+
+
+class ColaIngesta:
+    """
+    Cola de trabajos de ingesta atendida por hilos trabajadores
+    """
+
+    def __init__(self, num_trabajadores: int = 1, max_historial: int = 50):
+        """
+        Args:
+            num_trabajadores: Hilos que procesan trabajos en paralelo
+            max_historial: Trabajos terminados que se conservan para consulta
+        """
+        self.max_historial = max_historial
+        self._cola: "queue.Queue[Optional[TrabajoIngesta]]" = queue.Queue()
+        self._trabajos: Dict[str, TrabajoIngesta] = {}
+        self._lock = threading.Lock()
+        self._hilos = [
+            threading.Thread(target=self._trabajar, name=f"ingesta-{i}", daemon=True)
+            for i in range(num_trabajadores)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def encolar(self, asistente, rutas: List, reemplazar: bool = False, coleccion: Optional[str] = None,
+                eliminar_al_terminar: bool = False, etiquetas: Optional[List[str]] = None) -> TrabajoIngesta:
+        """
+        Agrega un trabajo de ingesta a la cola
+
+        Args:
+            asistente: AsistenteAcademico que recibirá los documentos
+            rutas: PDFs a cargar (rutas, bytes, objetos tipo archivo o DocumentoPDF)
+            reemplazar: Ver AsistenteAcademico.cargar_documentos
+            coleccion: Curso destino (None = colección predeterminada)
+            eliminar_al_terminar: Borrar del disco las rutas al terminar (archivos temporales)
+            etiquetas: Etiquetas de los documentos (ver cargar_documentos)
+
+        Returns:
+            El trabajo creado
+        """
+        trabajo = TrabajoIngesta(
+            id=uuid.uuid4().hex[:12],
+            asistente=asistente,
+            rutas=list(rutas),
+            reemplazar=reemplazar,
+            coleccion=coleccion,
+            etiquetas=etiquetas,
+            eliminar_al_terminar=eliminar_al_terminar,
+        )
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._podar_historial()
+        self._cola.put(trabajo)
+        return trabajo
+
+    def obtener(self, trabajo_id: str) -> Optional[TrabajoIngesta]:
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def estado(self, trabajo_id: str) -> Optional[Dict]:
+        """
+        Estado serializable de un trabajo, o None si no existe
+        """
+        trabajo = self.obtener(trabajo_id)
+        return trabajo.resumen() if trabajo else None
+
+    def trabajos(self) -> List[Dict]:
+        """
+        Estado de todos los trabajos conocidos, del más reciente al más antiguo
+        """
+        with self._lock:
+            trabajos = sorted(self._trabajos.values(), key=lambda t: t.creado, reverse=True)
+        return [t.resumen() for t in trabajos]
+
+    @property
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+    def _podar_historial(self):
+        terminados = sorted(
+            (t for t in self._trabajos.values() if not t.activo), key=lambda t: t.creado
+        )
+        for trabajo in terminados[:max(0, len(terminados) - self.max_historial)]:
+            del self._trabajos[trabajo.id]
+
+    def _trabajar(self):
+        while True:
+            trabajo = self._cola.get()
+            if trabajo is None:
+                break
+            trabajo.estado = "en_proceso"
+            trabajo.iniciado = time.time()
+            try:
+                trabajo.asistente.cargar_documentos(
+                    trabajo.rutas, progreso=trabajo.actualizar,
+                    reemplazar=trabajo.reemplazar, coleccion=trabajo.coleccion,
+                    etiquetas=trabajo.etiquetas,
+                )
+                trabajo.estado = "completado"
+            except Exception as e:
+                traceback.print_exc()
+                trabajo.error = str(e)
+                trabajo.estado = "error"
+            finally:
+                trabajo.terminado = time.time()
+                if trabajo.eliminar_al_terminar:
+                    for ruta in (r for r in trabajo.rutas if isinstance(r, str)):
+                        try:
+                            os.unlink(ruta)
+                        except OSError as e:
+                            print(f"⚠️  No se pudo eliminar {ruta}: {str(e)}")
+                self._cola.task_done()
+
+    def detener(self):
+        """
+        Detiene los trabajadores después de terminar los trabajos en cola
+        """
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
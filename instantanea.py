@@ -0,0 +1,408 @@
+"""
+Instantáneas de una colección en un solo archivo, listas para mmap.
+
+Una instantánea guarda en un archivo versionado todo lo necesario para
+responder consultas sin Chroma:
+
+    - vectores normalizados (float32) en un arreglo contiguo n x d
+    - ids y textos de los fragmentos (bytes UTF-8 + desplazamientos)
+    - metadata por columnas (enteros o cadenas, con máscara de ausentes)
+    - índice de fuentes, manifiesto y modelo de embeddings
+
+Al abrirla solo se lee la cabecera: los vectores se usan directamente desde
+el mapa de memoria, sin copiarlos ni interpretarlos, así que una réplica
+nueva puede responder su primera consulta en cuanto arranca. También se
+puede importar a Chroma para volver a tener una colección modificable.
+
+Formato:
+    [preámbulo 32 B][secciones alineadas a 64 B][cabecera JSON]
+    preámbulo = magia (8 B) + formato (u32) + relleno (u32) + offset y largo de la cabecera (u64, u64)
+
+Uso:
+    python instantanea.py exportar --salida curso.snap [--coleccion curso] [--persist-directory ./chroma_db]
+    python instantanea.py importar curso.snap [--coleccion curso] [--persist-directory ./chroma_db]
+    python instantanea.py info curso.snap
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from colecciones import FILTROS_VALIDOS, Recuperado
+from indice_fuentes import IndiceFuentes
+from memoria import tamano_profundo
+
+MAGIA = b"RAGSNAP\0"
+FORMATO = 1
+_PREAMBULO = struct.Struct("<8sIIQQ")
+_ALINEACION = 64
+
+
+class _Escritor:
+    """
+    Escribe secciones alineadas y recuerda su ubicación para la cabecera
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.secciones: Dict[str, Dict] = {}
+        archivo.write(b"\0" * _PREAMBULO.size)
+
+    def _alinear(self):
+        relleno = -self.archivo.tell() % _ALINEACION
+        self.archivo.write(b"\0" * relleno)
+
+    def arreglo(self, nombre: str, arreglo: np.ndarray):
+        self._alinear()
+        arreglo = np.ascontiguousarray(arreglo)
+        self.secciones[nombre] = {
+            "offset": self.archivo.tell(), "dtype": arreglo.dtype.str, "forma": list(arreglo.shape),
+        }
+        self.archivo.write(arreglo.tobytes())
+
+    def cadenas(self, nombre: str, valores: Sequence[str]):
+        codificadas = [v.encode("utf-8") for v in valores]
+        offsets = np.zeros(len(codificadas) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in codificadas], out=offsets[1:])
+        self.arreglo(f"{nombre}:offsets", offsets)
+        self.arreglo(f"{nombre}:datos", np.frombuffer(b"".join(codificadas), dtype=np.uint8))
+
+    def cerrar(self, cabecera: Dict):
+        self._alinear()
+        offset = self.archivo.tell()
+        datos = json.dumps({**cabecera, "secciones": self.secciones}, ensure_ascii=False).encode("utf-8")
+        self.archivo.write(datos)
+        self.archivo.seek(0)
+        self.archivo.write(_PREAMBULO.pack(MAGIA, FORMATO, 0, offset, len(datos)))
+
+
+def _columnas_metadata(metadatas: List[Dict]) -> Dict[str, str]:
+    """
+    Tipo de cada columna: 'int' si todos los valores presentes son enteros,
+    'str' si son cadenas y 'json' en cualquier otro caso
+    """
+    tipos = {}
+    for meta in metadatas:
+        for clave, valor in meta.items():
+            tipo = "int" if isinstance(valor, int) and not isinstance(valor, bool) else (
+                "str" if isinstance(valor, str) else "json"
+            )
+            previo = tipos.setdefault(clave, tipo)
+            if previo != tipo:
+                tipos[clave] = "json"
+    return tipos
+
+
+def exportar(coleccion, ruta: str, modelo_embeddings: str, tamano_lote: int = 1000) -> Dict:
+    """
+    Escribe la versión activa de una colección en un archivo de instantánea
+
+    Args:
+        coleccion: Coleccion (o cualquier objeto con nombre, version_activa y lotes())
+        ruta: Archivo de salida (se escribe de forma atómica)
+        modelo_embeddings: Modelo con el que se calcularon los vectores
+
+    Returns:
+        La cabecera escrita
+    """
+    ids, textos, metadatas, vectores = [], [], [], []
+    for lote in coleccion.lotes(tamano_lote):
+        ids.extend(lote["ids"])
+        textos.extend(lote["documents"])
+        metadatas.extend(meta or {} for meta in lote["metadatas"])
+        vectores.append(np.asarray(lote["embeddings"], dtype=np.float32))
+    if not ids:
+        raise ValueError(f"La colección '{coleccion.nombre}' está vacía")
+
+    matriz = np.concatenate(vectores)
+    matriz /= np.linalg.norm(matriz, axis=1, keepdims=True) + 1e-12
+
+    # El índice de la instantánea sigue el orden de las filas
+    indice = IndiceFuentes()
+    for id_, meta in zip(ids, metadatas):
+        indice.agregar(id_, meta)
+
+    tipos = _columnas_metadata(metadatas)
+    cabecera = {
+        "formato": FORMATO,
+        "coleccion": coleccion.nombre,
+        "version": coleccion.version_activa,
+        "modelo_embeddings": modelo_embeddings,
+        "fragmentos": len(ids),
+        "dimension": int(matriz.shape[1]),
+        "creada": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metadata": tipos,
+    }
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    fd, tmp = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            escritor = _Escritor(f)
+            escritor.arreglo("vectores", matriz)
+            escritor.cadenas("ids", ids)
+            escritor.cadenas("textos", textos)
+            for clave, tipo in tipos.items():
+                presentes = np.array([clave in meta for meta in metadatas], dtype=np.uint8)
+                escritor.arreglo(f"meta:{clave}:presente", presentes)
+                if tipo == "int":
+                    escritor.arreglo(f"meta:{clave}", np.array([meta.get(clave, 0) for meta in metadatas], dtype=np.int64))
+                else:
+                    codificar = (lambda v: v) if tipo == "str" else json.dumps
+                    escritor.cadenas(f"meta:{clave}", [codificar(meta[clave]) if clave in meta else "" for meta in metadatas])
+            escritor.cadenas("indice", [json.dumps(indice.a_dict(), ensure_ascii=False)])
+            escritor.cerrar(cabecera)
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return cabecera
+
+
+class Instantanea:
+    """
+    Instantánea abierta con mmap (solo lectura)
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Args:
+            ruta: Archivo escrito por exportar()
+
+        Raises:
+            ValueError: si el archivo no es una instantánea o su formato no es compatible
+        """
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magia, formato, _, offset, largo = _PREAMBULO.unpack_from(self._mapa, 0)
+        if magia != MAGIA:
+            raise ValueError(f"{ruta} no es una instantánea del asistente")
+        if formato != FORMATO:
+            raise ValueError(f"Formato de instantánea {formato} no soportado (se esperaba {FORMATO})")
+        self.cabecera: Dict = json.loads(self._mapa[offset:offset + largo].decode("utf-8"))
+        self.vectores = self._arreglo("vectores")
+        self._ids: Optional[List[str]] = None
+        self._fila: Optional[Dict[str, int]] = None
+
+    def __len__(self):
+        return self.cabecera["fragmentos"]
+
+    def _arreglo(self, nombre: str) -> np.ndarray:
+        seccion = self.cabecera["secciones"][nombre]
+        dtype = np.dtype(seccion["dtype"])
+        cantidad = int(np.prod(seccion["forma"]))
+        return np.frombuffer(self._mapa, dtype=dtype, count=cantidad, offset=seccion["offset"]).reshape(seccion["forma"])
+
+    def _cadena(self, nombre: str, fila: int) -> str:
+        offsets = self._arreglo(f"{nombre}:offsets")
+        inicio = self.cabecera["secciones"][f"{nombre}:datos"]["offset"]
+        return self._mapa[inicio + int(offsets[fila]):inicio + int(offsets[fila + 1])].decode("utf-8")
+
+    def id(self, fila: int) -> str:
+        return self._cadena("ids", fila)
+
+    @property
+    def ids(self) -> List[str]:
+        if self._ids is None:
+            self._ids = [self._cadena("ids", i) for i in range(len(self))]
+        return self._ids
+
+    def fila(self, id_: str) -> Optional[int]:
+        if self._fila is None:
+            self._fila = {id_: i for i, id_ in enumerate(self.ids)}
+        return self._fila.get(id_)
+
+    def texto(self, fila: int) -> str:
+        return self._cadena("textos", fila)
+
+    def metadata(self, fila: int) -> Dict:
+        meta = {}
+        for clave, tipo in self.cabecera["metadata"].items():
+            if not self._arreglo(f"meta:{clave}:presente")[fila]:
+                continue
+            if tipo == "int":
+                meta[clave] = int(self._arreglo(f"meta:{clave}")[fila])
+            elif tipo == "str":
+                meta[clave] = self._cadena(f"meta:{clave}", fila)
+            else:
+                meta[clave] = json.loads(self._cadena(f"meta:{clave}", fila))
+        return meta
+
+    def indice(self) -> IndiceFuentes:
+        return IndiceFuentes.desde_dict(json.loads(self._cadena("indice", 0)))
+
+    def lotes(self, tamano_lote: int = 1000) -> Iterator[Dict]:
+        """
+        Recorre la instantánea por lotes con el mismo formato que Chroma
+        """
+        for inicio in range(0, len(self), tamano_lote):
+            filas = range(inicio, min(inicio + tamano_lote, len(self)))
+            yield {
+                "ids": [self.ids[i] for i in filas],
+                "embeddings": self.vectores[inicio:filas.stop].tolist(),
+                "documents": [self.texto(i) for i in filas],
+                "metadatas": [self.metadata(i) for i in filas],
+            }
+
+    def cerrar(self):
+        self.vectores = None
+        self._mapa.close()
+
+
+class ColeccionInstantanea:
+    """
+    Colección de solo lectura servida desde una instantánea
+
+    Ofrece la misma interfaz de búsqueda que Coleccion (búsqueda exacta por
+    producto punto sobre los vectores mapeados) para poder montarse en
+    GestorColecciones.
+    """
+
+    solo_lectura = True
+    residente = True
+    revision = 0  # De solo lectura: nunca cambia dentro de una versión
+
+    def __init__(self, instantanea: Instantanea, nombre: Optional[str] = None):
+        self.instantanea = instantanea
+        self.nombre = nombre or instantanea.cabecera["coleccion"]
+        self.version = instantanea.cabecera["version"]
+        self.ultimo_uso = time.time()
+        self._indice: Optional[IndiceFuentes] = None
+
+    @classmethod
+    def abrir(cls, ruta: str, nombre: Optional[str] = None) -> "ColeccionInstantanea":
+        return cls(Instantanea(ruta), nombre)
+
+    @property
+    def version_activa(self) -> int:
+        return self.version
+
+    def existe(self) -> bool:
+        return True
+
+    def descargar(self) -> bool:
+        # El sistema operativo decide qué páginas del mapa quedan en memoria
+        return False
+
+    def __len__(self):
+        return len(self.instantanea)
+
+    def memoria(self) -> Dict[str, int]:
+        """
+        Ver Coleccion.memoria: los vectores están mapeados desde el archivo (el
+        sistema puede descartar esas páginas); el índice y los ids sí son memoria propia
+        """
+        propios = [self._indice, self.instantanea._ids, self.instantanea._fila]
+        return {
+            "vectores": int(self.instantanea.vectores.nbytes),
+            "indice_fuentes": tamano_profundo(propios),
+            "cache_embeddings": 0,
+            "fragmentos": len(self),
+        }
+
+    def lotes(self, tamano_lote: int = 1000) -> Iterator[Dict]:
+        return self.instantanea.lotes(tamano_lote)
+
+    def obtener_indice(self) -> IndiceFuentes:
+        if self._indice is None:
+            self._indice = self.instantanea.indice()
+        return self._indice
+
+    def ids_de_fuentes(self, fuentes: Sequence[str]) -> List[str]:
+        return []
+
+    def eliminar_fuentes(self, fuentes: Sequence[str], compactar: bool = True) -> int:
+        raise ValueError(f"La colección '{self.nombre}' es una instantánea de solo lectura (impórtala para modificarla)")
+
+    def _documento(self, fila: int):
+        from langchain.schema import Document
+
+        return Document(page_content=self.instantanea.texto(fila), metadata=self.instantanea.metadata(fila))
+
+    def buscar(self, vector: Sequence[float], k: int, filtros: Optional[Dict] = None,
+               ef: Optional[int] = None) -> List[Recuperado]:
+        return self.buscar_lote([vector], k, filtros, ef)[0]
+
+    def buscar_lote(self, vectores: Sequence[Sequence[float]], k: int,
+                    filtros: Optional[Dict] = None, ef: Optional[int] = None) -> List[List[Recuperado]]:
+        """
+        Ver Coleccion.buscar_lote (la búsqueda es exacta: ef no aplica)
+        """
+        self.ultimo_uso = time.time()
+        matriz = self.instantanea.vectores
+        filas = None
+        if filtros and any(filtros.values()):
+            desconocidos = set(filtros) - set(FILTROS_VALIDOS)
+            if desconocidos:
+                raise ValueError(f"Filtros no soportados: {sorted(desconocidos)} (válidos: {FILTROS_VALIDOS})")
+            filas = self.obtener_indice().resolver(**{c: v for c, v in filtros.items() if v})
+            matriz = matriz[filas]
+        if len(matriz) == 0:
+            return [[] for _ in vectores]
+
+        q = np.asarray(vectores, dtype=np.float32)
+        q /= np.linalg.norm(q, axis=1, keepdims=True) + 1e-12
+        todos = q @ matriz.T
+        k = min(k, len(matriz))
+
+        resultados = []
+        for puntajes in todos:
+            mejores = np.argpartition(-puntajes, k - 1)[:k]
+            mejores = mejores[np.argsort(-puntajes[mejores])]
+            recuperados = []
+            for i in mejores:
+                # Con filtros, i es la posición dentro del subconjunto
+                fila = int(filas[i]) if filas is not None else int(i)
+                recuperados.append(Recuperado(
+                    documento=self._documento(fila), puntaje=float(puntajes[i]),
+                    id=self.instantanea.id(fila), coleccion=self.nombre,
+                ))
+            resultados.append(recuperados)
+        return resultados
+
+    def obtener_fragmentos(self, ids: List[str]) -> Dict:
+        filas = {id_: self.instantanea.fila(id_) for id_ in ids}
+        return {id_: self._documento(fila) for id_, fila in filas.items() if fila is not None}
+
+
+def main():
+    from asistente import AsistenteAcademico
+
+    parser = argparse.ArgumentParser(description="Exportar / importar instantáneas de colecciones")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_exp = sub.add_parser("exportar", help="Escribe la versión activa en un archivo")
+    p_exp.add_argument("--salida", required=True)
+    p_imp = sub.add_parser("importar", help="Carga una instantánea en Chroma como nueva versión")
+    p_imp.add_argument("ruta")
+    for p in (p_exp, p_imp):
+        p.add_argument("--coleccion", default=None, help="Curso (vacío = colección predeterminada)")
+        p.add_argument("--persist-directory", default="./chroma_db")
+    p_info = sub.add_parser("info", help="Muestra el manifiesto de una instantánea")
+    p_info.add_argument("ruta")
+    args = parser.parse_args()
+
+    if args.comando == "info":
+        cabecera = Instantanea(args.ruta).cabecera
+        cabecera.pop("secciones")
+        print(json.dumps(cabecera, ensure_ascii=False, indent=2))
+        return
+
+    asistente = AsistenteAcademico(persist_directory=args.persist_directory)
+    if args.comando == "exportar":
+        asistente.exportar_instantanea(args.salida, args.coleccion)
+    else:
+        asistente.importar_instantanea(args.ruta, args.coleccion)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Perfil de memoria del asistente: cuánto ocupa cada componente.
+
+Combina estadísticas del proceso (RSS actual y pico), capturas de
+tracemalloc tomadas en los puntos clave (inicialización, carga de
+documentos y consultas) y estimaciones directas del tamaño de cada
+componente: pesos del modelo de embeddings, arenas de torch, almacén
+vectorial, embeddings cacheados, cachés de respuestas y estado de la
+sesión de Streamlit.
+
+tracemalloc solo ve lo que se reserva desde Python (incluido numpy), no
+los tensores de torch ni el grafo HNSW en C++; por eso esos componentes se
+estiman a partir de sus tensores, del número de vectores y del salto de RSS
+al cargar el modelo. El perfilado con tracemalloc tiene costo: se activa con
+AsistenteAcademico(perfilar_memoria=True) o con ASISTENTE_PERFIL_MEMORIA=1.
+
+Uso:
+    python memoria.py [--persist-directory ./chroma_db] [--cargar doc.pdf ...]
+                      [--pregunta "..."] [--llm-falso] [--json reporte.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+# Grupos de tracemalloc según el archivo que hizo la reserva
+GRUPOS_TRACEMALLOC = (
+    ("modelo_embeddings", ("torch", "transformers", "sentence_transformers", "tokenizers", "safetensors",
+                           "huggingface_hub")),
+    ("vector_store", ("chromadb", "hnswlib", "colecciones.py", "indice_fuentes.py", "instantanea.py")),
+    ("langchain", ("langchain", "langchain_core", "langchain_community")),
+    ("ingesta", ("pypdf", "documentos_pdf.py", "cache_paginas.py", "deduplicacion.py", "ingesta.py")),
+    ("caches_respuestas", ("coalescencia.py", "conversacion.py")),
+    ("streamlit", ("streamlit",)),
+    ("modulos_importados", ("<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>")),
+)
+
+# Objetos que no se recorren al medir tamaños (compartidos por todo el proceso)
+_SIN_RECORRER = (
+    types.ModuleType, type, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.FrameType, threading.Thread,
+)
+
+
+def _mb(valor: Optional[float]) -> Optional[float]:
+    return None if valor is None else round(valor / 2**20, 2)
+
+
+def memoria_proceso() -> Dict[str, Optional[int]]:
+    """
+    RSS actual y pico del proceso en bytes (None si el sistema no lo expone)
+    """
+    rss = pico = None
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    rss = int(linea.split()[1]) * 1024
+                elif linea.startswith("VmHWM:"):
+                    pico = int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    if rss is None:
+        try:
+            import psutil
+
+            rss = psutil.Process().memory_info().rss
+        except ImportError:
+            pass
+    if pico is None:
+        try:
+            import resource
+
+            maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            pico = maximo if sys.platform == "darwin" else maximo * 1024
+        except ImportError:
+            pass
+    return {"rss": rss, "rss_pico": pico}
+
+
+def tamano_profundo(objeto, excluir: Iterable = ()) -> int:
+    """
+    Bytes de un objeto y de todo lo que alcanza (contenedores, atributos, arrays)
+
+    Los arrays de numpy cuentan sus datos solo si son dueños de ellos (un
+    array sobre un mmap no ocupa memoria anónima) y los tensores de torch
+    cuentan su almacenamiento. Cada objeto se cuenta una sola vez.
+
+    Args:
+        objeto: Raíz de la medición
+        excluir: Objetos compartidos que no deben contarse (ni recorrerse)
+    """
+    vistos = {id(o) for o in excluir}
+    pendientes = [objeto]
+    total = 0
+    while pendientes:
+        o = pendientes.pop()
+        if id(o) in vistos or isinstance(o, _SIN_RECORRER):
+            continue
+        vistos.add(id(o))
+        try:
+            total += sys.getsizeof(o)
+        except TypeError:
+            continue
+        if hasattr(o, "element_size") and hasattr(o, "nelement"):
+            total += o.nelement() * o.element_size()
+            continue
+        if hasattr(o, "__array_interface__") or isinstance(o, (str, bytes, bytearray, memoryview, int, float)):
+            continue
+        if isinstance(o, dict):
+            pendientes.extend(o.keys())
+            pendientes.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            pendientes.extend(o)
+        if hasattr(o, "__dict__"):
+            pendientes.append(o.__dict__)
+        for ranura in getattr(type(o), "__slots__", ()):
+            if hasattr(o, ranura):
+                pendientes.append(getattr(o, ranura))
+    return total
+
+
+def bytes_modelo(modelo) -> int:
+    """
+    Bytes de parámetros y buffers de un modelo de embeddings
+
+    HuggingFaceEmbeddings envuelve un SentenceTransformer en .client; las
+    capas cuantizadas a int8 guardan sus pesos empaquetados fuera de
+    parameters(), así que también se suman los del state_dict. Los modelos
+    que saben su tamaño (EmbeddingsONNX) lo dan con bytes_pesos(); el resto
+    se mide con su tamaño profundo.
+    """
+    if hasattr(modelo, "bytes_pesos"):
+        return modelo.bytes_pesos()
+    cliente = getattr(modelo, "client", modelo)
+    if hasattr(cliente, "parameters") and hasattr(cliente, "buffers"):
+        tensores = {id(t): t for t in itertools.chain(cliente.parameters(), cliente.buffers())}
+        for valor in cliente.state_dict(keep_vars=True).values():
+            for t in valor if isinstance(valor, tuple) else (valor,):
+                if hasattr(t, "element_size"):
+                    tensores.setdefault(id(t), t)
+        return sum(t.nelement() * t.element_size() for t in tensores.values())
+    return tamano_profundo(cliente)
+
+
+def bytes_hnsw(fragmentos: int, dimension: int, m: int = 16) -> int:
+    """
+    Estimación de la memoria de un índice HNSW de hnswlib (vectores float32,
+    enlaces del nivel 0 y etiqueta por elemento)
+    """
+    return fragmentos * (dimension * 4 + 2 * m * 4 + 4 + 8)
+
+
+def _grupo(archivo: str) -> str:
+    partes = set(archivo.replace("\\", "/").split("/"))
+    for nombre, patrones in GRUPOS_TRACEMALLOC:
+        if partes.intersection(patrones):
+            return nombre
+    return "otros"
+
+
+class PerfiladorMemoria:
+    """
+    Puntos de medición de memoria (RSS + tracemalloc) a lo largo de la ejecución
+    """
+
+    def __init__(self, max_puntos: int = 200, top: int = 10):
+        """
+        Args:
+            max_puntos: Puntos recientes que se conservan (las consultas marcan uno cada una)
+            top: Líneas con más memoria reservada que se guardan de la última captura
+        """
+        self.activo = False
+        self.top = top
+        self.puntos: deque = deque(maxlen=max_puntos)
+        self.top_asignaciones: List[Dict] = []
+        self._crecimientos: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def activar(self, marcos: int = 1):
+        """
+        Empieza a trazar reservas con tracemalloc (si no lo estaba ya)
+
+        Args:
+            marcos: Profundidad de pila guardada por reserva (más = más costo)
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(marcos)
+        if not self.activo:
+            self.activo = True
+            self.marcar("perfil_activado")
+
+    def desactivar(self):
+        self.activo = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def marcar(self, etapa: str) -> Optional[Dict]:
+        """
+        Registra la memoria en este punto (no hace nada si el perfilador no está activo)
+
+        Returns:
+            El punto registrado, o None
+        """
+        if not self.activo or not tracemalloc.is_tracing():
+            return None
+        captura = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        actual, pico = tracemalloc.get_traced_memory()
+        por_grupo: Dict[str, int] = {}
+        for estadistica in captura.statistics("filename"):
+            grupo = _grupo(estadistica.traceback[0].filename)
+            por_grupo[grupo] = por_grupo.get(grupo, 0) + estadistica.size
+        top = [
+            {"linea": f"{e.traceback[0].filename}:{e.traceback[0].lineno}", "mb": _mb(e.size), "bloques": e.count}
+            for e in captura.statistics("lineno")[:self.top]
+        ]
+        punto = {"etapa": etapa, "t": time.time(), **memoria_proceso(), "tracemalloc": actual,
+                 "tracemalloc_pico": pico, "por_grupo": por_grupo}
+
+        with self._lock:
+            anterior = self.puntos[-1] if self.puntos else None
+            # Crecimiento de la primera vez que se pasa por cada etapa (cargas de modelos)
+            if anterior is not None and etapa not in self._crecimientos and punto["rss"] is not None:
+                self._crecimientos[etapa] = {
+                    "rss": punto["rss"] - (anterior["rss"] or 0),
+                    "tracemalloc": actual - anterior["tracemalloc"],
+                }
+            self.puntos.append(punto)
+            self.top_asignaciones = top
+        return punto
+
+    def crecimiento(self, etapa: str) -> Optional[Dict[str, int]]:
+        """
+        Bytes que creció el proceso la primera vez que se marcó una etapa
+        """
+        with self._lock:
+            return self._crecimientos.get(etapa)
+
+    def linea_de_tiempo(self) -> List[Dict]:
+        """
+        Puntos registrados con RSS y tracemalloc en MB y su diferencia con el anterior
+        """
+        with self._lock:
+            puntos = list(self.puntos)
+        linea = []
+        for anterior, punto in zip([None] + puntos, puntos):
+            linea.append({
+                "etapa": punto["etapa"],
+                "t": round(punto["t"], 3),
+                "rss_mb": _mb(punto["rss"]),
+                "delta_rss_mb": _mb(punto["rss"] - anterior["rss"]) if anterior and punto["rss"] else None,
+                "tracemalloc_mb": _mb(punto["tracemalloc"]),
+                "tracemalloc_pico_mb": _mb(punto["tracemalloc_pico"]),
+            })
+        return linea
+
+
+# Perfilador compartido por todo el proceso (la memoria es del proceso, no de cada asistente)
+PERFILADOR = PerfiladorMemoria()
+
+
+def bytes_arenas_torch(pesos: int, perfilador: PerfiladorMemoria = PERFILADOR) -> Optional[int]:
+    """
+    Memoria que torch reserva además de los pesos
+
+    En GPU es lo reservado por su asignador de caché. En CPU torch no expone
+    sus arenas: se estima como el salto de RSS al cargar el modelo de
+    embeddings menos los pesos y lo visto por tracemalloc (None si el
+    perfilador no estaba activo durante la carga).
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return 0
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return int(torch.cuda.memory_reserved())
+    salto = perfilador.crecimiento("embeddings_cargados")
+    if salto is None:
+        return None
+    return max(0, salto["rss"] - salto["tracemalloc"] - pesos)
+
+
+def reporte_memoria(modelos: Optional[Dict] = None, colecciones: Optional[Dict] = None,
+                    caches: Optional[Dict] = None, sesion=None, excluir: Iterable = (),
+                    perfilador: PerfiladorMemoria = PERFILADOR) -> Dict:
+    """
+    Memoria del proceso desglosada por componente
+
+    Args:
+        modelos: Modelos de embeddings cargados por nombre
+        colecciones: Colecciones residentes por nombre (objetos con memoria())
+        caches: Cachés de respuestas por nombre (se mide su tamaño profundo)
+        sesion: Estado de una sesión de Streamlit (st.session_state o dict)
+        excluir: Objetos compartidos que no deben contarse dentro de la sesión
+        perfilador: Perfilador con los puntos de tracemalloc
+
+    Returns:
+        dict serializable a JSON con 'proceso', 'componentes' (MB), 'dominante',
+        'sin_atribuir_mb', 'colecciones', 'sesion', 'tracemalloc' y 'linea_de_tiempo'
+    """
+    proceso = memoria_proceso()
+
+    pesos = {nombre: bytes_modelo(modelo) for nombre, modelo in (modelos or {}).items()}
+    detalle_colecciones = {nombre: c.memoria() for nombre, c in (colecciones or {}).items()}
+    detalle_caches = {nombre: tamano_profundo(cache) for nombre, cache in (caches or {}).items() if cache is not None}
+
+    detalle_sesion = None
+    if sesion is not None:
+        excluidos = list(excluir)
+        detalle_sesion = {clave: tamano_profundo(valor, excluidos) for clave, valor in dict(sesion.items()).items()}
+
+    componentes = {
+        "modelo_embeddings": sum(pesos.values()),
+        "torch_arenas": bytes_arenas_torch(sum(pesos.values()), perfilador),
+        "vector_store": sum(c["vectores"] + c["indice_fuentes"] for c in detalle_colecciones.values()),
+        "cache_embeddings": sum(c["cache_embeddings"] for c in detalle_colecciones.values()),
+        "caches_respuestas": sum(detalle_caches.values()),
+        "sesion_streamlit": sum(detalle_sesion.values()) if detalle_sesion is not None else None,
+    }
+    medidos = {nombre: valor for nombre, valor in componentes.items() if valor is not None}
+
+    ultimo = perfilador.puntos[-1] if perfilador.puntos else None
+    return {
+        "proceso": {
+            "rss_mb": _mb(proceso["rss"]),
+            "rss_pico_mb": _mb(proceso["rss_pico"]),
+            "tracemalloc_activo": tracemalloc.is_tracing(),
+        },
+        "componentes": {nombre: _mb(valor) for nombre, valor in componentes.items()},
+        "dominante": max(medidos, key=medidos.get) if any(medidos.values()) else None,
+        "sin_atribuir_mb": _mb(proceso["rss"] - sum(medidos.values())) if proceso["rss"] else None,
+        "modelos": {nombre: _mb(valor) for nombre, valor in pesos.items()},
+        "colecciones": {
+            nombre: {clave: _mb(valor) if clave != "fragmentos" else valor for clave, valor in detalle.items()}
+            for nombre, detalle in detalle_colecciones.items()
+        },
+        "caches": {nombre: _mb(valor) for nombre, valor in detalle_caches.items()},
+        "sesion": {clave: _mb(valor) for clave, valor in detalle_sesion.items()} if detalle_sesion else None,
+        "tracemalloc": {
+            "por_grupo_mb": {g: _mb(v) for g, v in sorted(ultimo["por_grupo"].items(), key=lambda x: -x[1])},
+            "top_asignaciones": list(perfilador.top_asignaciones),
+        } if ultimo else None,
+        "linea_de_tiempo": perfilador.linea_de_tiempo(),
+    }
+
+
+def imprimir_reporte(reporte: Dict):
+    """
+    Muestra el reporte en consola, de mayor a menor componente
+    """
+    proceso = reporte["proceso"]
+    print(f"\n🧠 Memoria del proceso: {proceso['rss_mb']} MB RSS (pico {proceso['rss_pico_mb']} MB)")
+    componentes = sorted(reporte["componentes"].items(), key=lambda x: -(x[1] or 0))
+    for nombre, mb in componentes:
+        marca = "  ⬅️  dominante" if nombre == reporte["dominante"] else ""
+        print(f"   {nombre:<20} {'sin datos' if mb is None else f'{mb:>9.2f} MB'}{marca}")
+    if reporte["sin_atribuir_mb"] is not None:
+        print(f"   {'sin atribuir':<20} {reporte['sin_atribuir_mb']:>9.2f} MB")
+    for nombre, detalle in reporte["colecciones"].items():
+        print(f"   📚 {nombre}: {detalle}")
+    if reporte["tracemalloc"]:
+        print("\n🔬 tracemalloc por grupo:")
+        for grupo, mb in reporte["tracemalloc"]["por_grupo_mb"].items():
+            print(f"   {grupo:<20} {mb:>9.2f} MB")
+    if reporte["linea_de_tiempo"]:
+        print("\n⏱️  Puntos de medición:")
+        for punto in reporte["linea_de_tiempo"]:
+            delta = "" if punto["delta_rss_mb"] is None else f" ({punto['delta_rss_mb']:+.2f})"
+            print(f"   {punto['etapa']:<24} RSS {punto['rss_mb']} MB{delta} · tracemalloc {punto['tracemalloc_mb']} MB")
+
+
+def main():
+    from asistente import AsistenteAcademico
+    from backends_llm import BackendFalso
+
+    parser = argparse.ArgumentParser(description="Reporte de memoria del Asistente Académico")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--cargar", nargs="*", default=[], help="PDFs a cargar antes de medir")
+    parser.add_argument("--pregunta", action="append", default=[], help="Consultas a ejecutar antes de medir")
+    parser.add_argument("--llm-falso", action="store_true", help="Generar con el backend falso en proceso")
+    parser.add_argument("--json", help="Guardar el reporte en este archivo")
+    args = parser.parse_args()
+
+    asistente = AsistenteAcademico(
+        persist_directory=args.persist_directory,
+        backend_llm=BackendFalso() if args.llm_falso else None,
+        perfilar_memoria=True,
+    )
+    if args.cargar:
+        asistente.cargar_documentos(args.cargar)
+    else:
+        asistente.cargar_vectorstore_existente()
+    for pregunta in args.pregunta:
+        asistente.consultar(pregunta)
+
+    reporte = asistente.reporte_memoria()
+    imprimir_reporte(reporte)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.json}")
+
+
+if os.environ.get("ASISTENTE_PERFIL_MEMORIA"):
+    PERFILADOR.activar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Perfil de hardware: mediciones de la máquina y los ajustes recomendados.
+
+`python verificar_setup.py --benchmark` mide, sobre los PDFs de ./documentos:
+
+    pdf          páginas por segundo extraídas
+    embeddings   fragmentos por segundo con varios tamaños de lote y hilos
+    busqueda     consultas por segundo con colecciones de varios tamaños
+    llm          tokens por segundo de prefill y de generación, y el
+                 rendimiento total con varias generaciones simultáneas
+
+y escribe perfil_hardware.json con el tamaño de lote, los hilos de
+embeddings y las generaciones simultáneas recomendados. AsistenteAcademico
+carga el perfil al arrancar (ruta en la variable ASISTENTE_PERFIL_HARDWARE)
+y lo usa para los parámetros que no se indiquen explícitamente.
+"""
+
+import json
+import os
+import platform
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+RUTA_PERFIL = os.environ.get("ASISTENTE_PERFIL_HARDWARE", "perfil_hardware.json")
+
+# Un valor se considera tan bueno como el mejor si queda a menos de esta fracción
+TOLERANCIA = 0.05
+# Ganancia mínima de rendimiento para subir a la siguiente concurrencia
+GANANCIA_CONCURRENCIA = 0.15
+
+
+@dataclass
+class PerfilHardware:
+    """
+    Ajustes recomendados para esta máquina y las mediciones de las que salen
+    """
+
+    tamano_lote: int = 64
+    hilos_embeddings: Optional[int] = None
+    max_concurrencia: int = 2
+    mediciones: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.tamano_lote < 1 or self.max_concurrencia < 1:
+            raise ValueError("'tamano_lote' y 'max_concurrencia' deben ser positivos")
+        if self.hilos_embeddings is not None and self.hilos_embeddings < 1:
+            raise ValueError("'hilos_embeddings' debe ser positivo")
+
+    def guardar(self, ruta: str):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> Optional["PerfilHardware"]:
+        """
+        Carga un perfil guardado (None si el archivo no existe o no es válido)
+        """
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+
+def describir_maquina() -> Dict:
+    return {
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def hilos_candidatos(cpus: Optional[int] = None) -> List[int]:
+    """
+    1, 2, 4, ... hasta el número de núcleos (incluido)
+    """
+    cpus = cpus or os.cpu_count() or 1
+    hilos, n = [], 1
+    while n < cpus:
+        hilos.append(n)
+        n *= 2
+    return hilos + [cpus]
+
+
+def medir_pdf(pdfs: Sequence) -> Dict:
+    """
+    Páginas por segundo extraídas (sin caché de páginas)
+
+    Args:
+        pdfs: DocumentoPDF a leer
+    """
+    paginas = 0
+    inicio = time.perf_counter()
+    for pdf in pdfs:
+        paginas += sum(1 for _ in pdf.iterar_paginas())
+    segundos = time.perf_counter() - inicio
+    return {"paginas": paginas, "segundos": round(segundos, 3),
+            "paginas_por_segundo": round(paginas / segundos, 1) if segundos else 0.0}
+
+
+def medir_embeddings(embeddings, textos: List[str], lotes: Sequence[int] = (8, 16, 32, 64, 128),
+                     hilos: Optional[Sequence[int]] = None) -> List[Dict]:
+    """
+    Fragmentos por segundo de cada combinación de tamaño de lote e hilos
+
+    Args:
+        embeddings: Modelo con embed_documents()
+        textos: Fragmentos a embeber en cada medición
+        lotes: Tamaños de lote a probar
+        hilos: Hilos de torch a probar (None = sin cambiarlos; sin torch solo se mide una vez)
+
+    Returns:
+        Una fila por combinación con 'lote', 'hilos' y 'fragmentos_por_segundo'
+    """
+    from embeddings_cpu import configurar_hilos
+
+    try:
+        import torch
+
+        hilos_originales = torch.get_num_threads()
+    except ImportError:
+        hilos, hilos_originales = None, None
+
+    embeddings.embed_documents(textos[:max(lotes)])  # Calentamiento
+    filas = []
+    try:
+        for n_hilos in hilos or [None]:
+            configurar_hilos(n_hilos)
+            for lote in lotes:
+                inicio = time.perf_counter()
+                for desde in range(0, len(textos), lote):
+                    embeddings.embed_documents(textos[desde:desde + lote])
+                segundos = time.perf_counter() - inicio
+                filas.append({
+                    "lote": lote,
+                    "hilos": n_hilos,
+                    "fragmentos_por_segundo": round(len(textos) / segundos, 1) if segundos else float("inf"),
+                })
+    finally:
+        configurar_hilos(hilos_originales)
+    return filas
+
+
+def medir_busqueda(vectores: np.ndarray, tamanos: Sequence[int] = (1000, 10000, 50000), k: int = 3,
+                   consultas: int = 200, semilla: int = 0) -> List[Dict]:
+    """
+    Consultas por segundo (una a la vez, como en producción) con colecciones de varios tamaños
+
+    La colección se llena con los vectores del corpus más ruido gaussiano
+    hasta cada tamaño, con los parámetros HNSW por defecto del asistente.
+
+    Args:
+        vectores: Embeddings reales del corpus (n x d) de los que se generan los sintéticos
+        tamanos: Tamaños de colección a medir (de menor a mayor)
+        k: Vecinos por consulta
+        consultas: Consultas por medición
+
+    Returns:
+        Una fila por tamaño con 'fragmentos', 'consultas_por_segundo', 'p50_ms' y 'construccion_s'
+    """
+    import chromadb
+
+    from indice_hnsw import ConfigIndice
+
+    rng = np.random.default_rng(semilla)
+    vectores = np.asarray(vectores, dtype=np.float32)
+    escala = 0.3 / np.sqrt(vectores.shape[1])
+
+    def sinteticos(n):
+        base = vectores[rng.integers(0, len(vectores), size=n)]
+        return base + rng.normal(scale=escala, size=base.shape).astype(np.float32)
+
+    cliente = chromadb.EphemeralClient()
+    nombre = f"perfil_{uuid.uuid4().hex[:8]}"
+    coleccion = cliente.create_collection(nombre, metadata=ConfigIndice().metadata())
+    filas, actuales, construccion = [], 0, 0.0
+    try:
+        for tamano in sorted(tamanos):
+            inicio = time.perf_counter()
+            while actuales < tamano:
+                lote = min(1000, tamano - actuales)
+                coleccion.add(ids=[str(actuales + i) for i in range(lote)], embeddings=sinteticos(lote).tolist())
+                actuales += lote
+            construccion += time.perf_counter() - inicio
+
+            latencias = []
+            for vector in sinteticos(consultas):
+                inicio = time.perf_counter()
+                coleccion.query(query_embeddings=[vector.tolist()], n_results=k, include=["distances"])
+                latencias.append(time.perf_counter() - inicio)
+            filas.append({
+                "fragmentos": tamano,
+                "consultas_por_segundo": round(len(latencias) / sum(latencias), 1),
+                "p50_ms": round(float(np.percentile(latencias, 50)) * 1000, 3),
+                "construccion_s": round(construccion, 2),
+            })
+    finally:
+        cliente.delete_collection(nombre)
+    return filas
+
+
+def medir_llm(backend, prompt: str, concurrencias: Sequence[int] = (1, 2, 4), repeticiones: int = 2) -> Dict:
+    """
+    Velocidad de prefill y de generación, y rendimiento con generaciones simultáneas
+
+    Args:
+        backend: BackendLLM (Ollama o el servidor falso)
+        prompt: Prompt del tamaño de una consulta real (contexto + pregunta)
+        concurrencias: Generaciones simultáneas a probar
+        repeticiones: Generaciones por hilo en cada nivel de concurrencia
+
+    Returns:
+        dict con 'prefill_tokens_por_segundo', 'generacion_tokens_por_segundo'
+        y 'concurrencia' (una fila por nivel con 'tokens_por_segundo' totales)
+    """
+    backend.generar("Hola")  # Carga el modelo en memoria
+    # Un sufijo distinto por llamada evita que el servidor reutilice el prefill
+    generacion = backend.generar(f"{prompt}\n[{uuid.uuid4().hex[:8]}]")
+
+    def velocidad(tokens, segundos):
+        return round(tokens / segundos, 1) if segundos else None
+
+    filas = []
+    for n in concurrencias:
+        def trabajar(_):
+            return [backend.generar(f"{prompt}\n[{uuid.uuid4().hex[:8]}]").tokens_respuesta for _ in range(repeticiones)]
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            tokens = sum(sum(r) for r in pool.map(trabajar, range(n)))
+        segundos = time.perf_counter() - inicio
+        filas.append({"generaciones": n, "tokens_por_segundo": velocidad(tokens, segundos),
+                      "segundos_por_generacion": round(segundos / repeticiones, 3)})
+
+    return {
+        "backend": backend.nombre,
+        "modelo": backend.modelo,
+        "tokens_prompt": generacion.tokens_prompt,
+        "prefill_tokens_por_segundo": velocidad(generacion.tokens_prompt, generacion.segundos_prefill),
+        "generacion_tokens_por_segundo": velocidad(generacion.tokens_respuesta, generacion.segundos_generacion),
+        "concurrencia": filas,
+    }
+
+
+def recomendar(mediciones: Dict) -> PerfilHardware:
+    """
+    Ajustes a partir de las mediciones
+
+    - tamano_lote e hilos_embeddings: la combinación más pequeña cuyo
+      rendimiento queda a menos de TOLERANCIA del mejor (lotes y hilos más
+      chicos dejan memoria y núcleos para el resto del proceso)
+    - max_concurrencia: se sube mientras cada nivel mejore el rendimiento
+      total del LLM en al menos GANANCIA_CONCURRENCIA
+    """
+    perfil = PerfilHardware(mediciones=mediciones)
+
+    filas = mediciones.get("embeddings") or []
+    if filas:
+        mejor = max(f["fragmentos_por_segundo"] for f in filas)
+        elegida = min(
+            (f for f in filas if f["fragmentos_por_segundo"] >= (1 - TOLERANCIA) * mejor),
+            key=lambda f: (f["hilos"] or 0, f["lote"]),
+        )
+        perfil.tamano_lote = elegida["lote"]
+        perfil.hilos_embeddings = elegida["hilos"]
+
+    niveles = (mediciones.get("llm") or {}).get("concurrencia") or []
+    if niveles:
+        perfil.max_concurrencia = niveles[0]["generaciones"]
+        anterior = niveles[0]["tokens_por_segundo"] or 0.0
+        for nivel in niveles[1:]:
+            actual = nivel["tokens_por_segundo"] or 0.0
+            if actual < anterior * (1 + GANANCIA_CONCURRENCIA):
+                break
+            perfil.max_concurrencia, anterior = nivel["generaciones"], actual
+    return perfil
+
+
+def textos_corpus(rutas: Sequence[str], minimo: int = 256) -> List[str]:
+    """
+    Fragmentos (como los de cargar_documentos) de los PDFs, repetidos hasta tener al menos 'minimo'
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    from documentos_pdf import DocumentoPDF
+
+    divisor = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len,
+                                             separators=["\n\n", "\n", " ", ""])
+    textos = [
+        fragmento.page_content
+        for ruta in rutas
+        for pagina in DocumentoPDF.desde(ruta).iterar_paginas()
+        for fragmento in divisor.split_documents([pagina])
+        if fragmento.page_content.strip()
+    ]
+    if not textos:
+        raise ValueError("El corpus no tiene texto extraíble")
+    return (textos * (minimo // len(textos) + 1))[:max(minimo, len(textos))]
+
+
+def ejecutar(rutas: Sequence[str], embeddings, backend=None, lotes: Sequence[int] = (8, 16, 32, 64, 128),
+             hilos: Optional[Sequence[int]] = None, tamanos: Sequence[int] = (1000, 10000, 50000),
+             concurrencias: Sequence[int] = (1, 2, 4)) -> PerfilHardware:
+    """
+    Ejecuta todas las mediciones y devuelve el perfil recomendado
+
+    Args:
+        rutas: PDFs del corpus de prueba
+        embeddings: Modelo de embeddings del asistente
+        backend: BackendLLM a medir (None = se omite el LLM)
+        lotes, hilos, tamanos, concurrencias: Valores a probar (ver cada medir_*)
+    """
+    from documentos_pdf import DocumentoPDF
+
+    mediciones = {"maquina": describir_maquina()}
+
+    print("📄 Extracción de páginas...")
+    mediciones["pdf"] = medir_pdf([DocumentoPDF.desde(ruta) for ruta in rutas])
+
+    print("🔢 Embeddings por lote e hilos...")
+    textos = textos_corpus(rutas)
+    mediciones["embeddings"] = medir_embeddings(embeddings, textos, lotes, hilos or hilos_candidatos())
+
+    print("🔍 Búsqueda vectorial por tamaño de colección...")
+    vectores = np.asarray(embeddings.embed_documents(textos[:256]), dtype=np.float32)
+    mediciones["busqueda"] = medir_busqueda(vectores, tamanos)
+
+    if backend is not None:
+        print(f"🦙 LLM ({backend.nombre}: {backend.modelo})...")
+        contexto = "\n\n".join(textos[:3])
+        prompt = f"Contexto:\n{contexto}\n\nPregunta: ¿Cuál es la idea principal del texto?\n\nRespuesta:"
+        mediciones["llm"] = medir_llm(backend, prompt, concurrencias)
+
+    return recomendar(mediciones)
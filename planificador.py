@@ -0,0 +1,203 @@
+"""
+Planificador de generaciones: control de admisión delante del LLM.
+
+Limita cuántas generaciones corren a la vez, ordena la espera por clase de
+prioridad (las consultas interactivas pasan delante de las evaluaciones por
+lotes) y aplica un plazo por petición: si una petición no podrá empezar a
+tiempo se rechaza al llegar o en cuanto vence el plazo, en lugar de esperar
+al timeout del cliente HTTP.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+INTERACTIVA = "interactiva"
+LOTE = "lote"
+PRIORIDADES = {INTERACTIVA: 0, LOTE: 1}
+
+
+class RechazoGeneracion(RuntimeError):
+    """
+    La generación no se admitió (cola llena o plazo imposible de cumplir)
+    """
+
+    def __init__(self, motivo: str, mensaje: str):
+        super().__init__(mensaje)
+        self.motivo = motivo
+
+
+class _Turno:
+    def __init__(self, prioridad: str, limite: Optional[float]):
+        self.prioridad = prioridad
+        self.limite = limite
+        self.llegada = time.monotonic()
+        self.concedido = False
+        self.descartado = None  # motivo si se retiró de la cola
+
+
+class PlanificadorGeneraciones:
+    """
+    Cola de prioridad acotada con concurrencia máxima y plazos
+    """
+
+    def __init__(self, max_concurrencia: int = 2, max_cola: int = 32,
+                 plazos: Optional[Dict[str, Optional[float]]] = None, ventana_metricas: int = 500):
+        """
+        Args:
+            max_concurrencia: Generaciones simultáneas permitidas
+            max_cola: Peticiones en espera como máximo (todas las prioridades)
+            plazos: Segundos máximos hasta obtener respuesta por prioridad (None = sin plazo)
+            ventana_metricas: Esperas recientes usadas para los percentiles
+        """
+        self.max_concurrencia = max_concurrencia
+        self.max_cola = max_cola
+        self.plazos = {INTERACTIVA: 120.0, LOTE: None}
+        self.plazos.update(plazos or {})
+
+        self._lock = threading.Lock()
+        self._condicion = threading.Condition(self._lock)
+        self._cola = []  # heap de (prioridad, orden, turno)
+        self._orden = itertools.count()
+        self._en_cola = {p: 0 for p in PRIORIDADES}
+        self.activos = 0
+
+        # Duración media de una generación (media móvil exponencial)
+        self.servicio_medio: Optional[float] = None
+        self._esperas = {p: deque(maxlen=ventana_metricas) for p in PRIORIDADES}
+        self.completadas = {p: 0 for p in PRIORIDADES}
+        self.rechazadas: Dict[str, int] = {}
+
+    # ---------- admisión ----------
+
+    def _espera_estimada(self, posicion: int) -> float:
+        if self.servicio_medio is None:
+            return 0.0
+        return (posicion // self.max_concurrencia + (self.activos >= self.max_concurrencia)) * self.servicio_medio
+
+    def _rechazar(self, motivo: str, mensaje: str):
+        self.rechazadas[motivo] = self.rechazadas.get(motivo, 0) + 1
+        raise RechazoGeneracion(motivo, mensaje)
+
+    def _expulsar_menos_prioritario(self, prioridad: str) -> bool:
+        """
+        Con la cola llena, una petición más prioritaria desplaza a la última de menor prioridad
+        """
+        candidatos = [e for e in self._cola if e[2].descartado is None and e[0] > PRIORIDADES[prioridad]]
+        if not candidatos:
+            return False
+        victima = max(candidatos, key=lambda e: (e[0], e[1]))[2]
+        victima.descartado = "desplazada"
+        self._en_cola[victima.prioridad] -= 1
+        self._condicion.notify_all()
+        return True
+
+    def _admitir(self, prioridad: str, plazo: Optional[float]) -> _Turno:
+        if prioridad not in PRIORIDADES:
+            raise ValueError(f"Prioridad desconocida: {prioridad} (opciones: {sorted(PRIORIDADES)})")
+        plazo = self.plazos.get(prioridad) if plazo is None else plazo
+        turno = _Turno(prioridad, time.monotonic() + plazo if plazo is not None else None)
+
+        with self._condicion:
+            if self.activos < self.max_concurrencia and not self._cola:
+                self.activos += 1
+                turno.concedido = True
+                self._esperas[prioridad].append(0.0)
+                return turno
+
+            # Si ni siquiera la espera estimada cabe en el plazo, rechazar ya (antes de desplazar a nadie;
+            # los desplazables son de menor prioridad y no cuentan en la espera)
+            delante = sum(n for p, n in self._en_cola.items() if PRIORIDADES[p] <= PRIORIDADES[prioridad])
+            if turno.limite is not None and self.servicio_medio is not None:
+                fin_estimado = time.monotonic() + self._espera_estimada(delante) + self.servicio_medio
+                if fin_estimado > turno.limite:
+                    self._rechazar("plazo_imposible", "El plazo vencería antes de obtener respuesta")
+
+            en_cola = sum(self._en_cola.values())
+            if en_cola >= self.max_cola and not self._expulsar_menos_prioritario(prioridad):
+                self._rechazar("cola_llena", f"Cola de generación llena ({en_cola} en espera)")
+
+            heapq.heappush(self._cola, (PRIORIDADES[prioridad], next(self._orden), turno))
+            self._en_cola[prioridad] += 1
+
+            while not turno.concedido and turno.descartado is None:
+                restante = None if turno.limite is None else turno.limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    turno.descartado = "plazo_vencido"
+                    self._en_cola[prioridad] -= 1
+                    break
+                self._condicion.wait(restante)
+
+            if not turno.concedido:
+                motivo = turno.descartado
+                self._rechazar(motivo, f"Generación no admitida ({motivo})")
+
+            self._esperas[prioridad].append(time.monotonic() - turno.llegada)
+            return turno
+
+    def _liberar(self, turno: _Turno, duracion: Optional[float]):
+        with self._condicion:
+            self.activos -= 1
+            if duracion is not None:
+                self.completadas[turno.prioridad] += 1
+                self.servicio_medio = (
+                    duracion if self.servicio_medio is None else 0.8 * self.servicio_medio + 0.2 * duracion
+                )
+            # Conceder el hueco al siguiente turno vigente de mayor prioridad
+            while self._cola and self.activos < self.max_concurrencia:
+                _, _, siguiente = heapq.heappop(self._cola)
+                if siguiente.descartado is not None:
+                    continue
+                self._en_cola[siguiente.prioridad] -= 1
+                siguiente.concedido = True
+                self.activos += 1
+            self._condicion.notify_all()
+
+    @contextmanager
+    def turno(self, prioridad: str = INTERACTIVA, plazo: Optional[float] = None):
+        """
+        Reserva un hueco de generación durante el bloque with
+
+        Raises:
+            RechazoGeneracion: si la cola está llena o el plazo no se puede cumplir
+        """
+        turno = self._admitir(prioridad, plazo)
+        inicio = time.monotonic()
+        completada = False
+        try:
+            yield turno
+            completada = True
+        finally:
+            self._liberar(turno, time.monotonic() - inicio if completada else None)
+
+    def ejecutar(self, funcion: Callable, prioridad: str = INTERACTIVA, plazo: Optional[float] = None):
+        """
+        Ejecuta funcion() cuando haya un hueco de generación
+        """
+        with self.turno(prioridad, plazo):
+            return funcion()
+
+    # ---------- métricas ----------
+
+    def metricas(self) -> Dict:
+        """
+        Profundidad de cola, esperas (p50/p95) y rechazos por prioridad
+        """
+        with self._lock:
+            esperas = {p: np.asarray(e, dtype=float) for p, e in self._esperas.items()}
+            return {
+                "activos": self.activos,
+                "max_concurrencia": self.max_concurrencia,
+                "en_cola": dict(self._en_cola),
+                "servicio_medio_s": round(self.servicio_medio, 3) if self.servicio_medio else None,
+                "espera_p50_s": {p: round(float(np.percentile(e, 50)), 3) if e.size else 0.0 for p, e in esperas.items()},
+                "espera_p95_s": {p: round(float(np.percentile(e, 95)), 3) if e.size else 0.0 for p, e in esperas.items()},
+                "completadas": dict(self.completadas),
+                "rechazadas": dict(self.rechazadas),
+            }
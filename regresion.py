@@ -0,0 +1,393 @@
+"""
+Control de regresiones de rendimiento contra una línea base guardada.
+
+Ejecuta una batería fija de benchmarks y la compara con la línea base:
+
+    micro:   funciones de métricas, división en fragmentos, deduplicación,
+             embeddings y búsqueda vectorial
+    macro:   ingesta completa de los PDFs de documentos/ y consultas de
+             punta a punta con el backend falso (sin Ollama)
+    calidad: promedios de EvaluadorRAG sobre el dataset de evaluación
+
+Los micro benchmarks guardan la repetición más rápida y los macro la
+mediana de varias repeticiones. Una métrica de tiempo
+empeora si crece más que la tolerancia relativa; una de calidad, si baja
+más que la tolerancia absoluta. Con alguna regresión el comando termina
+con código 1 y muestra la diferencia métrica por métrica.
+
+Uso:
+    python regresion.py guardar [--linea-base linea_base_rendimiento.json] [--embeddings-hash]
+    python regresion.py comparar [--linea-base ...] [--resultados r.json] [--tolerancia 0.25]
+    python regresion.py ejecutar [--salida r.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+ARCHIVO_LINEA_BASE = "linea_base_rendimiento.json"
+DIRECTORIO_CORPUS = "documentos"
+MENOR, MAYOR = "menor", "mayor"  # dirección en la que la métrica mejora
+
+# Campos del entorno que deben coincidir para que la comparación sea válida
+ENTORNO_COMPARABLE = ("plataforma", "arquitectura", "cpus", "embeddings", "llm", "corpus")
+
+TEXTO_REFERENCIA = (
+    "RAG (Retrieval-Augmented Generation) es una técnica que combina recuperación de información "
+    "con generación de texto. Funciona recuperando documentos relevantes y usándolos como contexto."
+)
+TEXTO_CANDIDATO = (
+    "RAG combina la recuperación de documentos relevantes con un modelo generativo, que usa esos "
+    "documentos como contexto para generar respuestas más precisas."
+)
+
+
+class EmbeddingsHash:
+    """
+    Embeddings deterministas por hashing de palabras (sin descargar modelos)
+
+    Sirve para correr la batería en máquinas sin el modelo de
+    sentence-transformers; sus tiempos solo se comparan con líneas base
+    hechas con los mismos embeddings.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def embed_query(self, texto: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for palabra in texto.lower().split():
+            h = hashlib.blake2b(palabra.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(h, "little") % self.dimension] += 1.0
+        vector /= np.linalg.norm(vector) or 1.0
+        return vector.tolist()
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in textos]
+
+
+def _medir(funcion: Callable, repeticiones: int, iteraciones: int = 1) -> float:
+    """
+    Milisegundos por iteración de la repetición más rápida
+
+    Como en timeit, el mínimo es lo más estable para micro benchmarks: las
+    repeticiones más lentas miden interferencias del sistema, no el código.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000 / iteraciones)
+    return min(tiempos)
+
+
+def _metrica(valor: float, unidad: str, mejor: str, tipo: str) -> Dict:
+    return {"valor": round(float(valor), 4), "unidad": unidad, "mejor": mejor, "tipo": tipo}
+
+
+def _version(paquete: str) -> Optional[str]:
+    try:
+        return metadata.version(paquete)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _pdfs_corpus(directorio: str = DIRECTORIO_CORPUS) -> List[str]:
+    return sorted(os.path.join(directorio, n) for n in os.listdir(directorio) if n.lower().endswith(".pdf"))
+
+
+def entorno(embeddings: str, llm: str, pdfs: List[str]) -> Dict:
+    """
+    Descripción de la máquina y de las entradas con que se midió
+    """
+    from documentos_pdf import hash_archivo
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    corpus = hashlib.sha256("".join(hash_archivo(p) for p in pdfs).encode()).hexdigest()[:16]
+    return {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plataforma": platform.system(),
+        "arquitectura": platform.machine(),
+        "cpus": os.cpu_count(),
+        "versiones": {p: _version(p) for p in ("numpy", "langchain", "chromadb", "torch", "sentence-transformers")},
+        "embeddings": embeddings,
+        "llm": llm,
+        "corpus": corpus,
+    }
+
+
+def ejecutar_bateria(repeticiones: int = 5, embeddings_hash: bool = False, con_llm: bool = False,
+                     dataset: str = "dataset_evaluacion.json") -> Dict:
+    """
+    Ejecuta la batería completa
+
+    Args:
+        repeticiones: Repeticiones por medición
+        embeddings_hash: Usar EmbeddingsHash en lugar del modelo real
+        con_llm: Generar con Ollama en lugar del backend falso (calidad real, tiempos ruidosos)
+        dataset: Dataset de evaluación para las consultas y la calidad
+
+    Returns:
+        dict con 'entorno' y 'metricas' ({nombre: {valor, unidad, mejor, tipo}})
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    from asistente import MODELO_EMBEDDINGS, AsistenteAcademico, obtener_embeddings, registrar_embeddings
+    from backends_llm import BackendFalso
+    from deduplicacion import DeduplicadorMinHash
+    from documentos_pdf import DocumentoPDF
+    from evaluador import EvaluadorRAG
+    from metricas import MetricasRAG
+
+    if embeddings_hash:
+        registrar_embeddings(EmbeddingsHash())
+    pdfs = _pdfs_corpus()
+    if not pdfs:
+        raise ValueError(f"No hay PDFs en {DIRECTORIO_CORPUS}/ para la batería")
+    with open(dataset, encoding="utf-8") as f:
+        items = [item for item in json.load(f) if not item.get("fuera_de_tema")]
+
+    metricas = {}
+    print(f"🧪 Batería de regresión ({repeticiones} repeticiones por medición)")
+
+    # ---------- micro: métricas ----------
+    relevantes, recuperados = ["RAG.pdf", "LLM.pdf"], ["RAG.pdf", "Vectores.pdf", "LLM.pdf"]
+    metricas["metricas.bleu_ms"] = _metrica(
+        _medir(lambda: MetricasRAG.bleu_score(TEXTO_REFERENCIA, TEXTO_CANDIDATO), repeticiones, 200), "ms", MENOR, "micro")
+    metricas["metricas.rouge_ms"] = _metrica(
+        _medir(lambda: MetricasRAG.rouge_score(TEXTO_REFERENCIA, TEXTO_CANDIDATO), repeticiones, 200), "ms", MENOR, "micro")
+    metricas["metricas.precision_recall_ms"] = _metrica(
+        _medir(lambda: MetricasRAG.precision_recall_f1(relevantes, recuperados), repeticiones, 2000), "ms", MENOR, "micro")
+
+    # ---------- micro: división y deduplicación ----------
+    paginas = [pagina for ruta in pdfs for pagina in DocumentoPDF.desde(ruta).extraer_paginas()]
+    divisor = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len,
+                                             separators=["\n\n", "\n", " ", ""])
+    chunks = divisor.split_documents(paginas)
+    metricas["division.ms_por_pagina"] = _metrica(
+        _medir(lambda: divisor.split_documents(paginas), repeticiones) / len(paginas), "ms", MENOR, "micro")
+    metricas["deduplicacion.ms_por_fragmento"] = _metrica(
+        _medir(lambda: list(DeduplicadorMinHash().procesar(chunks)), repeticiones) / len(chunks), "ms", MENOR, "micro")
+
+    # ---------- micro: embeddings ----------
+    modelo = obtener_embeddings()
+    textos = [c.page_content for c in chunks]
+    preguntas = [item["pregunta"] for item in items]
+    modelo.embed_documents(textos[:2])  # primera llamada fuera de la medición
+    metricas["embeddings.ms_por_fragmento"] = _metrica(
+        _medir(lambda: modelo.embed_documents(textos), repeticiones) / len(textos), "ms", MENOR, "micro")
+    metricas["embeddings.consulta_ms"] = _metrica(
+        _medir(lambda: modelo.embed_query(preguntas[0]), repeticiones, 10), "ms", MENOR, "micro")
+
+    with tempfile.TemporaryDirectory(prefix="regresion_") as directorio:
+        backend = None if con_llm else BackendFalso()
+        asistente = AsistenteAcademico(persist_directory=directorio, directorio_cache_paginas=None,
+                                       coalescer=False, backend_llm=backend)
+
+        # ---------- macro: ingesta ----------
+        inicio = time.perf_counter()
+        asistente.cargar_documentos(pdfs, reemplazar=True)
+        tiempos_ingesta = [time.perf_counter() - inicio]
+        for _ in range(repeticiones - 1):
+            inicio = time.perf_counter()
+            asistente.cargar_documentos(pdfs, reemplazar=True)
+            tiempos_ingesta.append(time.perf_counter() - inicio)
+        metricas["ingesta.segundos"] = _metrica(statistics.median(tiempos_ingesta), "s", MENOR, "macro")
+
+        # ---------- micro: búsqueda ----------
+        coleccion = asistente.colecciones.usar()
+        vectores = [modelo.embed_query(p) for p in preguntas]
+        lote = (vectores * 32)[:32]
+        filtros = {"fuentes": [chunks[0].metadata["source"]]}
+        metricas["busqueda.ms"] = _metrica(
+            _medir(lambda: coleccion.buscar(vectores[0], asistente.top_k), repeticiones, 20), "ms", MENOR, "micro")
+        metricas["busqueda.lote_ms_por_consulta"] = _metrica(
+            _medir(lambda: coleccion.buscar_lote(lote, asistente.top_k), repeticiones) / len(lote), "ms", MENOR, "micro")
+        metricas["busqueda.filtrada_ms"] = _metrica(
+            _medir(lambda: coleccion.buscar(vectores[0], asistente.top_k, filtros), repeticiones, 20), "ms", MENOR, "micro")
+
+        # ---------- macro: consultas de punta a punta + calidad ----------
+        latencias = []
+        evaluador = EvaluadorRAG(dataset)
+        for repeticion in range(repeticiones):
+            for item in items:
+                inicio = time.perf_counter()
+                resultado = asistente.consultar(item["pregunta"], prioridad="lote")
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                if repeticion == 0:
+                    evaluador.evaluar_pregunta(
+                        item["pregunta"], resultado["respuesta"], item["respuesta_referencia"],
+                        [os.path.basename(doc.metadata.get("source", "")) for doc in resultado["fuentes"]],
+                        item["documentos_relevantes"],
+                    )
+        metricas["consulta.p50_ms"] = _metrica(np.percentile(latencias, 50), "ms", MENOR, "macro")
+        metricas["consulta.p95_ms"] = _metrica(np.percentile(latencias, 95), "ms", MENOR, "macro")
+
+        reporte = evaluador.generar_reporte(os.path.join(directorio, "reporte_evaluacion.json"))
+        for clave in ("promedio_bleu", "promedio_rouge1_f1", "promedio_rougeL_f1",
+                      "promedio_precision", "promedio_recall", "promedio_f1_score"):
+            if clave in reporte:
+                metricas[f"calidad.{clave[len('promedio_'):]}"] = _metrica(reporte[clave], "", MAYOR, "calidad")
+
+        asistente.colecciones.obtener().descargar()
+
+    nombre_embeddings = "hash" if embeddings_hash else MODELO_EMBEDDINGS
+    nombre_llm = asistente.modelo_llama if con_llm else "falso"
+    return {"entorno": entorno(nombre_embeddings, nombre_llm, pdfs), "metricas": metricas}
+
+
+def comparar(linea_base: Dict, actual: Dict, tolerancia: float = 0.25, tolerancia_calidad: float = 0.02,
+             minimo_ms: float = 0.01) -> Dict:
+    """
+    Compara dos ejecuciones de la batería
+
+    Args:
+        linea_base: Resultado guardado con 'guardar'
+        actual: Resultado de la ejecución a validar
+        tolerancia: Aumento relativo permitido en las métricas de tiempo (0.25 = 25 %)
+        tolerancia_calidad: Caída absoluta permitida en las métricas de calidad
+        minimo_ms: Diferencias de tiempo menores que esto (en ms) se ignoran como ruido
+
+    Returns:
+        dict con 'filas' (una por métrica), 'regresiones' (nombres) y
+        'entorno_distinto' (campos del entorno que no coinciden)
+    """
+    filas, regresiones = [], []
+    for nombre, base in linea_base["metricas"].items():
+        medida = actual["metricas"].get(nombre)
+        if medida is None:
+            filas.append({"metrica": nombre, "base": base["valor"], "actual": None, "cambio": None, "estado": "falta"})
+            regresiones.append(nombre)
+            continue
+        anterior, valor = base["valor"], medida["valor"]
+        if base["tipo"] == "calidad":
+            cambio = valor - anterior
+            empeora = -cambio if base["mejor"] == MAYOR else cambio
+            regresion, margen = empeora > tolerancia_calidad, tolerancia_calidad
+        else:
+            cambio = (valor - anterior) / anterior if anterior else 0.0
+            empeora = cambio if base["mejor"] == MENOR else -cambio
+            diferencia_ms = abs(valor - anterior) * (1000 if base["unidad"] == "s" else 1)
+            regresion, margen = empeora > tolerancia and diferencia_ms > minimo_ms, tolerancia
+        estado = "regresion" if regresion else ("mejora" if -empeora > margen else "ok")
+        filas.append({"metrica": nombre, "base": anterior, "actual": valor, "cambio": round(cambio, 4),
+                      "tipo": base["tipo"], "unidad": base["unidad"], "estado": estado})
+        if regresion:
+            regresiones.append(nombre)
+
+    entorno_base, entorno_actual = linea_base.get("entorno", {}), actual.get("entorno", {})
+    distinto = [c for c in ENTORNO_COMPARABLE if entorno_base.get(c) != entorno_actual.get(c)]
+    return {"filas": filas, "regresiones": regresiones, "entorno_distinto": distinto,
+            "nuevas": sorted(set(actual["metricas"]) - set(linea_base["metricas"]))}
+
+
+def imprimir_comparacion(comparacion: Dict, linea_base: Dict, actual: Dict, tolerancia: float,
+                         tolerancia_calidad: float):
+    """
+    Muestra la diferencia métrica por métrica
+    """
+    iconos = {"ok": "✅", "mejora": "🚀", "regresion": "❌", "falta": "⚠️ "}
+    print(f"\n📊 Comparación con la línea base ({linea_base['entorno'].get('fecha')}, "
+          f"commit {linea_base['entorno'].get('commit')})")
+    print(f"   {'':3}{'métrica':<34}{'base':>12}{'actual':>12}{'cambio':>11}")
+    for fila in comparacion["filas"]:
+        if fila["actual"] is None:
+            cambio, actual_txt = "", "—"
+        else:
+            actual_txt = f"{fila['actual']:.4f}"
+            cambio = f"{fila['cambio']:+.4f}" if fila["tipo"] == "calidad" else f"{fila['cambio']:+.1%}"
+        print(f"   {iconos[fila['estado']]} {fila['metrica']:<34}{fila['base']:>12.4f}{actual_txt:>12}{cambio:>11}")
+
+    for nombre in comparacion["nuevas"]:
+        print(f"   ➕ {nombre} (sin línea base: {actual['metricas'][nombre]['valor']})")
+    if comparacion["entorno_distinto"]:
+        campos = ", ".join(
+            f"{c}: {linea_base['entorno'].get(c)} → {actual['entorno'].get(c)}" for c in comparacion["entorno_distinto"]
+        )
+        print(f"\n⚠️  El entorno no coincide con el de la línea base ({campos}); los tiempos no son comparables")
+
+    if comparacion["regresiones"]:
+        print(f"\n❌ {len(comparacion['regresiones'])} métricas empeoraron más allá de la tolerancia "
+              f"(tiempos +{tolerancia:.0%}, calidad -{tolerancia_calidad}): {', '.join(comparacion['regresiones'])}")
+    else:
+        print("\n✅ Sin regresiones")
+
+
+def _guardar(datos: Dict, ruta: str):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control de regresiones de rendimiento")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    def opciones_bateria(p):
+        p.add_argument("--repeticiones", type=int, default=5)
+        p.add_argument("--embeddings-hash", action="store_true",
+                       help="Embeddings deterministas por hashing (sin el modelo de sentence-transformers)")
+        p.add_argument("--con-llm", action="store_true", help="Generar con Ollama en lugar del backend falso")
+        p.add_argument("--dataset", default="dataset_evaluacion.json")
+
+    p_ejecutar = sub.add_parser("ejecutar", help="Ejecutar la batería y mostrar los resultados")
+    opciones_bateria(p_ejecutar)
+    p_ejecutar.add_argument("--salida", help="Guardar los resultados en este archivo")
+
+    p_guardar = sub.add_parser("guardar", help="Ejecutar la batería y guardarla como línea base")
+    opciones_bateria(p_guardar)
+    p_guardar.add_argument("--linea-base", default=ARCHIVO_LINEA_BASE)
+
+    p_comparar = sub.add_parser("comparar", help="Comparar con la línea base (código 1 si hay regresiones)")
+    opciones_bateria(p_comparar)
+    p_comparar.add_argument("--linea-base", default=ARCHIVO_LINEA_BASE)
+    p_comparar.add_argument("--resultados", help="Resultados ya medidos (por defecto se ejecuta la batería)")
+    p_comparar.add_argument("--tolerancia", type=float, default=0.25, help="Aumento relativo permitido en tiempos")
+    p_comparar.add_argument("--tolerancia-calidad", type=float, default=0.02,
+                            help="Caída absoluta permitida en métricas de calidad")
+
+    args = parser.parse_args()
+
+    if args.comando == "comparar":
+        if not os.path.exists(args.linea_base):
+            parser.error(f"No existe la línea base {args.linea_base} (créala con 'guardar')")
+        with open(args.linea_base, encoding="utf-8") as f:
+            linea_base = json.load(f)
+        if args.resultados:
+            with open(args.resultados, encoding="utf-8") as f:
+                actual = json.load(f)
+        else:
+            actual = ejecutar_bateria(args.repeticiones, args.embeddings_hash, args.con_llm, args.dataset)
+        comparacion = comparar(linea_base, actual, args.tolerancia, args.tolerancia_calidad)
+        imprimir_comparacion(comparacion, linea_base, actual, args.tolerancia, args.tolerancia_calidad)
+        sys.exit(1 if comparacion["regresiones"] else 0)
+
+    resultados = ejecutar_bateria(args.repeticiones, args.embeddings_hash, args.con_llm, args.dataset)
+    if args.comando == "guardar":
+        _guardar(resultados, args.linea_base)
+        print(f"\n💾 Línea base guardada en {args.linea_base} ({len(resultados['metricas'])} métricas)")
+    else:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+        if args.salida:
+            _guardar(resultados, args.salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Compuerta de relevancia: decide, antes de llamar al LLM, si los fragmentos
+recuperados pueden responder la pregunta.
+
+Usa tres señales baratas de la recuperación:
+    - similitud del mejor fragmento
+    - brecha entre el mejor fragmento y la media del resto
+    - solapamiento léxico entre la pregunta y los fragmentos
+
+Si ninguna supera su umbral, la pregunta se considera fuera de tema y se
+responde al instante con el mensaje de "no tengo información", sin pagar una
+generación completa para obtener esa misma frase. Los umbrales se calibran
+con el dataset de evaluación (preguntas que sí se pueden responder) y un
+conjunto de preguntas fuera de tema.
+
+Uso:
+    python relevancia.py [--dataset dataset_evaluacion.json] [--persist-directory ./chroma_db]
+"""
+
+import argparse
+import json
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+NOMBRE_ARCHIVO = "relevancia.json"
+
+# Preguntas que los documentos de un curso no deberían poder responder
+PREGUNTAS_FUERA_DE_TEMA = [
+    "¿Cuál es la capital de Francia?",
+    "¿Quién ganó el mundial de fútbol de 2022?",
+    "Dame una receta de ceviche",
+    "¿Cómo cambio la llanta de un auto?",
+    "¿Qué tiempo hará mañana en Lima?",
+    "Recomiéndame una película de terror",
+    "¿Cuántos años tiene el presidente?",
+    "¿Cómo se juega al ajedrez?",
+]
+
+_PALABRAS_VACIAS = {
+    "como", "cual", "cuales", "cuando", "donde", "para", "pero", "porque", "que", "quien", "quienes",
+    "sobre", "este", "esta", "estos", "estas", "esto", "entre", "desde", "hasta", "tiene", "tienen",
+    "puede", "pueden", "hace", "hacer", "usar", "funciona", "explica", "explicame", "dame", "dime",
+    "cuanto", "cuantos", "cuantas", "todo", "todos", "otra", "otro", "muy", "mas", "menos", "son",
+    "ser", "una", "uno", "unos", "unas", "los", "las", "del", "con", "por", "sin", "hay", "eso",
+}
+
+
+def _sin_tildes(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+
+
+def palabras_clave(texto: str, largo_raiz: int = 6) -> set:
+    """
+    Raíces (prefijos) de las palabras con contenido de un texto
+    """
+    palabras = re.findall(r"\w+", _sin_tildes(texto.lower()))
+    return {p[:largo_raiz] for p in palabras if len(p) >= 3 and p not in _PALABRAS_VACIAS and not p.isdigit()}
+
+
+class CompuertaRelevancia:
+    """
+    Umbrales de similitud, brecha y solapamiento léxico
+    """
+
+    def __init__(self, umbral_similitud: float = 0.35, umbral_brecha: float = 0.15,
+                 umbral_solapamiento: float = 0.5):
+        """
+        Args:
+            umbral_similitud: Similitud coseno mínima del mejor fragmento
+            umbral_brecha: Ventaja mínima del mejor fragmento sobre la media del resto
+            umbral_solapamiento: Fracción mínima de palabras clave de la pregunta presentes en los fragmentos
+        """
+        self.umbral_similitud = umbral_similitud
+        self.umbral_brecha = umbral_brecha
+        self.umbral_solapamiento = umbral_solapamiento
+
+    @staticmethod
+    def senales(pregunta: str, recuperados) -> Dict:
+        """
+        Calcula las señales de relevancia de una recuperación
+
+        Args:
+            pregunta: Pregunta del estudiante
+            recuperados: Lista de Recuperado ordenada por puntaje
+
+        Returns:
+            dict con 'similitud', 'brecha' y 'solapamiento' (None si la pregunta no tiene palabras clave)
+        """
+        puntajes = np.array([r.puntaje for r in recuperados], dtype=float)
+        clave = palabras_clave(pregunta)
+        solapamiento = None
+        if clave:
+            en_fragmentos = set().union(*(palabras_clave(r.documento.page_content) for r in recuperados))
+            solapamiento = len(clave & en_fragmentos) / len(clave)
+        return {
+            "similitud": float(puntajes[0]) if puntajes.size else 0.0,
+            "brecha": float(puntajes[0] - puntajes[1:].mean()) if puntajes.size > 1 else 0.0,
+            "solapamiento": solapamiento,
+        }
+
+    def evaluar(self, pregunta: str, recuperados) -> Dict:
+        """
+        Señales de la recuperación y la decisión
+
+        Returns:
+            dict de senales() más 'relevante' (bool)
+        """
+        senales = self.senales(pregunta, recuperados)
+        senales["relevante"] = bool(recuperados) and self._relevante(senales)
+        return senales
+
+    def _relevante(self, senales: Dict) -> bool:
+        # Basta con una señal: saltarse una pregunta respondible es peor que generar de más
+        return (
+            senales["similitud"] >= self.umbral_similitud
+            or senales["brecha"] >= self.umbral_brecha
+            or (senales["solapamiento"] is not None and senales["solapamiento"] >= self.umbral_solapamiento)
+        )
+
+    def a_dict(self) -> Dict:
+        return {
+            "umbral_similitud": self.umbral_similitud,
+            "umbral_brecha": self.umbral_brecha,
+            "umbral_solapamiento": self.umbral_solapamiento,
+        }
+
+    def guardar(self, ruta: str, calibracion: Optional[Dict] = None):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({**self.a_dict(), "calibracion": calibracion or {}}, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> Optional["CompuertaRelevancia"]:
+        """
+        Carga umbrales calibrados (None si el archivo no existe o no es válido)
+        """
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                datos = json.load(f)
+            return cls(datos["umbral_similitud"], datos["umbral_brecha"], datos["umbral_solapamiento"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def calibrar(asistente, dataset: List[Dict], fuera_de_tema: Optional[List[str]] = None,
+             margen: float = 0.02) -> Tuple[CompuertaRelevancia, Dict]:
+    """
+    Calibra los umbrales con preguntas respondibles y preguntas fuera de tema
+
+    Cada umbral se coloca entre lo que alcanzan las preguntas fuera de tema y
+    las respondibles (o justo por encima de las primeras si las clases se
+    solapan en esa señal). Si con eso alguna pregunta del dataset quedaría bloqueada,
+    se baja el umbral de similitud hasta dejarla pasar: nunca se sacrifica
+    una pregunta respondible.
+
+    Args:
+        asistente: AsistenteAcademico con documentos cargados
+        dataset: Elementos con 'pregunta' (los que tienen 'fuera_de_tema': true cuentan como negativos)
+        fuera_de_tema: Preguntas negativas adicionales (por defecto PREGUNTAS_FUERA_DE_TEMA)
+        margen: Holgura sobre el máximo de los negativos
+
+    Returns:
+        (compuerta, resumen de la calibración)
+    """
+    positivas = [item["pregunta"] for item in dataset if not item.get("fuera_de_tema")]
+    negativas = [item["pregunta"] for item in dataset if item.get("fuera_de_tema")]
+    negativas += PREGUNTAS_FUERA_DE_TEMA if fuera_de_tema is None else fuera_de_tema
+    if not positivas or not negativas:
+        raise ValueError("Se necesitan preguntas respondibles y preguntas fuera de tema para calibrar")
+
+    recuperaciones = asistente.buscar_lote(positivas + negativas)
+    senales = [CompuertaRelevancia.senales(p, r) for p, r in zip(positivas + negativas, recuperaciones)]
+    pos, neg = senales[:len(positivas)], senales[len(positivas):]
+
+    def extremo(lista, clave, funcion):
+        valores = [s[clave] for s in lista if s[clave] is not None]
+        return funcion(valores) if valores else None
+
+    def umbral(clave):
+        # A mitad de camino si las clases se separan; si no, justo encima de los negativos
+        techo_negativas = extremo(neg, clave, max) or 0.0
+        piso_positivas = extremo(pos, clave, min)
+        if piso_positivas is not None and piso_positivas > techo_negativas:
+            return round((piso_positivas + techo_negativas) / 2, 4)
+        return round(techo_negativas + margen, 4)
+
+    compuerta = CompuertaRelevancia(
+        umbral_similitud=umbral("similitud"),
+        umbral_brecha=umbral("brecha"),
+        umbral_solapamiento=min(1.0, umbral("solapamiento")),
+    )
+    bloqueadas = [s for s in pos if not compuerta._relevante(s)]
+    if bloqueadas:
+        compuerta.umbral_similitud = round(min(s["similitud"] for s in bloqueadas) - margen, 4)
+
+    resumen = {
+        "positivas": len(pos),
+        "negativas": len(neg),
+        "positivas_aceptadas": sum(compuerta._relevante(s) for s in pos),
+        "negativas_bloqueadas": sum(not compuerta._relevante(s) for s in neg),
+        "similitud_positivas_min": round(min(s["similitud"] for s in pos), 4),
+        "similitud_negativas_max": round(extremo(neg, "similitud", max), 4),
+    }
+    return compuerta, resumen
+
+
+def main():
+    from asistente import AsistenteAcademico
+
+    parser = argparse.ArgumentParser(description="Calibra la compuerta de relevancia")
+    parser.add_argument("--dataset", default="dataset_evaluacion.json")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--margen", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with open(args.dataset, encoding="utf-8") as f:
+        dataset = json.load(f)
+
+    asistente = AsistenteAcademico(persist_directory=args.persist_directory, filtrar_irrelevantes=False)
+    compuerta, resumen = calibrar(asistente, dataset, margen=args.margen)
+    ruta = os.path.join(args.persist_directory, NOMBRE_ARCHIVO)
+    compuerta.guardar(ruta, resumen)
+
+    print("\n🎯 Compuerta de relevancia calibrada")
+    for nombre, valor in compuerta.a_dict().items():
+        print(f"   {nombre}: {valor:.4f}")
+    print(f"   Respondibles aceptadas: {resumen['positivas_aceptadas']}/{resumen['positivas']}")
+    print(f"   Fuera de tema bloqueadas: {resumen['negativas_bloqueadas']}/{resumen['negativas']}")
+    print(f"💾 Guardada en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+"""
+Servidor HTTP de consultas sobre AsistenteAcademico (asyncio, sin dependencias extra).
+
+Permite que otros clientes (plugin del LMS, bots) usen el mismo motor que la
+interfaz de Streamlit. Endpoints:
+
+    GET  /salud                  Estado del servicio
+    GET  /memoria                Memoria del proceso por componente (ver memoria.py)
+    POST /consulta               {"pregunta", "colecciones"?, "filtros"?, "k"?, "ef"?, "prioridad"?, "plazo"?}
+    POST /consulta/stream        Igual, pero la respuesta llega como NDJSON por partes
+    POST /ingesta                {"rutas", "coleccion"?, "etiquetas"?, "reemplazar"?} -> trabajo
+    GET  /ingesta/<id>           Estado de un trabajo de ingesta
+
+Las consultas que llegan dentro de una ventana corta se agrupan: los
+embeddings de todas las preguntas se calculan en un solo lote y cada
+colección recibe una única búsqueda. Las generaciones pasan por el
+planificador del asistente (concurrencia máxima, prioridad interactiva
+sobre lote y plazo por petición; ver planificador.py): si no se pueden
+atender a tiempo se devuelven solo las fuentes con "degradada": true. Las
+consultas idénticas que se solapan en el tiempo comparten una sola
+generación (ver coalescencia.py).
+
+Uso:
+    python servidor.py [--puerto 8000] [--trabajadores 4] [--ventana-ms 10]
+                       [--ollama-url URL ...] [--stub-llm [N] | --llm-falso]
+                       [--modo-embeddings fp32|int8|onnx] [--hilos-embeddings N]
+                       [--cpus-embeddings 0-3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from asistente import MENSAJE_SATURADO, PERFIL_HARDWARE, RESPUESTA_SIN_INFORMACION, AsistenteAcademico
+from coalescencia import CoalescedorAsync
+from colecciones import FILTROS_VALIDOS
+from embeddings_cpu import MODOS as MODOS_EMBEDDINGS, parsear_cpus
+from ingesta import ColaIngesta
+from planificador import INTERACTIVA, PRIORIDADES, PlanificadorGeneraciones, RechazoGeneracion
+from top_k_adaptativo import tokens_estimados
+
+MAX_CUERPO = 1 << 20  # 1 MB
+_FIN_STREAM = object()
+
+_ESTADOS_HTTP = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+                 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def serializar_fuentes(recuperados) -> List[Dict]:
+    """
+    Fuentes en formato JSON (ubicación, puntaje y un extracto del fragmento)
+    """
+    return [
+        {
+            "id": r.id,
+            "coleccion": r.coleccion,
+            "source": os.path.basename(str(r.documento.metadata.get("source", "Desconocido"))),
+            "page": r.documento.metadata.get("page", "?"),
+            "puntaje": round(r.puntaje, 4),
+            "fragmento": r.documento.page_content[:300],
+        }
+        for r in recuperados
+    ]
+
+
+class LoteadorBusquedas:
+    """
+    Agrupa búsquedas concurrentes en lotes (embeddings + recuperación)
+    """
+
+    def __init__(self, asistente: AsistenteAcademico, ventana: float = 0.01, max_lote: int = 32):
+        """
+        Args:
+            asistente: Asistente cuyas colecciones se consultan
+            ventana: Segundos que se espera a más peticiones antes de procesar un lote
+            max_lote: Tamaño con el que un lote se procesa sin esperar la ventana
+        """
+        self.asistente = asistente
+        self.ventana = ventana
+        self.max_lote = max_lote
+        self._pendientes: List[Tuple[Tuple, str, asyncio.Future]] = []
+        self._temporizador: Optional[asyncio.TimerHandle] = None
+        # Referencias a los lotes en curso (el loop solo guarda referencias débiles a las tareas)
+        self._tareas: Set[asyncio.Task] = set()
+        # Un solo hilo: los lotes de embeddings se ejecutan de uno en uno
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lotes")
+        self.lotes = 0
+        self.consultas = 0
+
+    async def buscar(self, pregunta: str, colecciones=None, k: Optional[int] = None,
+                     filtros: Optional[Dict] = None, ef: Optional[int] = None):
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        clave = (json.dumps(colecciones), k, json.dumps(filtros, sort_keys=True), ef)
+        self._pendientes.append((clave, pregunta, futuro))
+
+        if len(self._pendientes) >= self.max_lote:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.ventana, self._despachar)
+        return await futuro
+
+    def _despachar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        pendientes, self._pendientes = self._pendientes, []
+        if pendientes:
+            tarea = asyncio.get_running_loop().create_task(self._procesar(pendientes))
+            self._tareas.add(tarea)
+            tarea.add_done_callback(self._tareas.discard)
+
+    async def _procesar(self, pendientes):
+        loop = asyncio.get_running_loop()
+        grupos: Dict[Tuple, List] = {}
+        for clave, pregunta, futuro in pendientes:
+            grupos.setdefault(clave, []).append((pregunta, futuro))
+
+        self.lotes += 1
+        self.consultas += len(pendientes)
+        for (colecciones, k, filtros, ef), items in grupos.items():
+            try:
+                resultados = await loop.run_in_executor(
+                    self._ejecutor, self.asistente.buscar_lote,
+                    [pregunta for pregunta, _ in items], json.loads(colecciones), k, json.loads(filtros), ef,
+                )
+            except Exception as e:
+                for _, futuro in items:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            for (_, futuro), recuperados in zip(items, resultados):
+                if not futuro.done():
+                    futuro.set_result(recuperados)
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=False)
+
+
+class ServidorAsistente:
+    """
+    Servidor HTTP asyncio delante de un AsistenteAcademico
+    """
+
+    def __init__(self, asistente: AsistenteAcademico, cola_ingesta: Optional[ColaIngesta] = None,
+                 host: str = "127.0.0.1", puerto: int = 8000, trabajadores: Optional[int] = None,
+                 ventana_lote_ms: float = 10.0, max_lote: int = 32):
+        """
+        Args:
+            asistente: Motor de consultas
+            cola_ingesta: Cola para /ingesta (se crea una si no se pasa)
+            host: Interfaz donde escuchar
+            puerto: Puerto (0 = uno libre)
+            trabajadores: Generaciones simultáneas con el LLM; si se pasa, se aplica al
+                planificador del asistente (por defecto se respeta el que ya tiene)
+            ventana_lote_ms: Ventana de agrupación de búsquedas
+            max_lote: Máximo de búsquedas por lote
+        """
+        self.asistente = asistente
+        self.cola_ingesta = cola_ingesta or ColaIngesta(num_trabajadores=1)
+        self.host = host
+        self.puerto = puerto
+        self.loteador = LoteadorBusquedas(asistente, ventana_lote_ms / 1000.0, max_lote)
+        self.planificador = asistente.planificador
+        if trabajadores is not None:
+            self.planificador.max_concurrencia = trabajadores
+        self.trabajadores = self.planificador.max_concurrencia
+        # Las peticiones esperan su turno dentro del planificador (donde rige la
+        # prioridad), no en la cola FIFO del pool: hay un hilo por cada hueco y
+        # por cada puesto de la cola
+        self._generadores = ThreadPoolExecutor(
+            max_workers=self.trabajadores + self.planificador.max_cola,
+            thread_name_prefix="generacion",
+        )
+        self.coalescedor = CoalescedorAsync()
+        self._servidor: Optional[asyncio.AbstractServer] = None
+
+    # ---------- ciclo de vida ----------
+
+    async def iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        print(f"🌐 Servidor escuchando en http://{self.host}:{self.puerto} ({self.trabajadores} trabajadores)")
+
+    async def detener(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        self.loteador.cerrar()
+        self._generadores.shutdown(wait=False)
+
+    async def servir(self):
+        await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    # ---------- HTTP ----------
+
+    async def _leer_peticion(self, reader: asyncio.StreamReader):
+        linea = (await reader.readline()).decode("latin-1").strip()
+        if not linea:
+            return None
+        try:
+            metodo, ruta, _ = linea.split(" ", 2)
+        except ValueError:
+            raise ErrorHTTP(400, "Línea de petición no válida")
+
+        cabeceras = {}
+        while True:
+            linea = (await reader.readline()).decode("latin-1").strip()
+            if not linea:
+                break
+            nombre, _, valor = linea.partition(":")
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        longitud = int(cabeceras.get("content-length", 0))
+        if longitud > MAX_CUERPO:
+            raise ErrorHTTP(413, "Cuerpo demasiado grande")
+        cuerpo = await reader.readexactly(longitud) if longitud else b""
+        return metodo.upper(), ruta.split("?", 1)[0], cuerpo
+
+    @staticmethod
+    def _cabecera(estado: int, tipo: str, extra: str = "") -> bytes:
+        return (
+            f"HTTP/1.1 {estado} {_ESTADOS_HTTP.get(estado, '')}\r\n"
+            f"Content-Type: {tipo}\r\nConnection: close\r\n{extra}\r\n"
+        ).encode("latin-1")
+
+    async def _responder_json(self, writer: asyncio.StreamWriter, datos: Dict, estado: int = 200):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        writer.write(self._cabecera(estado, "application/json; charset=utf-8", f"Content-Length: {len(cuerpo)}\r\n"))
+        writer.write(cuerpo)
+        await writer.drain()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            peticion = await self._leer_peticion(reader)
+            if peticion is not None:
+                await self._enrutar(*peticion, writer)
+        except ErrorHTTP as e:
+            await self._responder_json(writer, {"error": str(e)}, e.estado)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            traceback.print_exc()
+            await self._responder_json(writer, {"error": str(e)}, 500)
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _enrutar(self, metodo: str, ruta: str, cuerpo: bytes, writer: asyncio.StreamWriter):
+        if ruta == "/salud":
+            self._exigir_metodo(metodo, "GET")
+            await self._responder_json(writer, self.salud())
+        elif ruta == "/memoria":
+            self._exigir_metodo(metodo, "GET")
+            await self._responder_json(writer, await asyncio.get_running_loop().run_in_executor(None, self.memoria))
+        elif ruta in ("/consulta", "/consulta/stream"):
+            self._exigir_metodo(metodo, "POST")
+            datos = self._json(cuerpo)
+            if ruta == "/consulta":
+                await self._responder_json(writer, await self.consultar(datos))
+            else:
+                await self._consultar_stream(datos, writer)
+        elif ruta == "/ingesta":
+            self._exigir_metodo(metodo, "POST")
+            await self._responder_json(writer, self.ingerir(self._json(cuerpo)), 202)
+        elif ruta.startswith("/ingesta/"):
+            self._exigir_metodo(metodo, "GET")
+            estado = self.cola_ingesta.estado(ruta[len("/ingesta/"):])
+            if estado is None:
+                raise ErrorHTTP(404, "Trabajo no encontrado")
+            await self._responder_json(writer, estado)
+        else:
+            raise ErrorHTTP(404, "Ruta no encontrada")
+
+    @staticmethod
+    def _exigir_metodo(metodo: str, esperado: str):
+        if metodo != esperado:
+            raise ErrorHTTP(405, f"Usa {esperado}")
+
+    @staticmethod
+    def _json(cuerpo: bytes) -> Dict:
+        try:
+            datos = json.loads(cuerpo or b"{}")
+        except ValueError:
+            raise ErrorHTTP(400, "JSON no válido")
+        if not isinstance(datos, dict):
+            raise ErrorHTTP(400, "Se esperaba un objeto JSON")
+        return datos
+
+    # ---------- endpoints ----------
+
+    def salud(self) -> Dict:
+        return {
+            "estado": "ok",
+            "modelo": self.asistente.modelo_llama,
+            "colecciones": self.asistente.colecciones.nombres(),
+            "residentes": self.asistente.colecciones.residentes(),
+            "ingestas_pendientes": self.cola_ingesta.pendientes,
+            "trabajadores": self.trabajadores,
+            "lotes": self.loteador.lotes,
+            "consultas_en_lotes": self.loteador.consultas,
+            "coalescencia": self.coalescedor.estadisticas(),
+            "planificador": self.planificador.metricas(),
+            "llm": self.asistente.llm.estadisticas(),
+        }
+
+    def memoria(self) -> Dict:
+        return self.asistente.reporte_memoria(caches={"coalescencia_servidor": self.coalescedor})
+
+    @staticmethod
+    def _k(datos: Dict) -> Optional[int]:
+        k = datos.get("k")
+        if k is not None and (not isinstance(k, int) or isinstance(k, bool) or k < 1):
+            raise ErrorHTTP(400, "'k' debe ser un entero positivo")
+        return k
+
+    @staticmethod
+    def _filtros(datos: Dict) -> Optional[Dict]:
+        filtros = datos.get("filtros")
+        if filtros is None:
+            return None
+        if not isinstance(filtros, dict):
+            raise ErrorHTTP(400, "'filtros' debe ser un objeto JSON")
+        desconocidos = set(filtros) - set(FILTROS_VALIDOS)
+        if desconocidos:
+            raise ErrorHTTP(400, f"Filtros no soportados: {sorted(desconocidos)} (válidos: {list(FILTROS_VALIDOS)})")
+        if any(valor is not None and not isinstance(valor, list) for valor in filtros.values()):
+            raise ErrorHTTP(400, "Cada filtro debe ser una lista")
+        return filtros
+
+    @staticmethod
+    def _pregunta(datos: Dict) -> str:
+        pregunta = (datos.get("pregunta") or "").strip()
+        if not pregunta:
+            raise ErrorHTTP(400, "Falta 'pregunta'")
+        return pregunta
+
+    @staticmethod
+    def _prioridad(datos: Dict) -> Tuple[str, Optional[float]]:
+        prioridad = datos.get("prioridad") or INTERACTIVA
+        if prioridad not in PRIORIDADES:
+            raise ErrorHTTP(400, f"Prioridad desconocida: {prioridad} (opciones: {sorted(PRIORIDADES)})")
+        plazo = datos.get("plazo")
+        if plazo is not None and (not isinstance(plazo, (int, float)) or plazo <= 0):
+            raise ErrorHTTP(400, "'plazo' debe ser un número de segundos positivo")
+        return prioridad, plazo
+
+    @staticmethod
+    def _ef(datos: Dict) -> Optional[int]:
+        ef = datos.get("ef")
+        if ef is not None and (not isinstance(ef, int) or isinstance(ef, bool) or ef < 1):
+            raise ErrorHTTP(400, "'ef' debe ser un entero positivo")
+        return ef
+
+    def _clave(self, pregunta: str, datos: Dict) -> str:
+        try:
+            return self.asistente.clave_consulta(
+                pregunta, datos.get("colecciones"), self._filtros(datos), self._k(datos), self._prioridad(datos)[0],
+                self._ef(datos),
+            )
+        except ValueError as e:
+            # Colección desconocida: es un error de la petición, no del servidor
+            raise ErrorHTTP(400, str(e))
+
+    async def _recuperar(self, pregunta: str, datos: Dict):
+        """
+        Candidatos de la búsqueda y los que se envían al LLM
+
+        Con "k" en la petición se usan exactamente k fragmentos; si no, los
+        que elija el asistente (top-k fijo o adaptativo).
+
+        Returns:
+            (candidatos, elegidos, dict de la selección de k)
+        """
+        try:
+            candidatos = await self.loteador.buscar(
+                pregunta, datos.get("colecciones"), self._k(datos) or self.asistente.k_busqueda,
+                self._filtros(datos), self._ef(datos),
+            )
+        except ValueError as e:
+            raise ErrorHTTP(400, str(e))
+        if self._k(datos):
+            tokens = sum(tokens_estimados(r.documento.page_content) for r in candidatos)
+            return candidatos, candidatos, {"k": len(candidatos), "candidatos": len(candidatos),
+                                            "motivo": "fijo", "tokens": tokens}
+        return (candidatos, *self.asistente.seleccionar_fragmentos(candidatos))
+
+    async def consultar(self, datos: Dict) -> Dict:
+        pregunta = self._pregunta(datos)
+        return await self.coalescedor.ejecutar(
+            self._clave(pregunta, datos), lambda: self._consultar(pregunta, datos)
+        )
+
+    async def _consultar(self, pregunta: str, datos: Dict) -> Dict:
+        candidatos, recuperados, seleccion = await self._recuperar(pregunta, datos)
+        if not recuperados:
+            return {"respuesta": "❌ Primero debes cargar documentos", "fuentes": [], "seleccion_k": seleccion}
+
+        relevancia = self.asistente.evaluar_relevancia(pregunta, candidatos[:self.asistente.top_k])
+        if relevancia is not None and not relevancia["relevante"]:
+            return {"respuesta": RESPUESTA_SIN_INFORMACION, "fuentes": serializar_fuentes(recuperados),
+                    "seleccion_k": seleccion, "sin_generacion": True, "relevancia": relevancia}
+
+        loop = asyncio.get_running_loop()
+        contexto, compresion = await loop.run_in_executor(
+            None, self.asistente.comprimir_fuentes, pregunta, [r.documento for r in recuperados]
+        )
+        try:
+            respuesta = await loop.run_in_executor(
+                self._generadores, self.asistente.generar, pregunta, contexto, *self._prioridad(datos),
+            )
+        except RechazoGeneracion as e:
+            return {"respuesta": MENSAJE_SATURADO, "fuentes": serializar_fuentes(recuperados),
+                    "seleccion_k": seleccion, "compresion": compresion, "degradada": True, "motivo": e.motivo}
+        return {"respuesta": respuesta, "fuentes": serializar_fuentes(recuperados), "seleccion_k": seleccion,
+                "compresion": compresion}
+
+    async def _eventos_consulta(self, pregunta: str, datos: Dict):
+        """
+        Eventos de una consulta en streaming: fuentes, tokens y fin
+        """
+        candidatos, recuperados, seleccion = await self._recuperar(pregunta, datos)
+        yield {"fuentes": serializar_fuentes(recuperados), "seleccion_k": seleccion}
+        relevancia = self.asistente.evaluar_relevancia(pregunta, candidatos[:self.asistente.top_k]) if recuperados else None
+        if not recuperados:
+            yield {"token": "❌ Primero debes cargar documentos"}
+        elif relevancia is not None and not relevancia["relevante"]:
+            yield {"token": RESPUESTA_SIN_INFORMACION, "sin_generacion": True}
+        else:
+            contexto, compresion = await asyncio.get_running_loop().run_in_executor(
+                None, self.asistente.comprimir_fuentes, pregunta, [r.documento for r in recuperados]
+            )
+            if compresion is not None:
+                yield {"compresion": compresion}
+            try:
+                async for parte in self._partes_generadas(pregunta, contexto, *self._prioridad(datos)):
+                    yield {"token": parte}
+            except RechazoGeneracion as e:
+                yield {"token": MENSAJE_SATURADO, "degradada": True, "motivo": e.motivo}
+        yield {"fin": True}
+
+    async def _consultar_stream(self, datos: Dict, writer: asyncio.StreamWriter):
+        pregunta = self._pregunta(datos)
+        eventos = self.coalescedor.ejecutar_stream(
+            self._clave(pregunta, datos), lambda: self._eventos_consulta(pregunta, datos)
+        )
+        # El primer evento llega después de la búsqueda: los errores de la
+        # petición todavía pueden responderse con un código HTTP
+        primero = await eventos.__anext__()
+
+        writer.write(self._cabecera(200, "application/x-ndjson; charset=utf-8", "Transfer-Encoding: chunked\r\n"))
+
+        async def enviar(objeto: Dict):
+            linea = (json.dumps(objeto, ensure_ascii=False) + "\n").encode("utf-8")
+            writer.write(f"{len(linea):x}\r\n".encode() + linea + b"\r\n")
+            await writer.drain()
+
+        await enviar(primero)
+        async for evento in eventos:
+            await enviar(evento)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _partes_generadas(self, pregunta: str, fuentes, prioridad: str = INTERACTIVA,
+                                plazo: Optional[float] = None):
+        """
+        Ejecuta el generador bloqueante en el pool y entrega sus partes al loop
+        """
+        loop = asyncio.get_running_loop()
+        cola: asyncio.Queue = asyncio.Queue()
+
+        def producir():
+            try:
+                for parte in self.asistente.generar_stream(pregunta, fuentes, prioridad, plazo):
+                    loop.call_soon_threadsafe(cola.put_nowait, parte)
+            except Exception as e:
+                loop.call_soon_threadsafe(cola.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(cola.put_nowait, _FIN_STREAM)
+
+        loop.run_in_executor(self._generadores, producir)
+        while True:
+            parte = await cola.get()
+            if parte is _FIN_STREAM:
+                return
+            if isinstance(parte, Exception):
+                raise parte
+            yield parte
+
+    def ingerir(self, datos: Dict) -> Dict:
+        rutas = datos.get("rutas")
+        if not rutas or not isinstance(rutas, list):
+            raise ErrorHTTP(400, "Falta 'rutas' (lista de PDFs en el servidor)")
+        faltantes = [r for r in rutas if not os.path.isfile(r)]
+        if faltantes:
+            raise ErrorHTTP(400, f"No existen: {faltantes}")
+        trabajo = self.cola_ingesta.encolar(
+            self.asistente, rutas,
+            reemplazar=bool(datos.get("reemplazar", False)),
+            coleccion=datos.get("coleccion"),
+            etiquetas=datos.get("etiquetas"),
+        )
+        return trabajo.resumen()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP del Asistente Académico RAG")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--trabajadores", type=int, default=None,
+                        help="Generaciones simultáneas (por defecto las del perfil de hardware, o 4)")
+    parser.add_argument("--max-cola", type=int, default=32, help="Generaciones en espera antes de rechazar")
+    parser.add_argument("--plazo", type=float, default=120.0, help="Plazo por defecto de las consultas interactivas (s)")
+    parser.add_argument("--ventana-ms", type=float, default=10.0, help="Ventana de agrupación de búsquedas")
+    parser.add_argument("--max-lote", type=int, default=32)
+    parser.add_argument("--modelo", default="llama2:7b")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--instantanea", action="append", default=[],
+                        help="Servir una colección desde una instantánea (repetible; ver instantanea.py)")
+    parser.add_argument("--ollama-url", action="append", default=[],
+                        help="Servidor Ollama (repetir para balancear entre varios)")
+    parser.add_argument("--stub-llm", type=int, nargs="?", const=1, default=0, metavar="N",
+                        help="Usar N Ollama falsos locales por HTTP (pruebas)")
+    parser.add_argument("--llm-falso", action="store_true", help="Usar el backend falso en proceso (pruebas)")
+    parser.add_argument("--modo-embeddings", choices=MODOS_EMBEDDINGS, default=None,
+                        help="Inferencia de embeddings en CPU (ver embeddings_cpu.py)")
+    parser.add_argument("--hilos-embeddings", type=int, default=None, help="Hilos de inferencia de los embeddings")
+    parser.add_argument("--cpus-embeddings", type=parsear_cpus, default=None, metavar="LISTA",
+                        help="Núcleos a los que fijar el proceso, p. ej. 0-3,6 (solo Linux)")
+    args = parser.parse_args()
+    if args.trabajadores is None:
+        args.trabajadores = PERFIL_HARDWARE.max_concurrencia if PERFIL_HARDWARE else 4
+
+    opciones = {
+        "modo_embeddings": args.modo_embeddings,
+        "hilos_embeddings": args.hilos_embeddings,
+        "cpus_embeddings": args.cpus_embeddings,
+        "planificador": PlanificadorGeneraciones(
+            max_concurrencia=args.trabajadores, max_cola=args.max_cola, plazos={INTERACTIVA: args.plazo}
+        ),
+    }
+    if args.llm_falso:
+        from backends_llm import BackendFalso
+
+        opciones["backend_llm"] = BackendFalso(args.modelo, tokens_por_segundo=50.0)
+    elif args.stub_llm:
+        from stub_ollama import ServidorOllamaFalso
+
+        falsos = [ServidorOllamaFalso(modelo=args.modelo).iniciar() for _ in range(args.stub_llm)]
+        opciones["base_url_ollama"] = [falso.url for falso in falsos]
+        print(f"🦙 Usando Ollama falso en {', '.join(opciones['base_url_ollama'])}")
+    elif args.ollama_url:
+        opciones["base_url_ollama"] = args.ollama_url
+
+    asistente = AsistenteAcademico(modelo_llama=args.modelo, persist_directory=args.persist_directory, **opciones)
+    for ruta in args.instantanea:
+        asistente.montar_instantanea(ruta)
+    # El planificador ya se creó con args.trabajadores
+    servidor = ServidorAsistente(
+        asistente, host=args.host, puerto=args.puerto, ventana_lote_ms=args.ventana_ms, max_lote=args.max_lote,
+    )
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        print("\n👋 Servidor detenido")
+
+
+if __name__ == "__main__":
+    main()
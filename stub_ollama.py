@@ -0,0 +1,173 @@
+"""
+Servidor HTTP que imita la API de Ollama (/api/generate, /api/tags) sin modelo.
+
+Sirve para probar y medir el servidor de consultas, la interfaz y los
+benchmarks en una máquina sin Ollama ni GPU. Las respuestas son
+deterministas y la latencia (prefill + tokens por segundo) es configurable.
+
+Uso:
+    python stub_ollama.py [--puerto 11435] [--tokens-por-segundo 50]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from backends_llm import respuesta_falsa
+
+
+class _ManejadorOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    servidor_falso: "ServidorOllamaFalso" = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _enviar_json(self, datos: Dict, estado: int = 200):
+        cuerpo = json.dumps(datos).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    @property
+    def _ruta(self) -> str:
+        # El cliente de LangChain llama a /api/generate/ (con barra final)
+        return self.path.rstrip("/")
+
+    def do_GET(self):
+        if self.servidor_falso.fallar:
+            self._enviar_json({"error": "fallo simulado"}, 503)
+        elif self._ruta == "/api/tags":
+            self._enviar_json({"models": [{"name": self.servidor_falso.modelo}]})
+        else:
+            self._enviar_json({"error": "no encontrado"}, 404)
+
+    def do_POST(self):
+        if self._ruta != "/api/generate":
+            self._enviar_json({"error": "no encontrado"}, 404)
+            return
+        longitud = int(self.headers.get("Content-Length", 0))
+        peticion = json.loads(self.rfile.read(longitud) or b"{}")
+        if self.servidor_falso.fallar:
+            self._enviar_json({"error": "fallo simulado"}, 503)
+            return
+        self.servidor_falso.peticiones += 1
+
+        falso = self.servidor_falso
+        prompt = peticion.get("prompt", "")
+        contexto = peticion.get("context") or []
+        # El prefill solo cobra los tokens nuevos (el contexto ya está procesado)
+        tokens_prompt = max(1, len(prompt) // 4)
+        time.sleep(tokens_prompt * falso.segundos_prefill_por_token)
+
+        tokens = respuesta_falsa(prompt, falso.tokens_respuesta)
+        final = {
+            "model": peticion.get("model", falso.modelo),
+            "done": True,
+            "context": list(contexto) + list(range(tokens_prompt + len(tokens))),
+            "prompt_eval_count": tokens_prompt,
+            "prompt_eval_duration": int(tokens_prompt * falso.segundos_prefill_por_token * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) / falso.tokens_por_segundo * 1e9),
+        }
+
+        if not peticion.get("stream", True):
+            time.sleep(len(tokens) / falso.tokens_por_segundo)
+            self._enviar_json({**final, "response": "".join(tokens)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(1.0 / falso.tokens_por_segundo)
+            self._escribir_trozo(json.dumps({"response": token, "done": False}) + "\n")
+        self._escribir_trozo(json.dumps({**final, "response": ""}) + "\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _escribir_trozo(self, texto: str):
+        datos = texto.encode("utf-8")
+        self.wfile.write(f"{len(datos):x}\r\n".encode() + datos + b"\r\n")
+        self.wfile.flush()
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clientes que cierran la conexión a mitad de respuesta no son un error del servidor
+        pass
+
+
+class ServidorOllamaFalso:
+    """
+    Ollama falso en un hilo de fondo
+    """
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0, modelo: str = "llama2:7b",
+                 tokens_respuesta: int = 20, tokens_por_segundo: float = 200.0,
+                 segundos_prefill_por_token: float = 0.0):
+        """
+        Args:
+            host: Interfaz donde escuchar
+            puerto: Puerto (0 = uno libre)
+            modelo: Nombre de modelo que se reporta en /api/tags
+            tokens_respuesta: Tokens de cada respuesta
+            tokens_por_segundo: Velocidad de generación simulada
+            segundos_prefill_por_token: Costo simulado de procesar el prompt
+        """
+        self.modelo = modelo
+        self.tokens_respuesta = tokens_respuesta
+        self.tokens_por_segundo = tokens_por_segundo
+        self.segundos_prefill_por_token = segundos_prefill_por_token
+        self.peticiones = 0
+        # True: responde 503 a todo (para probar la expulsión de nodos del pool)
+        self.fallar = False
+
+        manejador = type("Manejador", (_ManejadorOllama,), {"servidor_falso": self})
+        self._http = _ServidorHTTP((host, puerto), manejador)
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._http.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> "ServidorOllamaFalso":
+        self._hilo = threading.Thread(target=self._http.serve_forever, name="ollama-falso", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama falso para pruebas locales")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=11435)
+    parser.add_argument("--tokens-respuesta", type=int, default=20)
+    parser.add_argument("--tokens-por-segundo", type=float, default=200.0)
+    parser.add_argument("--prefill-por-token", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor = ServidorOllamaFalso(
+        args.host, args.puerto, tokens_respuesta=args.tokens_respuesta,
+        tokens_por_segundo=args.tokens_por_segundo, segundos_prefill_por_token=args.prefill_por_token,
+    )
+    print(f"🦙 Ollama falso escuchando en {servidor.url}")
+    try:
+        servidor._http.serve_forever()
+    except KeyboardInterrupt:
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
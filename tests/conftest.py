@@ -0,0 +1,75 @@
+"""
+Fixtures comunes: embeddings por hashing, LLM falso y PDFs de prueba
+
+Las pruebas no descargan modelos ni necesitan Ollama: los embeddings son los
+de regresion.EmbeddingsHash y las generaciones las hace BackendFalso (o el
+Ollama falso de stub_ollama.py en las pruebas del servidor).
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+PDF_BASE = os.path.join(RAIZ, "documentos", "RAG.pdf")
+PDF_OTRO = os.path.join(RAIZ, "Presentación.pdf")
+
+
+@pytest.fixture(autouse=True)
+def embeddings_hash():
+    """
+    Registra los embeddings por hashing bajo la configuración predeterminada
+    """
+    from asistente import registrar_embeddings
+    from regresion import EmbeddingsHash
+
+    embeddings = EmbeddingsHash(dimension=128)
+    registrar_embeddings(embeddings)
+    return embeddings
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    """
+    A.pdf y B.pdf: mismo texto, distintos bytes (dos fuentes que se deduplican)
+    """
+    if not os.path.isfile(PDF_BASE):
+        pytest.skip(f"Falta {PDF_BASE}")
+    a = tmp_path / "A.pdf"
+    b = tmp_path / "B.pdf"
+    shutil.copyfile(PDF_BASE, a)
+    with open(PDF_BASE, "rb") as f:
+        b.write_bytes(f.read() + b"\n% copia\n")
+    return str(a), str(b)
+
+
+@pytest.fixture
+def otro_pdf(tmp_path):
+    """
+    C.pdf: un documento con otro texto
+    """
+    if not os.path.isfile(PDF_OTRO):
+        pytest.skip(f"Falta {PDF_OTRO}")
+    c = tmp_path / "C.pdf"
+    shutil.copyfile(PDF_OTRO, c)
+    return str(c)
+
+
+@pytest.fixture
+def asistente(tmp_path):
+    """
+    Asistente sobre una base vacía en tmp_path, con el backend falso
+    """
+    from asistente import AsistenteAcademico
+    from backends_llm import BackendFalso
+
+    return AsistenteAcademico(
+        persist_directory=str(tmp_path / "db"),
+        backend_llm=BackendFalso(),
+        directorio_cache_paginas=None,
+        filtrar_irrelevantes=False,
+    )
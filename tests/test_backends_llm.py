@@ -0,0 +1,93 @@
+"""
+Backends de generación: BackendFalso y el pool de Ollama (expulsión y
+readmisión de nodos contra varios Ollama falsos)
+"""
+
+import pytest
+
+from backends_llm import BackendFalso, BackendPoolOllama, ErrorBackendLLM, Generacion, crear_backend
+from stub_ollama import ServidorOllamaFalso
+
+
+def test_backend_falso_es_determinista_y_contabiliza():
+    backend = crear_backend("falso", tokens_respuesta=5)
+    primera = backend.generar("¿Qué es RAG?")
+    assert primera.texto == backend.generar("¿Qué es RAG?").texto
+    assert primera.tokens_respuesta == 5
+
+    partes = list(backend.generar_stream("¿Qué es RAG?"))
+    assert isinstance(partes[-1], Generacion)
+    assert "".join(partes[:-1]) == primera.texto
+    assert backend.estadisticas()["llamadas"] == 3
+
+    with pytest.raises(ErrorBackendLLM):
+        BackendFalso(tasa_fallos=1.0).generar("¿Qué es RAG?")
+    with pytest.raises(ValueError):
+        crear_backend("inexistente")
+
+
+def test_consulta_con_backend_falso(asistente, pdfs):
+    asistente.cargar_documentos([pdfs[0]])
+    resultado = asistente.consultar("¿Qué es RAG?")
+    assert resultado["respuesta"] and resultado["fuentes"]
+    assert asistente._llm.estadisticas()["llamadas"] == 1
+
+
+@pytest.fixture
+def falsos():
+    servidores = [ServidorOllamaFalso(tokens_respuesta=3, tokens_por_segundo=1000.0).iniciar() for _ in range(3)]
+    yield servidores
+    for servidor in servidores:
+        servidor.detener()
+
+
+def _nodos(pool):
+    return {nodo["url"]: nodo for nodo in pool.estadisticas()["nodos"]}
+
+
+def test_expulsion_y_readmision(falsos):
+    caido, *sanos = falsos
+    assert len({s.url for s in falsos}) == 3
+    pool = BackendPoolOllama("llama2:7b", [s.url for s in falsos], max_fallos=2, tiempo_expulsion=0.0,
+                             intervalo_salud=0, reintentos=2)
+    caido.fallar = True
+
+    # Las llamadas que caen en el nodo caído se reintentan en otro
+    for _ in range(6):
+        assert pool.generar("¿Qué es RAG?").texto
+    nodo = _nodos(pool)[caido.url]
+    assert not nodo["sano"] and nodo["expulsiones"] == 1 and nodo["errores"] == 2
+    assert [e["evento"] for e in nodo["eventos"]] == ["expulsado"]
+
+    # Expulsado no recibe tráfico
+    for _ in range(4):
+        pool.generar("¿Qué es RAG?")
+    assert _nodos(pool)[caido.url]["llamadas"] == 2
+    assert all(_nodos(pool)[s.url]["sano"] for s in sanos)
+
+    # Mientras no responda sigue fuera; cuando vuelve, la salud lo readmite
+    pool.comprobar_salud()
+    assert not _nodos(pool)[caido.url]["sano"]
+    caido.fallar = False
+    pool.comprobar_salud()
+    nodo = _nodos(pool)[caido.url]
+    assert nodo["sano"] and nodo["readmisiones"] == 1
+    assert [e["evento"] for e in nodo["eventos"]] == ["expulsado", "readmitido"]
+
+    for _ in range(3):
+        pool.generar("¿Qué es RAG?")
+    assert caido.peticiones == 1
+
+
+def test_sin_nodos_sanos_falla_con_error_del_backend(falsos):
+    pool = BackendPoolOllama("llama2:7b", [s.url for s in falsos], max_fallos=1, intervalo_salud=0, reintentos=2)
+    for servidor in falsos:
+        servidor.fallar = True
+    with pytest.raises(ErrorBackendLLM):
+        pool.generar("¿Qué es RAG?")
+    assert [n["sano"] for n in pool.estadisticas()["nodos"]] == [False] * 3
+
+    # Con todos expulsados se prueba igualmente uno; si responde, vuelve al pool
+    falsos[0].fallar = False
+    assert pool.generar("¿Qué es RAG?").texto
+    assert _nodos(pool)[falsos[0].url]["readmisiones"] == 1
@@ -0,0 +1,53 @@
+"""
+Caché de páginas: blobs escritos y leídos página a página
+"""
+
+import glob
+import os
+
+from cache_paginas import CachePaginas
+from documentos_pdf import DocumentoPDF
+
+
+def _blobs(directorio):
+    return glob.glob(os.path.join(str(directorio), "*", "*"))
+
+
+def test_acierto_devuelve_las_mismas_paginas(tmp_path, pdfs):
+    cache = CachePaginas(str(tmp_path / "cache"))
+    extraidas = list(cache.iterar(DocumentoPDF(pdfs[0])))
+    cacheadas = list(cache.iterar(DocumentoPDF(pdfs[0])))
+
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+    assert [(p.page_content, p.metadata) for p in cacheadas] == [(p.page_content, p.metadata) for p in extraidas]
+
+
+def test_misma_clave_con_otro_nombre(tmp_path, pdfs):
+    cache = CachePaginas(str(tmp_path / "cache"))
+    documento = DocumentoPDF(pdfs[0])
+    cache.cargar(documento)
+
+    paginas = cache.obtener(cache.clave(documento.hash), source="otro.pdf")
+    assert paginas and {p.metadata["source"] for p in paginas} == {"otro.pdf"}
+
+
+def test_extraccion_abandonada_no_deja_blob(tmp_path, pdfs):
+    cache = CachePaginas(str(tmp_path / "cache"))
+    paginas = cache.iterar(DocumentoPDF(pdfs[0]))
+    next(paginas)
+    paginas.close()
+    assert _blobs(tmp_path / "cache") == []
+
+
+def test_blob_danado_se_vuelve_a_extraer(tmp_path, pdfs):
+    cache = CachePaginas(str(tmp_path / "cache"))
+    extraidas = cache.cargar(DocumentoPDF(pdfs[0]))
+    (blob,) = _blobs(tmp_path / "cache")
+    with open(blob, "rb") as f:
+        datos = f.read()
+    with open(blob, "wb") as f:
+        f.write(datos[: len(datos) // 2])
+
+    recuperadas = cache.cargar(DocumentoPDF(pdfs[0]))
+    assert [p.page_content for p in recuperadas] == [p.page_content for p in extraidas]
+    assert _blobs(tmp_path / "cache") == []
@@ -0,0 +1,124 @@
+"""
+Single-flight: llamadas iguales simultáneas comparten una sola ejecución
+"""
+
+import asyncio
+import threading
+import time
+
+from coalescencia import CoalescedorAsync, CoalescedorConsultas
+
+
+def _esperar(condicion, limite: float = 5.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "la condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+def test_hilos_comparten_una_ejecucion():
+    coalescedor = CoalescedorConsultas()
+    liberar = threading.Event()
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        liberar.wait(5)
+        return {"respuesta": "hola"}
+
+    resultados = []
+    hilos = [
+        threading.Thread(target=lambda: resultados.append(coalescedor.ejecutar("clave", calcular)))
+        for _ in range(8)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    _esperar(lambda: coalescedor.seguidores == 7)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert len(llamadas) == 1
+    assert len(resultados) == 8 and all(r is resultados[0] for r in resultados)
+    assert coalescedor.estadisticas() == {"en_curso": 0, "lideres": 1, "seguidores": 7, "tasa_coalescencia": 0.875}
+
+    # Terminado el vuelo, la misma clave vuelve a ejecutarse
+    coalescedor.ejecutar("clave", calcular)
+    assert len(llamadas) == 2
+
+
+def test_error_llega_a_todos():
+    coalescedor = CoalescedorConsultas()
+    liberar = threading.Event()
+    errores = []
+
+    def fallar():
+        liberar.wait(5)
+        raise RuntimeError("sin LLM")
+
+    def pedir():
+        try:
+            coalescedor.ejecutar("clave", fallar)
+        except RuntimeError as e:
+            errores.append(str(e))
+
+    hilos = [threading.Thread(target=pedir) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    _esperar(lambda: coalescedor.seguidores == 2)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert errores == ["sin LLM"] * 3
+
+
+def test_stream_async_compartido():
+    async def escenario():
+        coalescedor = CoalescedorAsync()
+        generadores = []
+
+        async def tokens():
+            generadores.append(1)
+            for i in range(5):
+                await asyncio.sleep(0.01)
+                yield f"t{i}"
+
+        async def consumir():
+            return [parte async for parte in coalescedor.ejecutar_stream("clave", tokens)]
+
+        resultados = await asyncio.gather(*(consumir() for _ in range(4)))
+        return generadores, resultados, coalescedor.estadisticas()
+
+    generadores, resultados, estadisticas = asyncio.run(escenario())
+    assert len(generadores) == 1
+    assert resultados == [["t0", "t1", "t2", "t3", "t4"]] * 4
+    assert estadisticas["en_curso"] == 0 and estadisticas["seguidores"] == 3
+
+
+def test_corrutina_async_compartida():
+    async def escenario():
+        coalescedor = CoalescedorAsync()
+        llamadas = []
+
+        async def calcular():
+            llamadas.append(1)
+            await asyncio.sleep(0.02)
+            return 42
+
+        resultados = await asyncio.gather(*(coalescedor.ejecutar("clave", calcular) for _ in range(5)))
+        return llamadas, resultados
+
+    llamadas, resultados = asyncio.run(escenario())
+    assert llamadas == [1] and resultados == [42] * 5
+
+
+
+def test_escritura_en_el_sitio_cambia_la_clave(asistente, pdfs):
+    a, b = pdfs
+    asistente.cargar_documentos([a])
+    antes = asistente.clave_consulta("¿Qué es RAG?")
+    assert asistente.clave_consulta("  ¿qué es RAG? ") == antes
+
+    # Agregar documentos no cambia la versión activa, pero sí la revisión
+    asistente.cargar_documentos([b])
+    assert asistente.clave_consulta("¿Qué es RAG?") != antes
@@ -0,0 +1,153 @@
+"""
+Colecciones por curso: ingesta, reemplazo y borrado con deduplicación entre
+fuentes, compactación, búsqueda filtrada y residencia en memoria
+"""
+
+import os
+import time
+
+from deduplicacion import referencias_de_metadata
+
+
+def _estado(asistente):
+    """
+    (fragmentos, fuentes citadas, fuentes del índice) de la colección predeterminada
+    """
+    coleccion = asistente.colecciones.obtener()
+    metadatas = coleccion.vectorstore._collection.get(include=["metadatas"])["metadatas"]
+    citadas = sorted({os.path.basename(r[0]) for m in metadatas for r in referencias_de_metadata(m)})
+    indice = sorted(os.path.basename(f) for f in coleccion.obtener_indice().fuentes)
+    return len(metadatas), citadas, indice
+
+
+def _fuentes(recuperados):
+    return {os.path.basename(r.documento.metadata["source"]) for r in recuperados}
+
+
+def test_fuentes_identicas_comparten_fragmentos(asistente, pdfs):
+    a, b = pdfs
+    asistente.cargar_documentos([a])
+    solo_a, _, _ = _estado(asistente)
+
+    asistente.cargar_documentos([a, b], reemplazar=True)
+    assert _estado(asistente) == (solo_a, ["A.pdf", "B.pdf"], ["A.pdf", "B.pdf"])
+
+
+def test_recarga_en_otra_carga_no_duplica(asistente, pdfs):
+    a, b = pdfs
+    asistente.cargar_documentos([a])
+    coleccion = asistente.colecciones.obtener()
+    solo_a, _, _ = _estado(asistente)
+    version = coleccion.version
+
+    # Agregar escribe en el sitio y compara con los fragmentos ya almacenados
+    asistente.cargar_documentos([b])
+    assert coleccion.version == version
+    assert _estado(asistente) == (solo_a, ["A.pdf", "B.pdf"], ["A.pdf", "B.pdf"])
+
+    # Volver a subir B reemplaza su versión anterior sin sumar fragmentos
+    asistente.cargar_documentos([b])
+    assert _estado(asistente) == (solo_a, ["A.pdf", "B.pdf"], ["A.pdf", "B.pdf"])
+
+
+def test_borrar_una_fuente_conserva_los_fragmentos_compartidos(asistente, pdfs):
+    a, b = pdfs
+    asistente.cargar_documentos([a, b])
+    total, _, _ = _estado(asistente)
+
+    asistente.eliminar_documentos(["B.pdf"])
+    assert _estado(asistente) == (total, ["A.pdf"], ["A.pdf"])
+    assert asistente.buscar("RAG", filtros={"fuentes": ["B.pdf"]}) == []
+    assert _fuentes(asistente.buscar("RAG", filtros={"fuentes": ["A.pdf"]})) == {"A.pdf"}
+
+    asistente.eliminar_documentos(["A.pdf"])
+    assert _estado(asistente) == (0, [], [])
+
+
+def test_busqueda_filtrada(asistente, pdfs):
+    a, _ = pdfs
+    asistente.cargar_documentos([a], etiquetas="lab")
+
+    recuperados = asistente.buscar("RAG", k=50)
+    paginas = {r.documento.metadata["page"] for r in recuperados}
+    assert len(paginas) > 1
+
+    pagina = min(paginas)
+    filtrados = asistente.buscar("RAG", k=50, filtros={"paginas": [pagina, pagina]})
+    assert filtrados
+    assert {r.documento.metadata["page"] for r in filtrados} == {pagina}
+
+    assert len(asistente.buscar("RAG", k=50, filtros={"etiquetas": ["lab"]})) == len(recuperados)
+    assert asistente.buscar("RAG", filtros={"etiquetas": ["otra"]}) == []
+
+    respuesta = asistente.consultar("RAG", filtros={"etiquetas": ["otra"]})
+    assert respuesta["fuentes"] == [] and respuesta["k"] == 0
+
+
+def test_nombres_de_curso_validos_para_chroma(asistente, pdfs):
+    import doctest
+
+    import colecciones
+
+    assert doctest.testmod(colecciones).failed == 0
+    asistente.cargar_documentos([pdfs[0]], coleccion="IA")
+    assert asistente.colecciones.obtener("IA").nombre == "curso-ia"
+    assert _fuentes(asistente.buscar("RAG", colecciones="IA")) == {"A.pdf"}
+
+
+def test_descargar_no_afecta_a_otra_sesion(tmp_path, pdfs):
+    from asistente import AsistenteAcademico
+
+    sesiones = [
+        AsistenteAcademico(persist_directory=str(tmp_path / "db"), directorio_cache_paginas=None)
+        for _ in range(2)
+    ]
+    sesiones[0].cargar_documentos([pdfs[0]])
+    assert _fuentes(sesiones[1].buscar("RAG")) == {"A.pdf"}
+
+    assert sesiones[0].colecciones.obtener().descargar()
+    assert not sesiones[0].colecciones.obtener().residente
+    assert _fuentes(sesiones[1].buscar("RAG")) == {"A.pdf"}
+    sesiones[1].cargar_documentos([pdfs[1]])
+    assert _estado(sesiones[1])[1:] == (["A.pdf", "B.pdf"], ["A.pdf", "B.pdf"])
+    # La sesión descargada vuelve a cargar la colección bajo demanda
+    assert _fuentes(sesiones[0].buscar("RAG")) == {"A.pdf"}
+
+
+def test_borrado_con_lapidas_y_compactacion(asistente, pdfs, otro_pdf):
+    a, _ = pdfs
+    asistente.cargar_documentos([a, otro_pdf])
+    coleccion = asistente.colecciones.obtener()
+    total, _, _ = _estado(asistente)
+    version = coleccion.version
+
+    # El borrado es en el sitio: misma versión, lápidas en el índice
+    quitados = coleccion.eliminar_fuentes(["C.pdf"], compactar=False)
+    indice = coleccion.obtener_indice()
+    assert quitados == len(indice.borrados) > 0
+    assert coleccion.version == version and indice.vivos == total - quitados
+    assert _estado(asistente) == (total - quitados, ["A.pdf"], ["A.pdf"])
+    assert _fuentes(asistente.buscar("RAG", k=50)) == {"A.pdf"}
+
+    # La compactación libera las lápidas en una versión nueva
+    assert coleccion.compactar()
+    assert coleccion.version > version and not coleccion.obtener_indice().borrados
+    assert _estado(asistente) == (total - quitados, ["A.pdf"], ["A.pdf"])
+    assert _fuentes(asistente.buscar("RAG", k=50)) == {"A.pdf"}
+    assert not coleccion.compactar()
+
+
+def test_compactacion_automatica_al_superar_el_umbral(asistente, pdfs, otro_pdf):
+    a, _ = pdfs
+    asistente.cargar_documentos([a, otro_pdf])
+    coleccion = asistente.colecciones.obtener()
+    version = coleccion.version
+    coleccion.umbral_compactacion = 0.01
+
+    asistente.eliminar_documentos(["C.pdf"])
+    fin = time.monotonic() + 30
+    while coleccion.version == version or coleccion._compactando:
+        assert time.monotonic() < fin, "la compactación no terminó a tiempo"
+        time.sleep(0.05)
+    assert not coleccion.obtener_indice().borrados
+    assert _fuentes(asistente.buscar("RAG", k=50)) == {"A.pdf"}
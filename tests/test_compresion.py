@@ -0,0 +1,73 @@
+"""
+Compresión del contexto: se conservan las oraciones relevantes y sus vecinas
+"""
+
+from langchain.schema import Document
+
+from compresion import SEPARADOR_OMITIDO, CompresorContexto, dividir_oraciones
+
+TEMAS = ("fotosíntesis", "mitocondria", "ribosoma", "membrana")
+
+FRAGMENTO = (
+    "La mitocondria produce la energía de la célula eucariota. "
+    "El ribosoma traduce el ARN mensajero en proteínas. "
+    "La fotosíntesis convierte la luz en energía química en los cloroplastos. "
+    "La membrana plasmática regula lo que entra y sale de la célula. "
+    "El ribosoma también puede estar unido al retículo endoplasmático."
+)
+
+
+class EmbeddingsTemas:
+    """
+    Un eje por tema: la similitud con la pregunta es alta solo si comparten tema
+    """
+
+    def __init__(self):
+        self.textos = []
+
+    def embed_documents(self, textos):
+        self.textos.extend(textos)
+        return [[1.0 if tema in texto.lower() else 0.0 for tema in TEMAS] + [0.1] for texto in textos]
+
+
+def test_dividir_oraciones():
+    texto = "1. Intro\nLa recupera-\nción aumenta el contexto del modelo. ¿Y la generación? Usa solo esos fragmentos."
+    assert dividir_oraciones(texto) == [
+        "1. Intro La recuperación aumenta el contexto del modelo.",
+        "¿Y la generación? Usa solo esos fragmentos.",
+    ]
+
+
+def test_conserva_la_oracion_relevante_y_su_vecindad():
+    pregunta = "¿Dónde ocurre la fotosíntesis?"
+    original = Document(page_content=FRAGMENTO, metadata={"source": "bio.pdf", "page": 2})
+    oraciones = dividir_oraciones(FRAGMENTO)
+
+    solo, info = CompresorContexto(umbral=0.5, vecindad=0).comprimir(pregunta, [original], EmbeddingsTemas())
+    assert solo[0].page_content == SEPARADOR_OMITIDO.lstrip() + oraciones[2] + SEPARADOR_OMITIDO.rstrip()
+    assert solo[0].metadata == original.metadata
+    assert (info["oraciones"], info["oraciones_conservadas"]) == (5, 1)
+    assert info["caracteres_comprimidos"] == len(solo[0].page_content) < info["caracteres_originales"]
+
+    con_vecinas, info = CompresorContexto(umbral=0.5, vecindad=1).comprimir(pregunta, [original], EmbeddingsTemas())
+    assert info["oraciones_conservadas"] == 3
+    assert " ".join(oraciones[1:4]) in con_vecinas[0].page_content
+
+    # Si todas las oraciones se conservan, el fragmento se envía tal cual
+    completo, _ = CompresorContexto(umbral=0.0).comprimir(pregunta, [original], EmbeddingsTemas())
+    assert completo[0] is original
+
+
+def test_min_oraciones_y_cache():
+    compresor = CompresorContexto(umbral=2.0, vecindad=0, min_oraciones=1)
+    embeddings = EmbeddingsTemas()
+    documento = Document(page_content=FRAGMENTO, metadata={})
+
+    # Nada llega al umbral: se conserva igualmente la mejor oración
+    comprimidos, info = compresor.comprimir("¿Qué es la fotosíntesis?", [documento], embeddings)
+    assert info["oraciones_conservadas"] == 1 and "fotosíntesis convierte" in comprimidos[0].page_content
+
+    # Las oraciones ya vistas no se vuelven a calcular: solo la pregunta nueva
+    embeddings.textos.clear()
+    compresor.comprimir("¿Y la membrana?", [documento], embeddings)
+    assert embeddings.textos == ["¿Y la membrana?"]
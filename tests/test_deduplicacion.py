@@ -0,0 +1,70 @@
+"""
+Deduplicación MinHash: copias exactas y casi exactas se fusionan en un representante
+"""
+
+from langchain.schema import Document
+
+from deduplicacion import DeduplicadorMinHash, FirmasFragmentos, referencias_de
+
+TEXTO = (
+    "La generación aumentada por recuperación combina un buscador de fragmentos con un modelo de "
+    "lenguaje que redacta la respuesta usando solo el contexto recuperado de los documentos del curso, "
+    "lo que reduce las alucinaciones y permite citar la página exacta de cada afirmación."
+)
+
+
+def _fragmento(texto: str, source: str, page: int) -> Document:
+    return Document(page_content=texto, metadata={"source": source, "page": page})
+
+
+def test_copias_exactas_y_casi_exactas():
+    deduplicador = DeduplicadorMinHash()
+    casi = TEXTO.replace("exacta", "precisa")
+    fragmentos = [
+        _fragmento(TEXTO, "a.pdf", 0),
+        _fragmento("  " + TEXTO.upper().replace(" ", "\n  "), "b.pdf", 3),
+        _fragmento(casi, "c.pdf", 1),
+        _fragmento("Un fragmento que no se parece en nada a los demás del curso de prueba.", "a.pdf", 1),
+    ]
+
+    emitidos = list(deduplicador.procesar(fragmentos))
+    assert [d.metadata["source"] for d in emitidos] == ["a.pdf", "a.pdf"]
+    assert (deduplicador.duplicados_exactos, deduplicador.casi_duplicados, deduplicador.eliminados) == (1, 1, 2)
+
+    # El representante cita todas las ubicaciones de sus copias
+    assert referencias_de(emitidos[0]) == [("a.pdf", 0), ("b.pdf", 3), ("c.pdf", 1)]
+    assert emitidos[0].metadata["num_duplicados"] == 2
+    assert referencias_de(emitidos[1]) == [("a.pdf", 1)]
+
+
+def test_parecidos_bajo_el_umbral_se_conservan():
+    deduplicador = DeduplicadorMinHash(umbral=0.85)
+    palabras = TEXTO.split()
+    # Cambiar una de cada tres palabras deja muy pocos shingles en común
+    distinto = " ".join(p if i % 3 else "otra" for i, p in enumerate(palabras))
+    emitidos = list(deduplicador.procesar([_fragmento(TEXTO, "a.pdf", 0), _fragmento(distinto, "b.pdf", 0)]))
+    assert len(emitidos) == 2 and deduplicador.eliminados == 0
+
+
+def test_firma_reproducible():
+    a, b = DeduplicadorMinHash(semilla=7), DeduplicadorMinHash(semilla=7)
+    assert (a.firma(TEXTO.lower()) == b.firma(TEXTO.lower())).all()
+
+
+def test_duplicados_de_fragmentos_ya_almacenados(tmp_path):
+    primero = DeduplicadorMinHash()
+    list(primero.procesar([_fragmento(TEXTO, "a.pdf", 0)]))
+    firmas = FirmasFragmentos()
+    firmas.agregar(["id-a"], *primero.firmas_emitidas())
+    ruta = str(tmp_path / "firmas.npz")
+    firmas.guardar(ruta)
+
+    # Una carga posterior compara contra las firmas guardadas, no contra el texto
+    segundo = DeduplicadorMinHash()
+    assert segundo.sembrar(FirmasFragmentos.cargar(ruta), lambda id_: {"source": "a.pdf", "page": 0}) == 1
+    emitidos = list(segundo.procesar([_fragmento(TEXTO, "b.pdf", 2)]))
+    assert emitidos == [] and segundo.eliminados == 1
+
+    [(id_, metadata)] = segundo.existentes_actualizados()
+    assert id_ == "id-a"
+    assert referencias_de(Document(page_content="", metadata=metadata)) == [("a.pdf", 0), ("b.pdf", 2)]
@@ -0,0 +1,61 @@
+"""
+Instantáneas: exportar, montar (mmap) e importar a Chroma
+"""
+
+import os
+
+import pytest
+
+PREGUNTA = "inteligencia artificial modelos de lenguaje y recuperación de documentos"
+
+
+def _nuevo(tmp_path, nombre):
+    from asistente import AsistenteAcademico
+    from backends_llm import BackendFalso
+
+    return AsistenteAcademico(persist_directory=str(tmp_path / nombre), backend_llm=BackendFalso(),
+                              directorio_cache_paginas=None, filtrar_irrelevantes=False)
+
+
+def _resultado(recuperados):
+    # Los empates pueden salir en otro orden: se comparan ordenados
+    return sorted((-round(r.puntaje, 4), r.id) for r in recuperados)
+
+
+@pytest.fixture
+def instantanea(tmp_path, asistente, pdfs, otro_pdf):
+    asistente.cargar_documentos([pdfs[0]], etiquetas="teoria")
+    asistente.cargar_documentos([otro_pdf], etiquetas="lab")
+    ruta = str(tmp_path / "curso.snap")
+    cabecera = asistente.exportar_instantanea(ruta)
+    assert cabecera["fragmentos"] == asistente.colecciones.obtener().obtener_indice().vivos
+    return asistente, ruta
+
+
+def test_montada_responde_igual_que_chroma(tmp_path, instantanea):
+    origen, ruta = instantanea
+    replica = _nuevo(tmp_path, "replica")
+    nombre = replica.montar_instantanea(ruta)
+
+    for filtros in (None, {"fuentes": ["C.pdf"]}, {"etiquetas": ["teoria"]}, {"paginas": [0, 0]}):
+        esperado = origen.buscar(PREGUNTA, k=5, filtros=filtros)
+        obtenido = replica.buscar(PREGUNTA, nombre, k=5, filtros=filtros)
+        assert esperado and _resultado(obtenido) == _resultado(esperado)
+        metadatas = {r.id: r.documento.metadata for r in esperado}
+        assert all(r.documento.metadata == metadatas[r.id] for r in obtenido)
+
+    assert replica.buscar(PREGUNTA, nombre, filtros={"etiquetas": ["otra"]}) == []
+    assert replica.consultar(PREGUNTA, nombre)["fuentes"]
+    with pytest.raises(ValueError):
+        replica.eliminar_documentos(["C.pdf"], nombre)
+
+
+def test_importar_recupera_una_coleccion_modificable(tmp_path, instantanea):
+    origen, ruta = instantanea
+    destino = _nuevo(tmp_path, "importada")
+    destino.importar_instantanea(ruta)
+
+    assert _resultado(destino.buscar(PREGUNTA, k=5)) == _resultado(origen.buscar(PREGUNTA, k=5))
+    assert destino.eliminar_documentos(["C.pdf"]) > 0
+    fuentes = {os.path.basename(r.documento.metadata["source"]) for r in destino.buscar("RAG", k=50)}
+    assert fuentes == {"A.pdf"}
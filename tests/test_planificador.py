@@ -0,0 +1,103 @@
+"""
+Admisión del planificador: prioridad, desplazamiento y plazos
+"""
+
+import threading
+import time
+
+import pytest
+
+from planificador import INTERACTIVA, LOTE, PlanificadorGeneraciones, RechazoGeneracion
+
+
+def _esperar(condicion, limite: float = 5.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "la condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+def _en_hilo(planificador, prioridad, resultados, nombre, plazo=None):
+    def pedir():
+        try:
+            with planificador.turno(prioridad, plazo):
+                resultados.append(nombre)
+        except RechazoGeneracion as e:
+            resultados.append((nombre, e.motivo))
+
+    hilo = threading.Thread(target=pedir, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def test_interactiva_pasa_delante_del_lote():
+    planificador = PlanificadorGeneraciones(max_concurrencia=1, plazos={INTERACTIVA: None})
+    orden = []
+    with planificador.turno(INTERACTIVA):
+        lote = _en_hilo(planificador, LOTE, orden, "lote")
+        _esperar(lambda: planificador.metricas()["en_cola"][LOTE] == 1)
+        interactiva = _en_hilo(planificador, INTERACTIVA, orden, "interactiva")
+        _esperar(lambda: planificador.metricas()["en_cola"][INTERACTIVA] == 1)
+    lote.join(5)
+    interactiva.join(5)
+    assert orden == ["interactiva", "lote"]
+
+
+def test_cola_llena_desplaza_al_lote():
+    planificador = PlanificadorGeneraciones(max_concurrencia=1, max_cola=1, plazos={INTERACTIVA: None})
+    resultados = []
+    with planificador.turno(INTERACTIVA):
+        lote = _en_hilo(planificador, LOTE, resultados, "lote")
+        _esperar(lambda: planificador.metricas()["en_cola"][LOTE] == 1)
+        interactiva = _en_hilo(planificador, INTERACTIVA, resultados, "interactiva")
+        lote.join(5)
+        assert resultados == [("lote", "desplazada")]
+
+        # Sin nadie de menor prioridad a quien desplazar, se rechaza al llegar
+        with pytest.raises(RechazoGeneracion) as rechazo:
+            with planificador.turno(INTERACTIVA):
+                pass
+        assert rechazo.value.motivo == "cola_llena"
+    interactiva.join(5)
+    assert resultados == [("lote", "desplazada"), "interactiva"]
+    assert planificador.metricas()["rechazadas"] == {"desplazada": 1, "cola_llena": 1}
+
+
+def test_plazo_vencido_en_cola():
+    planificador = PlanificadorGeneraciones(max_concurrencia=1)
+    with planificador.turno(INTERACTIVA):
+        inicio = time.monotonic()
+        with pytest.raises(RechazoGeneracion) as rechazo:
+            with planificador.turno(INTERACTIVA, plazo=0.05):
+                pass
+        assert rechazo.value.motivo == "plazo_vencido"
+        assert time.monotonic() - inicio < 2.0
+    assert planificador.metricas()["en_cola"] == {INTERACTIVA: 0, LOTE: 0}
+
+
+def test_plazo_imposible_se_rechaza_al_llegar():
+    planificador = PlanificadorGeneraciones(max_concurrencia=1)
+    with planificador.turno(INTERACTIVA):
+        # Con generaciones de ~10 s, un plazo de 1 s no se puede cumplir
+        planificador.servicio_medio = 10.0
+        with pytest.raises(RechazoGeneracion) as rechazo:
+            with planificador.turno(INTERACTIVA, plazo=1.0):
+                pass
+        assert rechazo.value.motivo == "plazo_imposible"
+
+
+def test_plazo_imposible_no_desplaza_a_nadie():
+    planificador = PlanificadorGeneraciones(max_concurrencia=1, max_cola=1, plazos={INTERACTIVA: None})
+    resultados = []
+    with planificador.turno(INTERACTIVA):
+        lote = _en_hilo(planificador, LOTE, resultados, "lote")
+        _esperar(lambda: planificador.metricas()["en_cola"][LOTE] == 1)
+        planificador.servicio_medio = 10.0
+        with pytest.raises(RechazoGeneracion) as rechazo:
+            with planificador.turno(INTERACTIVA, plazo=1.0):
+                pass
+        assert rechazo.value.motivo == "plazo_imposible"
+        assert planificador.metricas()["en_cola"][LOTE] == 1
+    lote.join(5)
+    assert resultados == ["lote"]
+    assert planificador.metricas()["rechazadas"] == {"plazo_imposible": 1}
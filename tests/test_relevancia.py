@@ -0,0 +1,55 @@
+"""
+Compuerta de relevancia: sin fragmentos relevantes se responde sin generar
+"""
+
+from langchain.schema import Document
+
+from asistente import RESPUESTA_SIN_INFORMACION
+from colecciones import Recuperado
+from conversacion import Conversacion
+from relevancia import CompuertaRelevancia
+
+
+def _recuperado(texto: str, puntaje: float) -> Recuperado:
+    return Recuperado(documento=Document(page_content=texto), puntaje=puntaje, id=texto[:8], coleccion="general")
+
+
+def test_basta_una_senal():
+    compuerta = CompuertaRelevancia(umbral_similitud=0.35, umbral_brecha=0.15, umbral_solapamiento=0.5)
+    fragmentos = [_recuperado("La fotosíntesis ocurre en los cloroplastos", 0.2),
+                  _recuperado("Las plantas producen oxígeno", 0.18)]
+
+    lejos = compuerta.evaluar("¿Quién ganó el mundial de fútbol?", fragmentos)
+    assert lejos["solapamiento"] == 0.0 and not lejos["relevante"]
+
+    # Sin similitud ni brecha, el solapamiento léxico basta
+    cerca = compuerta.evaluar("¿Dónde ocurre la fotosíntesis?", fragmentos)
+    assert cerca["solapamiento"] >= 0.5 and cerca["relevante"]
+
+    # Y una similitud alta basta aunque no haya palabras en común
+    assert compuerta.evaluar("¿Quién ganó el mundial?", [_recuperado("otra cosa", 0.9)])["relevante"]
+    assert not compuerta.evaluar("¿Qué es RAG?", [])["relevante"]
+
+
+def test_consultar_y_conversar_no_generan_sin_relevancia(asistente, pdfs):
+    asistente.cargar_documentos([pdfs[0]])
+    # Umbrales inalcanzables: ninguna recuperación pasa la compuerta
+    asistente.compuerta = CompuertaRelevancia(umbral_similitud=2.0, umbral_brecha=2.0, umbral_solapamiento=2.0)
+    llm = asistente.llm
+
+    resultado = asistente.consultar("¿Qué es RAG?")
+    assert resultado["respuesta"] == RESPUESTA_SIN_INFORMACION and resultado["sin_generacion"]
+    assert resultado["fuentes"] and resultado["relevancia"]["relevante"] is False
+
+    conversacion = Conversacion()
+    resultado = asistente.conversar("¿Qué es RAG?", conversacion)
+    assert resultado["respuesta"] == RESPUESTA_SIN_INFORMACION and resultado["sin_generacion"]
+    assert resultado["consulta_busqueda"] == "¿Qué es RAG?" and not resultado["contexto_reutilizado"]
+    assert llm.llamadas == 0
+    # El turno no se registra: el siguiente sigue enviando el prompt completo
+    assert not conversacion.turnos and not conversacion.contexto
+
+    asistente.compuerta = CompuertaRelevancia(umbral_similitud=-1.0)
+    resultado = asistente.conversar("¿Qué es RAG?", conversacion)
+    assert not resultado.get("sin_generacion") and llm.llamadas == 1
+    assert len(conversacion.turnos) == 1
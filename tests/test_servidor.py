@@ -0,0 +1,102 @@
+"""
+Ida y vuelta por HTTP: ingesta, consulta, streaming y errores de la petición
+
+El LLM es el Ollama falso de stub_ollama.py, así que también se ejercita el
+cliente HTTP de Ollama.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    from asistente import AsistenteAcademico
+    from servidor import ServidorAsistente
+    from stub_ollama import ServidorOllamaFalso
+
+    falso = ServidorOllamaFalso(tokens_respuesta=5, tokens_por_segundo=1000.0).iniciar()
+    asistente = AsistenteAcademico(
+        persist_directory=str(tmp_path / "db"), base_url_ollama=falso.url,
+        directorio_cache_paginas=None, filtrar_irrelevantes=False,
+    )
+    servidor = ServidorAsistente(asistente, puerto=0)
+    loop = asyncio.new_event_loop()
+    hilo = threading.Thread(target=loop.run_forever, daemon=True)
+    hilo.start()
+    asyncio.run_coroutine_threadsafe(servidor.iniciar(), loop).result(5)
+
+    yield f"http://127.0.0.1:{servidor.puerto}"
+
+    asyncio.run_coroutine_threadsafe(servidor.detener(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    hilo.join(5)
+    falso.detener()
+
+
+def _pedir(url: str, datos=None):
+    """
+    (estado, cuerpo) de una petición GET o, con datos, POST JSON
+    """
+    cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+    peticion = urllib.request.Request(url, data=cuerpo, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(peticion, timeout=30) as respuesta:
+            return respuesta.status, respuesta.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+def _ingerir(url: str, rutas):
+    estado, cuerpo = _pedir(url + "/ingesta", {"rutas": rutas})
+    assert estado == 202
+    trabajo = json.loads(cuerpo)["id"]
+    fin = time.monotonic() + 60
+    while True:
+        resumen = json.loads(_pedir(f"{url}/ingesta/{trabajo}")[1])
+        if resumen["estado"] in ("completado", "error"):
+            return resumen
+        assert time.monotonic() < fin, "la ingesta no terminó a tiempo"
+        time.sleep(0.05)
+
+
+def test_consulta_ida_y_vuelta(servidor, pdfs):
+    assert _ingerir(servidor, [pdfs[0]])["estado"] == "completado"
+
+    estado, cuerpo = _pedir(servidor + "/consulta", {"pregunta": "¿Qué es RAG?"})
+    assert estado == 200
+    respuesta = json.loads(cuerpo)
+    assert respuesta["respuesta"] and not respuesta.get("degradada")
+    assert respuesta["fuentes"] and respuesta["fuentes"][0]["source"] == "A.pdf"
+    assert respuesta["seleccion_k"]["k"] == len(respuesta["fuentes"])
+
+    estado, cuerpo = _pedir(servidor + "/consulta/stream", {"pregunta": "¿Qué es RAG?"})
+    assert estado == 200
+    eventos = [json.loads(linea) for linea in cuerpo.splitlines() if linea]
+    assert eventos[0]["fuentes"] and eventos[-1] == {"fin": True}
+    assert "".join(e.get("token", "") for e in eventos)
+
+    assert _pedir(servidor + "/consulta", {"pregunta": "x", "filtros": {"autor": ["y"]}})[0] == 400
+
+    salud = json.loads(_pedir(servidor + "/salud")[1])
+    assert salud["estado"] == "ok" and salud["consultas_en_lotes"] >= 2
+
+
+def test_errores_de_la_peticion(servidor):
+    assert _pedir(servidor + "/consulta", {})[0] == 400
+    assert _pedir(servidor + "/consulta", {"pregunta": "x", "prioridad": "urgente"})[0] == 400
+    for invalido in ({"k": "3"}, {"k": True}, {"k": 0}, {"filtros": "lab"}, {"filtros": {"autor": ["y"]}},
+                     {"filtros": {"etiquetas": "lab"}}):
+        for ruta in ("/consulta", "/consulta/stream"):
+            assert _pedir(servidor + ruta, {"pregunta": "x", **invalido})[0] == 400
+    for ruta in ("/consulta", "/consulta/stream"):
+        assert _pedir(servidor + ruta, {"pregunta": "x", "colecciones": ["***"]})[0] == 400
+    assert _pedir(servidor + "/ingesta", {"rutas": ["/no/existe.pdf"]})[0] == 400
+    assert _pedir(servidor + "/ingesta/desconocido")[0] == 404
+    assert _pedir(servidor + "/nada")[0] == 404
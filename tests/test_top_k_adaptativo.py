@@ -0,0 +1,60 @@
+"""
+Top-k adaptativo: el corte depende de los puntajes y del presupuesto de tokens
+"""
+
+import pytest
+from langchain.schema import Document
+
+from colecciones import Recuperado
+from top_k_adaptativo import SelectorTopK, tokens_estimados
+
+
+def _candidatos(puntajes, largo: int = 30):
+    return [Recuperado(documento=Document(page_content="x" * largo), puntaje=p, id=str(i), coleccion="general")
+            for i, p in enumerate(puntajes)]
+
+
+def _k(selector, puntajes, largo: int = 30):
+    elegidos, seleccion = selector.seleccionar(_candidatos(puntajes, largo))
+    assert seleccion["k"] == len(elegidos)
+    return seleccion["k"], seleccion["motivo"]
+
+
+def test_motivos_de_corte():
+    selector = SelectorTopK(min_k=1, max_k=5, caida=0.08, masa=0.9, temperatura=0.05, presupuesto_tokens=None)
+    # Un fragmento claramente mejor que el resto
+    assert _k(selector, [0.80, 0.60, 0.59, 0.58]) == (1, "masa")
+    # Puntajes parejos con una bajada brusca después del tercero
+    sin_masa = SelectorTopK(max_k=5, caida=0.08, masa=1.0, presupuesto_tokens=None)
+    assert _k(sin_masa, [0.60, 0.60, 0.60, 0.50, 0.50]) == (3, "caida")
+    # Todos parejos: se llega al máximo
+    assert _k(SelectorTopK(max_k=5, masa=1.0, presupuesto_tokens=None), [0.5] * 8) == (5, "maximo")
+    assert _k(SelectorTopK(max_k=5, masa=1.0, presupuesto_tokens=None), [0.5] * 3) == (3, "candidatos")
+
+
+def test_presupuesto_y_minimo():
+    tokens = tokens_estimados("x" * 300)
+    selector = SelectorTopK(min_k=2, max_k=8, masa=1.0, caida=1.0, presupuesto_tokens=3 * tokens)
+    assert _k(selector, [0.5] * 8, largo=300) == (3, "presupuesto")
+
+    # min_k se respeta aunque ya no quepa en el presupuesto ni haya caída
+    selector = SelectorTopK(min_k=2, max_k=8, caida=0.01, presupuesto_tokens=1)
+    assert _k(selector, [0.9, 0.1, 0.1], largo=300)[0] == 2
+
+
+def test_sin_candidatos_y_validacion():
+    assert SelectorTopK().seleccionar([]) == ([], {"k": 0, "candidatos": 0, "motivo": "candidatos", "tokens": 0})
+    with pytest.raises(ValueError):
+        SelectorTopK(min_k=3, max_k=2)
+    with pytest.raises(ValueError):
+        SelectorTopK(masa=0.0)
+
+
+def test_el_asistente_usa_el_selector(asistente, pdfs):
+    asistente.cargar_documentos([pdfs[0]])
+    asistente.actualizar_parametros(top_k_adaptativo=SelectorTopK(min_k=1, max_k=4, presupuesto_tokens=None))
+    assert asistente.k_busqueda == 4
+
+    resultado = asistente.consultar("¿Qué es RAG?")
+    seleccion = resultado["seleccion_k"]
+    assert seleccion["candidatos"] == 4 and 1 <= seleccion["k"] == len(resultado["fuentes"]) <= 4
@@ -0,0 +1,187 @@
+"""
+Top-k adaptativo: cuántos fragmentos enviar al LLM según la distribución de
+puntajes, en lugar de un número fijo.
+
+Se recuperan max_k candidatos y se conservan en orden de puntaje hasta que
+se cumple alguna condición de corte:
+
+    caida        el puntaje baja bruscamente respecto al fragmento anterior
+    masa         los fragmentos conservados ya reúnen la fracción pedida de
+                 la masa de puntajes (softmax con temperatura)
+    presupuesto  el siguiente fragmento no cabe en el presupuesto de tokens
+    maximo       se alcanzó max_k
+
+Siempre se conservan al menos min_k. Una pregunta precisa, con un fragmento
+claramente mejor que el resto, se responde con uno o dos fragmentos y el
+prefill del LLM es mucho más corto; una pregunta amplia, con puntajes
+parejos, recibe más contexto.
+
+Uso (distribución del k elegido sobre el dataset de evaluación):
+    python top_k_adaptativo.py [--dataset dataset_evaluacion.json] [--persist-directory ./chroma_db] [--max-k 8]
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ~3 caracteres por token: la misma estimación conservadora que en conversar()
+CARACTERES_POR_TOKEN = 3
+
+
+def tokens_estimados(texto: str) -> int:
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+class SelectorTopK:
+    """
+    Umbrales de corte del top-k adaptativo
+    """
+
+    def __init__(self, min_k: int = 1, max_k: int = 8, caida: float = 0.08, masa: float = 0.9,
+                 temperatura: float = 0.05, presupuesto_tokens: Optional[int] = 1500):
+        """
+        Args:
+            min_k: Fragmentos que se conservan siempre
+            max_k: Candidatos recuperados y máximo de fragmentos
+            caida: Bajada de similitud coseno entre fragmentos consecutivos que corta la lista
+            masa: Fracción de la masa de puntajes (softmax) a reunir antes de cortar
+            temperatura: Temperatura del softmax; más baja concentra la masa en los mejores
+            presupuesto_tokens: Tokens de contexto como máximo (None = sin límite)
+        """
+        if not 1 <= min_k <= max_k:
+            raise ValueError(f"Se requiere 1 <= min_k <= max_k (min_k={min_k}, max_k={max_k})")
+        if not 0.0 < masa <= 1.0 or temperatura <= 0:
+            raise ValueError("'masa' debe estar en (0, 1] y 'temperatura' ser positiva")
+        self.min_k = min_k
+        self.max_k = max_k
+        self.caida = caida
+        self.masa = masa
+        self.temperatura = temperatura
+        self.presupuesto_tokens = presupuesto_tokens
+
+    def seleccionar(self, candidatos) -> Tuple[List, Dict]:
+        """
+        Elige cuántos candidatos conservar
+
+        Args:
+            candidatos: Lista de Recuperado ordenada por puntaje descendente
+
+        Returns:
+            (fragmentos conservados, dict con 'k', 'candidatos', 'motivo' y 'tokens')
+        """
+        candidatos = list(candidatos)[:self.max_k]
+        if not candidatos:
+            return [], {"k": 0, "candidatos": 0, "motivo": "candidatos", "tokens": 0}
+
+        puntajes = np.array([r.puntaje for r in candidatos], dtype=float)
+        pesos = np.exp((puntajes - puntajes[0]) / self.temperatura)
+        masa_acumulada = np.cumsum(pesos) / pesos.sum()
+        tokens = [tokens_estimados(r.documento.page_content) for r in candidatos]
+
+        k, motivo = len(candidatos), "maximo" if len(candidatos) == self.max_k else "candidatos"
+        total = sum(tokens[:self.min_k])
+        for i in range(self.min_k, len(candidatos)):
+            if masa_acumulada[i - 1] >= self.masa:
+                k, motivo = i, "masa"
+                break
+            if puntajes[i - 1] - puntajes[i] >= self.caida:
+                k, motivo = i, "caida"
+                break
+            if self.presupuesto_tokens is not None and total + tokens[i] > self.presupuesto_tokens:
+                k, motivo = i, "presupuesto"
+                break
+            total += tokens[i]
+        return candidatos[:k], {"k": k, "candidatos": len(candidatos), "motivo": motivo, "tokens": sum(tokens[:k])}
+
+    def a_dict(self) -> Dict:
+        return {
+            "min_k": self.min_k,
+            "max_k": self.max_k,
+            "caida": self.caida,
+            "masa": self.masa,
+            "temperatura": self.temperatura,
+            "presupuesto_tokens": self.presupuesto_tokens,
+        }
+
+
+def evaluar(asistente, dataset: List[Dict], selector: SelectorTopK) -> Dict:
+    """
+    Compara el top-k adaptativo con el top-k fijo del asistente sobre un dataset
+
+    Returns:
+        dict con la distribución de k, los motivos de corte, el recall de
+        documentos relevantes y los tokens de contexto promedio de cada modo
+    """
+    items = [item for item in dataset if not item.get("fuera_de_tema")]
+    if not items:
+        raise ValueError("El dataset no tiene preguntas respondibles")
+    recuperaciones = asistente.buscar_lote([item["pregunta"] for item in items], k=selector.max_k)
+
+    def recall(fragmentos, relevantes):
+        if not relevantes:
+            return 1.0
+        fuentes = {os.path.basename(str(r.documento.metadata.get("source", ""))) for r in fragmentos}
+        return len(fuentes & set(relevantes)) / len(set(relevantes))
+
+    distribucion, motivos = {}, {}
+    fijo = {"recall": [], "tokens": []}
+    adaptativo = {"recall": [], "tokens": []}
+    for item, candidatos in zip(items, recuperaciones):
+        seleccion, info = selector.seleccionar(candidatos)
+        distribucion[info["k"]] = distribucion.get(info["k"], 0) + 1
+        motivos[info["motivo"]] = motivos.get(info["motivo"], 0) + 1
+        relevantes = item.get("documentos_relevantes", [])
+        adaptativo["recall"].append(recall(seleccion, relevantes))
+        adaptativo["tokens"].append(info["tokens"])
+        base = candidatos[:asistente.top_k]
+        fijo["recall"].append(recall(base, relevantes))
+        fijo["tokens"].append(sum(tokens_estimados(r.documento.page_content) for r in base))
+
+    def resumen(valores):
+        return {"recall": round(float(np.mean(valores["recall"])), 4), "tokens": round(float(np.mean(valores["tokens"])), 1)}
+
+    return {
+        "preguntas": len(items),
+        "distribucion_k": dict(sorted(distribucion.items())),
+        "motivos": motivos,
+        "fijo": {"k": asistente.top_k, **resumen(fijo)},
+        "adaptativo": {**selector.a_dict(), **resumen(adaptativo)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribución del top-k adaptativo sobre el dataset de evaluación")
+    parser.add_argument("--dataset", default="dataset_evaluacion.json")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--top-k", type=int, default=3, help="Top-k fijo con el que comparar")
+    parser.add_argument("--min-k", type=int, default=1)
+    parser.add_argument("--max-k", type=int, default=8)
+    parser.add_argument("--caida", type=float, default=0.08)
+    parser.add_argument("--masa", type=float, default=0.9)
+    parser.add_argument("--temperatura", type=float, default=0.05)
+    parser.add_argument("--presupuesto-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    from asistente import AsistenteAcademico
+
+    with open(args.dataset, encoding="utf-8") as f:
+        dataset = json.load(f)
+    asistente = AsistenteAcademico(persist_directory=args.persist_directory, top_k=args.top_k)
+
+    selector = SelectorTopK(args.min_k, args.max_k, args.caida, args.masa, args.temperatura, args.presupuesto_tokens)
+    reporte = evaluar(asistente, dataset, selector)
+
+    print(f"\n📊 Top-k adaptativo en {reporte['preguntas']} preguntas")
+    for k, cantidad in reporte["distribucion_k"].items():
+        print(f"   k={k:<3} {'█' * cantidad} {cantidad}")
+    print(f"   Motivos de corte: {reporte['motivos']}")
+    for modo in ("fijo", "adaptativo"):
+        fila = reporte[modo]
+        print(f"   {modo:<11} recall documentos {fila['recall']:.3f} · tokens de contexto {fila['tokens']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 """
 Script de verificación del entorno para Asistente Académico RAG
 Ejecutar antes de usar el sistema para verificar que todo esté configurado correctamente.
+
+Uso:
+    python verificar_setup.py
+    python verificar_setup.py --benchmark [--corpus documentos] [--salida perfil_hardware.json] [--llm-falso]
+
+Con --benchmark se mide la máquina y se escribe el perfil de hardware que
+el asistente carga al arrancar (ver perfil_hardware.py).
 """
 
+import argparse
 import sys
 import subprocess
 import importlib
@@ -209,9 +217,98 @@ def main():
     
     return exitosos == total
 
+def benchmark(args):
+    """Mide la máquina y escribe el perfil de hardware recomendado"""
+    import perfil_hardware
+    from asistente import MODELO_EMBEDDINGS, obtener_embeddings
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DE HARDWARE - Asistente Académico RAG")
+    print("=" * 60)
+
+    rutas = sorted(str(p) for p in Path(args.corpus).glob("*.pdf"))
+    if not rutas:
+        print(f"❌ No hay PDFs en '{args.corpus}'")
+        return False
+
+    falso = None
+    backend = None
+    if not args.sin_llm:
+        from backends_llm import BackendOllama
+
+        if args.llm_falso:
+            from stub_ollama import ServidorOllamaFalso
+
+            falso = ServidorOllamaFalso(modelo=args.modelo, tokens_por_segundo=50.0,
+                                        segundos_prefill_por_token=0.0005).iniciar()
+            backend = BackendOllama(args.modelo, base_url=falso.url)
+        elif verificar_ollama_servidor():
+            backend = BackendOllama(args.modelo)
+        else:
+            print("   ⚠️  Se omite la medición del LLM (usar --llm-falso para medir con el servidor falso)")
+
+    try:
+        perfil = perfil_hardware.ejecutar(
+            rutas,
+            obtener_embeddings(MODELO_EMBEDDINGS, modo=args.modo_embeddings),
+            backend,
+            lotes=args.lotes,
+            tamanos=args.tamanos,
+            concurrencias=args.concurrencias,
+        )
+    finally:
+        if falso is not None:
+            falso.detener()
+
+    m = perfil.mediciones
+    print("\n" + "=" * 60)
+    print("📊 RESULTADOS")
+    print("=" * 60)
+    print(f"📄 PDF: {m['pdf']['paginas_por_segundo']} páginas/s ({m['pdf']['paginas']} páginas)")
+    print("🔢 Embeddings (fragmentos/s):")
+    for fila in m["embeddings"]:
+        print(f"   lote {fila['lote']:>4} · hilos {fila['hilos'] or '-':>3}: {fila['fragmentos_por_segundo']}")
+    print("🔍 Búsqueda:")
+    for fila in m["busqueda"]:
+        print(f"   {fila['fragmentos']:>7} fragmentos: {fila['consultas_por_segundo']} consultas/s (p50 {fila['p50_ms']} ms)")
+    if "llm" in m:
+        llm = m["llm"]
+        print(f"🦙 LLM: prefill {llm['prefill_tokens_por_segundo']} tokens/s · "
+              f"generación {llm['generacion_tokens_por_segundo']} tokens/s")
+        for fila in llm["concurrencia"]:
+            print(f"   {fila['generaciones']} simultáneas: {fila['tokens_por_segundo']} tokens/s en total")
+
+    print("\n💡 Ajustes recomendados:")
+    print(f"   tamano_lote={perfil.tamano_lote}")
+    print(f"   hilos_embeddings={perfil.hilos_embeddings or 'los de torch'}")
+    print(f"   max_concurrencia={perfil.max_concurrencia}")
+    perfil.guardar(args.salida)
+    print(f"\n💾 Perfil guardado en {args.salida} (el asistente lo carga al arrancar)")
+    print("=" * 60)
+    return True
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificación del entorno y benchmark de hardware")
+    parser.add_argument("--benchmark", action="store_true", help="Medir la máquina y escribir el perfil de hardware")
+    parser.add_argument("--corpus", default="documentos", help="Carpeta con los PDFs de prueba")
+    parser.add_argument("--salida", default=None, help="Ruta del perfil (por defecto ASISTENTE_PERFIL_HARDWARE o perfil_hardware.json)")
+    parser.add_argument("--modelo", default="llama2:7b")
+    parser.add_argument("--modo-embeddings", choices=("fp32", "int8", "onnx"), default=None)
+    parser.add_argument("--llm-falso", action="store_true", help="Medir con el servidor Ollama falso")
+    parser.add_argument("--sin-llm", action="store_true", help="No medir el LLM")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[8, 16, 32, 64, 128])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Tamaños de colección para la búsqueda")
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
     try:
-        exit_code = 0 if main() else 1
+        if args.benchmark:
+            from perfil_hardware import RUTA_PERFIL
+
+            args.salida = args.salida or RUTA_PERFIL
+            exit_code = 0 if benchmark(args) else 1
+        else:
+            exit_code = 0 if main() else 1
         sys.exit(exit_code)
     except KeyboardInterrupt:
         print("\n\n⚠️  Verificación cancelada por el usuario")